@@ -15,7 +15,7 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
 import numpy as np
 import io
-from data_utils import procesar_fecha, es_fecha_valida, formatear_fecha, calcular_porcentaje_avance
+from data_utils import formatear_fecha, obtener_matriz_plazos
 
 
 class AlertasManagerOptimizado:
@@ -43,50 +43,56 @@ class AlertasManagerOptimizado:
             'Plazo de oficio de cierre'
         ]
         
-        alertas_importantes = []
+        # Días hasta el vencimiento desde la matriz compartida (sin volver a interpretar fechas)
+        matriz = obtener_matriz_plazos(df)
         
-        for idx, row in df.iterrows():
-            # FILTRO 1: Solo registros que NO estén completados al 100%
-            if row.get('Porcentaje Avance', 0) >= 100:
-                continue
-            
-            # FILTRO 2: Solo registros con estado activo
-            estado = str(row.get('Estado', '')).upper()
-            if estado in ['COMPLETADO', 'CANCELADO', 'INACTIVO']:
+        # FILTRO 1: Solo registros que NO estén completados al 100%
+        avance = pd.to_numeric(df['Porcentaje Avance'], errors='coerce').fillna(0) \
+            if 'Porcentaje Avance' in df.columns else pd.Series(0, index=df.index)
+        # FILTRO 2: Solo registros con estado activo
+        estado = df['Estado'].astype(str).str.upper() \
+            if 'Estado' in df.columns else pd.Series('', index=df.index)
+        activos = ((avance < 100) & ~estado.isin(['COMPLETADO', 'CANCELADO', 'INACTIVO'])).to_numpy()
+        
+        candidatas = []
+        for k, campo in enumerate(campos_criticos):
+            if campo not in df.columns:
                 continue
-            
-            for campo in campos_criticos:
-                if campo in df.columns:
-                    fecha_str = row[campo]
-                    
-                    if es_fecha_valida(fecha_str):
-                        try:
-                            fecha_obj = procesar_fecha(fecha_str)
-                            if fecha_obj:
-                                fecha_date = fecha_obj.date() if isinstance(fecha_obj, datetime) else fecha_obj
-                                dias_diferencia = (fecha_date - self.hoy).days
-                                
-                                # FILTRO 3: Solo alertas realmente importantes (≤7 días)
-                                tipo_alerta = self._clasificar_alerta_estricta(dias_diferencia)
-                                
-                                if tipo_alerta:
-                                    # FILTRO 4: Verificar que la alerta sea relevante para el campo
-                                    if self._es_alerta_relevante(row, campo, fecha_date):
-                                        alertas_importantes.append({
-                                            'Código': row['Cod'],
-                                            'Entidad': row['Entidad'],
-                                            'Campo': self._simplificar_nombre_campo(campo),
-                                            'Fecha': fecha_date,
-                                            'Fecha_Formateada': formatear_fecha(fecha_str),
-                                            'Días_Diferencia': dias_diferencia,
-                                            'Tipo_Alerta': tipo_alerta,
-                                            'Funcionario': row.get('Funcionario', ''),
-                                            'Avance': row.get('Porcentaje Avance', 0),
-                                            'Prioridad': self._calcular_prioridad(tipo_alerta, dias_diferencia, row.get('Porcentaje Avance', 0)),
-                                            'Descripción': self._generar_descripcion_optimizada(campo, dias_diferencia)
-                                        })
-                        except Exception:
-                            continue
+            dias = matriz.dias_de(campo)
+            # FILTRO 3: Solo alertas realmente importantes (≤7 días)
+            mascara = activos & matriz.tiene_fecha_de(campo) & (dias <= 7)
+            # FILTRO 4: Si ya hay fecha real completada, no alertar sobre la programada
+            if 'programada' in campo.lower():
+                mascara &= ~matriz.completado_de(campo)
+            candidatas.extend((pos, k, campo, int(dias[pos])) for pos in np.flatnonzero(mascara))
+        
+        def columna(nombre, defecto):
+            return df[nombre].to_numpy() if nombre in df.columns else np.full(len(df), defecto, dtype=object)
+        
+        codigos, entidades = columna('Cod', ''), columna('Entidad', '')
+        funcionarios, avances = columna('Funcionario', ''), columna('Porcentaje Avance', 0)
+        avance_numerico = avance.to_numpy()
+        fechas_formateadas = {}
+        
+        alertas_importantes = []
+        for pos, _, campo, dias_diferencia in sorted(candidatas):
+            valor_fecha = df[campo].iat[pos]
+            if (campo, valor_fecha) not in fechas_formateadas:
+                fechas_formateadas[(campo, valor_fecha)] = formatear_fecha(valor_fecha)
+            tipo_alerta = self._clasificar_alerta_estricta(dias_diferencia)
+            alertas_importantes.append({
+                'Código': codigos[pos],
+                'Entidad': entidades[pos],
+                'Campo': self._simplificar_nombre_campo(campo),
+                'Fecha': self.hoy + timedelta(days=dias_diferencia),
+                'Fecha_Formateada': fechas_formateadas[(campo, valor_fecha)],
+                'Días_Diferencia': dias_diferencia,
+                'Tipo_Alerta': tipo_alerta,
+                'Funcionario': funcionarios[pos],
+                'Avance': avances[pos],
+                'Prioridad': self._calcular_prioridad(tipo_alerta, dias_diferencia, avance_numerico[pos]),
+                'Descripción': self._generar_descripcion_optimizada(campo, dias_diferencia)
+            })
         
         return pd.DataFrame(alertas_importantes)
     
@@ -101,16 +107,6 @@ class AlertasManagerOptimizado:
         else:
             return None         # No mostrar alertas de más de 7 días
     
-    def _es_alerta_relevante(self, row, campo, fecha_alerta):
-        """Verifica si la alerta es realmente relevante"""
-        # Si ya hay fecha real completada, no alertar sobre la programada
-        if 'programada' in campo.lower():
-            campo_real = campo.replace(' (fecha programada)', '').replace('Fecha de publicación programada', 'Publicación')
-            if campo_real in row.index and es_fecha_valida(row[campo_real]):
-                return False
-        
-        return True
-    
     def _simplificar_nombre_campo(self, campo):
         """Simplifica nombres de campos para mejor lectura"""
         simplificaciones = {
@@ -0,0 +1,491 @@
+# almacenamiento_local.py - Backend de almacenamiento sin red
+"""
+Backend de almacenamiento local:
+- ServicioSheetsLocal: imitación en proceso del subconjunto de la API de
+  Google Sheets v4 que usa GoogleSheetsManager (values.get/batchGet/update/
+  batchUpdate/append/clear, spreadsheets.get/batchUpdate)
+- Datos en memoria, con persistencia opcional en un archivo SQLite
+- Latencia inyectable y contador de llamadas por operación
+- AlmacenamientoLocal: GoogleSheetsManager conectado al servicio local, por lo
+  que leer_hoja/escribir_hoja/actualizar_fila/agregar_filas/listar_hojas tienen
+  exactamente la misma semántica que contra Google Sheets
+
+Uso: ALMACENAMIENTO_BACKEND=local (ver sheets_utils.crear_backend)
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from sheets_utils import GoogleSheetsManager
+
+
+def _error_http(status, mensaje):
+    """Crea un HttpError igual al que devolvería la API"""
+    return HttpError(httplib2.Response({'status': status}), mensaje.encode('utf-8'))
+
+
+def _columna_a_numero(letras):
+    """Convierte letra de columna a número (A=1, B=2, AA=27)"""
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + (ord(letra) - 64)
+    return numero
+
+
+def _numero_a_columna(numero):
+    """Convierte número de columna a letra (1=A, 2=B, 27=AA)"""
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _parsear_rango(rango):
+    """
+    Interpreta un rango A1: 'Hoja', 'Hoja!A1', 'Hoja!A5:C5', 'Hoja!B:B'.
+    Devuelve (titulo, fila_inicio, col_inicio, fila_fin, col_fin) con índices
+    base 1; los extremos abiertos se devuelven como None.
+    """
+    titulo, _, celdas = rango.partition('!')
+    if titulo.startswith("'") and titulo.endswith("'"):
+        titulo = titulo[1:-1].replace("''", "'")
+
+    if not celdas:
+        return titulo, 1, 1, None, None
+
+    extremos = celdas.split(':')
+    partes = []
+    for extremo in extremos:
+        coincidencia = re.fullmatch(r'([A-Z]*)(\d*)', extremo.strip().upper())
+        if coincidencia is None:
+            raise _error_http(400, f"Unable to parse range: {rango}")
+        letras, numero = coincidencia.groups()
+        partes.append((
+            int(numero) if numero else None,
+            _columna_a_numero(letras) if letras else None
+        ))
+
+    fila_inicio, col_inicio = partes[0]
+    if len(partes) == 1:
+        fila_fin, col_fin = fila_inicio, col_inicio
+    else:
+        fila_fin, col_fin = partes[1]
+
+    return titulo, fila_inicio or 1, col_inicio or 1, fila_fin, col_fin
+
+
+def _recortar(valores):
+    """Elimina celdas vacías al final de cada fila y filas vacías al final (como la API)"""
+    filas = []
+    for fila in valores:
+        fila = list(fila)
+        while fila and fila[-1] in ('', None):
+            fila.pop()
+        filas.append(fila)
+    while filas and not filas[-1]:
+        filas.pop()
+    return filas
+
+
+class _Peticion:
+    """Petición diferida: se ejecuta (con la latencia configurada) al llamar execute()"""
+
+    def __init__(self, servicio, operacion, funcion):
+        self.servicio = servicio
+        self.operacion = operacion
+        self.funcion = funcion
+
+    def execute(self, num_retries=0):
+        return self.servicio._ejecutar(self.operacion, self.funcion)
+
+
+class _RecursoValues:
+    """Equivalente local de spreadsheets().values()"""
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return _Peticion(self.servicio, 'values.get', lambda: self.servicio._leer_rango(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        def funcion():
+            return {
+                'spreadsheetId': spreadsheetId,
+                'valueRanges': [self.servicio._leer_rango(rango) for rango in ranges]
+            }
+        return _Peticion(self.servicio, 'values.batchGet', funcion)
+
+    def update(self, spreadsheetId, range, body, valueInputOption=None, **kwargs):
+        return _Peticion(
+            self.servicio, 'values.update',
+            lambda: self.servicio._escribir_rango(range, body.get('values', []))
+        )
+
+    def batchUpdate(self, spreadsheetId, body):
+        def funcion():
+            respuestas = [
+                self.servicio._escribir_rango(dato['range'], dato.get('values', []))
+                for dato in body.get('data', [])
+            ]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'totalUpdatedRows': sum(r['updatedRows'] for r in respuestas),
+                'totalUpdatedColumns': sum(r['updatedColumns'] for r in respuestas),
+                'totalUpdatedCells': sum(r['updatedCells'] for r in respuestas),
+                'totalUpdatedSheets': len({r['updatedRange'].split('!')[0] for r in respuestas}),
+                'responses': respuestas
+            }
+        return _Peticion(self.servicio, 'values.batchUpdate', funcion)
+
+    def append(self, spreadsheetId, range, body, valueInputOption=None, insertDataOption=None, **kwargs):
+        return _Peticion(
+            self.servicio, 'values.append',
+            lambda: self.servicio._agregar_filas(range, body.get('values', []))
+        )
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return _Peticion(self.servicio, 'values.clear', lambda: self.servicio._limpiar_rango(range))
+
+
+class _RecursoSpreadsheets:
+    """Equivalente local de service.spreadsheets()"""
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+
+    def values(self):
+        return _RecursoValues(self.servicio)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        return _Peticion(self.servicio, 'get', self.servicio._metadatos)
+
+    def batchUpdate(self, spreadsheetId, body):
+        return _Peticion(
+            self.servicio, 'batchUpdate',
+            lambda: self.servicio._aplicar_solicitudes(body.get('requests', []))
+        )
+
+
+class ServicioSheetsLocal:
+    """
+    Imitación en proceso del servicio de Google Sheets.
+    Cada hoja es {'sheetId', 'valores' (lista de filas), 'protegidos'}.
+    """
+
+    def __init__(self, titulo="DTEM local", ruta_sqlite=None, latencia_segundos=0.0):
+        self.titulo = titulo
+        self.ruta_sqlite = ruta_sqlite
+        self.latencia_segundos = latencia_segundos
+        self.hojas = {}
+        self.siguiente_sheet_id = 0
+        self.contador_llamadas = Counter()
+        self.lock = threading.RLock()
+        self.conexion = None
+
+        if ruta_sqlite:
+            self._abrir_sqlite()
+
+    # ----- API pública del servicio -----
+
+    def spreadsheets(self):
+        return _RecursoSpreadsheets(self)
+
+    def reiniciar_contadores(self):
+        """Pone en cero el contador de llamadas"""
+        with self.lock:
+            self.contador_llamadas.clear()
+
+    def resumen_llamadas(self):
+        """Devuelve {operación: número de llamadas} y el total"""
+        with self.lock:
+            resumen = dict(self.contador_llamadas)
+        resumen['total'] = sum(resumen.values())
+        return resumen
+
+    # ----- Ejecución -----
+
+    def _ejecutar(self, operacion, funcion):
+        if self.latencia_segundos > 0:
+            time.sleep(self.latencia_segundos)
+        with self.lock:
+            self.contador_llamadas[operacion] += 1
+            return funcion()
+
+    def _hoja(self, titulo, rango):
+        hoja = self.hojas.get(titulo)
+        if hoja is None:
+            raise _error_http(400, f"Unable to parse range: {rango}")
+        return hoja
+
+    # ----- Valores -----
+
+    def _leer_rango(self, rango):
+        titulo, fila_inicio, col_inicio, fila_fin, col_fin = _parsear_rango(rango)
+        valores = self._hoja(titulo, rango)['valores']
+
+        filas = valores[fila_inicio - 1:fila_fin]
+        seleccion = [list(fila[col_inicio - 1:col_fin]) for fila in filas]
+
+        respuesta = {'range': rango, 'majorDimension': 'ROWS'}
+        seleccion = _recortar(seleccion)
+        if seleccion:
+            respuesta['values'] = seleccion
+        return respuesta
+
+    def _escribir_rango(self, rango, filas_nuevas):
+        titulo, fila_inicio, col_inicio, _, _ = _parsear_rango(rango)
+        hoja = self._hoja(titulo, rango)
+        valores = hoja['valores']
+
+        ancho = 0
+        for desplazamiento, fila_nueva in enumerate(filas_nuevas):
+            indice_fila = fila_inicio - 1 + desplazamiento
+            while len(valores) <= indice_fila:
+                valores.append([])
+            fila = valores[indice_fila]
+            fin = col_inicio - 1 + len(fila_nueva)
+            if len(fila) < fin:
+                fila.extend([''] * (fin - len(fila)))
+            fila[col_inicio - 1:fin] = ['' if v is None else v for v in fila_nueva]
+            ancho = max(ancho, len(fila_nueva))
+
+        self._persistir(titulo)
+
+        filas_actualizadas = len(filas_nuevas)
+        rango_actualizado = (
+            f"{titulo}!{_numero_a_columna(col_inicio)}{fila_inicio}:"
+            f"{_numero_a_columna(col_inicio + max(ancho, 1) - 1)}{fila_inicio + max(filas_actualizadas, 1) - 1}"
+        )
+        return {
+            'updatedRange': rango_actualizado,
+            'updatedRows': filas_actualizadas,
+            'updatedColumns': ancho,
+            'updatedCells': sum(len(f) for f in filas_nuevas)
+        }
+
+    def _agregar_filas(self, rango, filas_nuevas):
+        titulo, _, _, _, _ = _parsear_rango(rango)
+        hoja = self._hoja(titulo, rango)
+        ultima_fila = len(_recortar(hoja['valores']))
+
+        respuesta = self._escribir_rango(f"{titulo}!A{ultima_fila + 1}", filas_nuevas)
+        return {'tableRange': f"{titulo}!A1", 'updates': respuesta}
+
+    def _limpiar_rango(self, rango):
+        titulo, fila_inicio, col_inicio, fila_fin, col_fin = _parsear_rango(rango)
+        hoja = self._hoja(titulo, rango)
+
+        if '!' not in rango:
+            hoja['valores'] = []
+        else:
+            for fila in hoja['valores'][fila_inicio - 1:fila_fin]:
+                fin = len(fila) if col_fin is None else min(col_fin, len(fila))
+                for indice in range(col_inicio - 1, fin):
+                    fila[indice] = ''
+
+        self._persistir(titulo)
+        return {'clearedRange': rango}
+
+    # ----- Metadatos y estructura -----
+
+    def _metadatos(self):
+        hojas = []
+        for indice, (titulo, hoja) in enumerate(self.hojas.items()):
+            valores = hoja['valores']
+            hojas.append({
+                'properties': {
+                    'sheetId': hoja['sheetId'],
+                    'title': titulo,
+                    'index': indice,
+                    'gridProperties': {
+                        'rowCount': max(1000, len(valores)),
+                        'columnCount': max(26, max((len(f) for f in valores), default=0))
+                    }
+                },
+                'protectedRanges': list(hoja['protegidos'])
+            })
+        return {'properties': {'title': self.titulo}, 'sheets': hojas}
+
+    def _titulo_por_id(self, sheet_id):
+        for titulo, hoja in self.hojas.items():
+            if hoja['sheetId'] == sheet_id:
+                return titulo
+        raise _error_http(400, f"No grid with id: {sheet_id}")
+
+    def _aplicar_solicitudes(self, solicitudes):
+        respuestas = []
+        for solicitud in solicitudes:
+            if 'addSheet' in solicitud:
+                titulo = solicitud['addSheet'].get('properties', {}).get('title', f"Hoja {self.siguiente_sheet_id + 1}")
+                if titulo in self.hojas:
+                    raise _error_http(400, f"A sheet with the name \"{titulo}\" already exists.")
+                sheet_id = self._crear_hoja(titulo)
+                respuestas.append({'addSheet': {'properties': {'sheetId': sheet_id, 'title': titulo}}})
+
+            elif 'deleteSheet' in solicitud:
+                titulo = self._titulo_por_id(solicitud['deleteSheet']['sheetId'])
+                del self.hojas[titulo]
+                self._persistir(titulo)
+                respuestas.append({})
+
+            elif 'deleteDimension' in solicitud:
+                rango = solicitud['deleteDimension']['range']
+                titulo = self._titulo_por_id(rango['sheetId'])
+                valores = self.hojas[titulo]['valores']
+                inicio, fin = rango.get('startIndex', 0), rango.get('endIndex')
+                if rango.get('dimension') == 'COLUMNS':
+                    for fila in valores:
+                        del fila[inicio:fin]
+                else:
+                    del valores[inicio:fin]
+                self._persistir(titulo)
+                respuestas.append({})
+
+            elif 'addProtectedRange' in solicitud:
+                protegido = dict(solicitud['addProtectedRange']['protectedRange'])
+                titulo = self._titulo_por_id(protegido.get('range', {}).get('sheetId'))
+                protegido['protectedRangeId'] = len(self.hojas[titulo]['protegidos']) + 1
+                self.hojas[titulo]['protegidos'].append(protegido)
+                self._persistir(titulo)
+                respuestas.append({'addProtectedRange': {'protectedRange': protegido}})
+
+            else:
+                tipo = next(iter(solicitud), 'desconocida')
+                raise _error_http(400, f"Solicitud '{tipo}' no soportada por el almacenamiento local")
+
+        return {'replies': respuestas}
+
+    def _crear_hoja(self, titulo, sheet_id=None, valores=None, protegidos=None):
+        if sheet_id is None:
+            sheet_id = self.siguiente_sheet_id
+        self.siguiente_sheet_id = max(self.siguiente_sheet_id, sheet_id + 1)
+        self.hojas[titulo] = {
+            'sheetId': sheet_id,
+            'valores': valores or [],
+            'protegidos': protegidos or []
+        }
+        self._persistir(titulo)
+        return sheet_id
+
+    # ----- Persistencia SQLite -----
+
+    def _abrir_sqlite(self):
+        self.conexion = sqlite3.connect(self.ruta_sqlite, check_same_thread=False)
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS hojas ("
+            "titulo TEXT PRIMARY KEY, sheet_id INTEGER, orden INTEGER, "
+            "valores TEXT, protegidos TEXT)"
+        )
+        self.conexion.commit()
+
+        filas = self.conexion.execute(
+            "SELECT titulo, sheet_id, valores, protegidos FROM hojas ORDER BY orden"
+        ).fetchall()
+        for titulo, sheet_id, valores, protegidos in filas:
+            self.hojas[titulo] = {
+                'sheetId': sheet_id,
+                'valores': json.loads(valores),
+                'protegidos': json.loads(protegidos or '[]')
+            }
+            self.siguiente_sheet_id = max(self.siguiente_sheet_id, sheet_id + 1)
+
+    def _persistir(self, titulo):
+        if self.conexion is None:
+            return
+        hoja = self.hojas.get(titulo)
+        if hoja is None:
+            self.conexion.execute("DELETE FROM hojas WHERE titulo = ?", (titulo,))
+        else:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO hojas (titulo, sheet_id, orden, valores, protegidos) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (titulo, hoja['sheetId'], list(self.hojas).index(titulo),
+                 json.dumps(hoja['valores'], ensure_ascii=False),
+                 json.dumps(hoja['protegidos'], ensure_ascii=False))
+            )
+        self.conexion.commit()
+
+
+class AlmacenamientoLocal(GoogleSheetsManager):
+    """
+    GoogleSheetsManager conectado a ServicioSheetsLocal.
+    Toda la lógica (caché, escrituras diferenciales, operaciones por Cod) es la misma;
+    solo cambia el transporte. No aplica cuotas ni reintentos.
+    """
+
+    def __init__(self, ruta_sqlite=None, latencia_segundos=0.0, spreadsheet_id="local",
+                 hojas_iniciales=("Registros", "Metas")):
+        self.ruta_sqlite = ruta_sqlite
+        self.latencia_segundos = latencia_segundos
+        self.spreadsheet_id_local = spreadsheet_id
+        self.hojas_iniciales = hojas_iniciales
+        super().__init__()
+
+    def conectar(self):
+        """Crea el servicio local (no usa credenciales ni red)"""
+        self.service = ServicioSheetsLocal(
+            ruta_sqlite=self.ruta_sqlite,
+            latencia_segundos=self.latencia_segundos
+        )
+        self.spreadsheet_id = self.spreadsheet_id_local
+
+        for nombre_hoja in self.hojas_iniciales:
+            if nombre_hoja not in self.service.hojas:
+                self.service._crear_hoja(nombre_hoja)
+
+    def _ejecutar(self, request, tipo='lectura'):
+        """Sin cuotas ni reintentos: el servicio local no tiene límites"""
+        return request.execute()
+
+    def reiniciar_contadores(self):
+        """Pone en cero el contador de llamadas al almacenamiento"""
+        self.service.reiniciar_contadores()
+
+    def resumen_llamadas(self):
+        """Número de llamadas al almacenamiento por operación (y total)"""
+        return self.service.resumen_llamadas()
+
+
+def cargar_desde_dataframes(backend, hojas):
+    """
+    Carga datos iniciales en un backend local: hojas = {nombre_hoja: DataFrame}.
+    Útil para pruebas de carga y benchmarks sin conexión.
+    """
+    for nombre_hoja, df in hojas.items():
+        if nombre_hoja not in backend.listar_hojas():
+            backend.crear_hoja(nombre_hoja)
+        backend.escribir_hoja(df, nombre_hoja, limpiar_hoja=True)
+    backend.reiniciar_contadores()
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    print("Probando almacenamiento local...")
+    backend = AlmacenamientoLocal(latencia_segundos=0.0)
+
+    df = pd.DataFrame({
+        'Cod': ['1', '2', '3'],
+        'Entidad': ['Entidad A', 'Entidad B', 'Entidad C'],
+        'Estado': ['En proceso', 'Completado', '']
+    })
+    cargar_desde_dataframes(backend, {'Registros': df})
+
+    leido = backend.leer_hoja('Registros', usar_cache=False)
+    print(f"Leídos {len(leido)} registros de {backend.listar_hojas()}")
+
+    leido.loc[1, 'Estado'] = 'Cancelado'
+    backend.escribir_hoja(leido, 'Registros', diferencial=True)
+    backend.agregar_filas(pd.DataFrame([{'Cod': '4', 'Entidad': 'Entidad D', 'Estado': ''}]), 'Registros')
+
+    print(f"Llamadas al almacenamiento: {backend.resumen_llamadas()}")
+    print(backend.leer_hoja('Registros', usar_cache=False))
@@ -53,18 +53,12 @@ except ImportError:
             st.dataframe(registros_df.head(20))
 
 # ===== IMPORTS DE UTILIDADES =====
-from data_utils import (
-    cargar_datos, calcular_porcentaje_avance, verificar_estado_fechas,
-    procesar_metas
-)
-from validaciones_utils import validar_reglas_negocio
-from fecha_utils import (
-    actualizar_plazo_analisis, actualizar_plazo_cronograma, 
-    actualizar_plazo_oficio_cierre
-)
+from data_utils import cargar_datos, preparar_datos, limpiar_datos_preparados
 from auth_utils import mostrar_login, mostrar_estado_autenticacion
 from config import setup_page, load_css
-from sheets_utils import test_connection, get_sheets_manager
+from sheets_utils import test_connection, get_sheets_manager, refrescar_datos
+from cola_escritura import mostrar_estado_cola_escritura
+from cambios_registros import obtener_ultimos_cambios, obtener_historial_cambios
 
 
 def mostrar_configuracion_sheets_limpia():
@@ -73,6 +67,20 @@ def mostrar_configuracion_sheets_limpia():
         if st.button("Probar Conexión"):
             with st.spinner("Probando..."):
                 test_connection()
+        
+        if st.button("Recargar Datos"):
+            refrescar_datos()
+            limpiar_datos_preparados()
+            st.rerun()
+
+        # Con el backend local se muestran las llamadas al almacenamiento de la última interacción
+        try:
+            manager = get_sheets_manager()
+            if hasattr(manager, 'resumen_llamadas'):
+                st.caption(f"Almacenamiento local - llamadas: {manager.resumen_llamadas()}")
+                manager.reiniciar_contadores()
+        except Exception:
+            pass
 
 
 def mostrar_informacion_sistema_limpia():
@@ -157,6 +165,7 @@ def main():
         mostrar_login()
         mostrar_estado_autenticacion() 
         mostrar_configuracion_sheets_limpia()
+        mostrar_estado_cola_escritura()
         mostrar_informacion_sistema_limpia()
         
         # ===== TÍTULO PRINCIPAL LIMPIO =====
@@ -177,19 +186,18 @@ def main():
                     st.success(f"{len(registros_df)} registros cargados y verificados")
                     st.success("239 filas actualizadas en 'Respaldo_Registros'")
                     st.success(f"{len(registros_df)} registros cargados")
+                    cambios = obtener_ultimos_cambios()
+                    if cambios is not None:
+                        st.info(f"🔄 {cambios.resumen()}")
+                    anteriores = [entrada for entrada in obtener_historial_cambios()
+                                  if cambios is None or entrada['fecha'] != cambios.fecha]
+                    if anteriores:
+                        st.caption("Cargas anteriores con cambios:")
+                        for entrada in reversed(anteriores):
+                            st.caption(f"{entrada['fecha'].strftime('%H:%M:%S')} - {entrada['resumen']}")
                 
-                # Aplicar validaciones automáticas
-                registros_df = validar_reglas_negocio(registros_df)
-                registros_df = actualizar_plazo_analisis(registros_df)
-                registros_df = actualizar_plazo_cronograma(registros_df)  
-                registros_df = actualizar_plazo_oficio_cierre(registros_df)
-                
-                # Procesar metas
-                metas_nuevas_df, metas_actualizar_df = procesar_metas(meta_df)
-                
-                # Agregar columnas calculadas
-                registros_df['Porcentaje Avance'] = registros_df.apply(calcular_porcentaje_avance, axis=1)
-                registros_df['Estado Fechas'] = registros_df.apply(verificar_estado_fechas, axis=1)
+                # Validaciones, plazos, metas y columnas calculadas (memorizado por contenido)
+                registros_df, metas_nuevas_df, metas_actualizar_df = preparar_datos(registros_df, meta_df)
                 
             except Exception as e:
                 st.error(f"Error en carga de datos: {str(e)}")
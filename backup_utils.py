@@ -4,15 +4,59 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from sheets_utils import get_sheets_manager
+from cola_escritura import aplicar_escrituras_pendientes
+from cambios_registros import detectar_cambios
+import hashlib
 import json
 import os
 
 
-def crear_respaldo_automatico(registros_df):
+# Hash del contenido del último respaldo escrito (por spreadsheet), para no
+# reescribir Respaldo_Registros en cada rerun si los datos no cambiaron
+CLAVE_HASH_RESPALDO = "hash_respaldo_registros"
+_hash_ultimo_respaldo = {}
+# Spreadsheets cuyo respaldo quedó al día en la última llamada (con captura de cambios
+# basta saber que ninguna fila cambió para no volver a calcular el hash)
+_respaldo_al_dia = set()
+
+
+def calcular_hash_contenido(df):
+    """
+    Hash estable del contenido de un DataFrame (columnas + valores como texto),
+    independiente del índice.
+    """
+    df_texto = df.fillna('').astype(str)
+    hash_filas = pd.util.hash_pandas_object(df_texto, index=False).values
+    digest = hashlib.sha256()
+    digest.update('\x1f'.join(str(col) for col in df_texto.columns).encode('utf-8'))
+    digest.update(hash_filas.tobytes())
+    return digest.hexdigest()
+
+
+def _respaldo_sin_cambios(sheets_manager, hash_contenido, nombre_respaldo):
+    """Indica si el respaldo existente ya corresponde a este contenido"""
+    if nombre_respaldo not in sheets_manager.listar_hojas():
+        return False
+    
+    clave = sheets_manager.spreadsheet_id
+    if clave not in _hash_ultimo_respaldo:
+        # Primera carga del proceso: recuperar el hash guardado en la hoja de metadatos
+        _hash_ultimo_respaldo[clave] = sheets_manager.leer_metadato(CLAVE_HASH_RESPALDO)
+    return _hash_ultimo_respaldo[clave] == hash_contenido
+
+
+def crear_respaldo_automatico(registros_df, cambios=None):
     """
     VERSIÓN ULTRA SEGURA: Crea respaldo automático con validaciones estrictas.
+    cambios: CambiosRegistros de la carga; si ninguna fila cambió y el respaldo
+    ya estaba al día no se hace nada.
     """
     try:
+        if (cambios is not None and not cambios.hay_cambios()
+                and get_sheets_manager().spreadsheet_id in _respaldo_al_dia):
+            return True
+        
+
         # VALIDACIÓN ESTRICTA: Solo crear respaldo si hay datos realmente válidos
         if registros_df.empty or len(registros_df) == 0:
             return False
@@ -46,15 +90,26 @@ def crear_respaldo_automatico(registros_df):
         df_respaldo = registros_validos.copy()
         df_respaldo = df_respaldo.fillna('')
         
+        # Solo escribir si el contenido cambió desde el último respaldo
+        hash_contenido = calcular_hash_contenido(df_respaldo)
+        if _respaldo_sin_cambios(sheets_manager, hash_contenido, nombre_respaldo):
+            _respaldo_al_dia.add(sheets_manager.spreadsheet_id)
+            return True
+        _respaldo_al_dia.discard(sheets_manager.spreadsheet_id)
+        
         # Crear respaldo con timestamp en metadatos
         import pytz
         bogota_tz = pytz.timezone('America/Bogota')
         timestamp = datetime.now(bogota_tz)
         
         # Escribir respaldo
-        exito = sheets_manager.escribir_hoja(df_respaldo, nombre_respaldo, limpiar_hoja=True)
+        exito = sheets_manager.escribir_hoja(df_respaldo, nombre_respaldo, limpiar_hoja=True, diferencial=True)
         
         if exito:
+            _hash_ultimo_respaldo[sheets_manager.spreadsheet_id] = hash_contenido
+            sheets_manager.guardar_metadato(CLAVE_HASH_RESPALDO, hash_contenido)
+            _respaldo_al_dia.add(sheets_manager.spreadsheet_id)
+            
             # Guardar metadatos del respaldo
             info_respaldo = {
                 'fecha': timestamp,
@@ -288,8 +343,24 @@ def cargar_datos_con_respaldo():
     try:
         sheets_manager = get_sheets_manager()
         
-        # Cargar datos desde Google Sheets
-        registros_df = sheets_manager.leer_hoja("Registros")
+        # Cargar Registros y Metas desde Google Sheets en una sola petición
+        hojas, errores = sheets_manager.leer_hojas(["Registros", "Metas"])
+        registros_df = hojas["Registros"]
+        
+        # Si la lectura falló (cuota, red) la hoja NO está vacía: no restaurar desde respaldo
+        if "Registros" in errores:
+            st.error("❌ No se pudo leer Google Sheets en este momento. Intente recargar en unos segundos.")
+            registros_previos = st.session_state.get('registros_df')
+            if registros_previos is not None and not registros_previos.empty:
+                st.info("📋 Mostrando la última versión cargada en esta sesión")
+                registros_df = registros_previos.copy()
+            else:
+                registros_df = crear_estructura_registros_minima()
+            meta_df = hojas["Metas"] if not hojas["Metas"].empty else crear_estructura_metas_inicial()
+            return registros_df, meta_df
+        
+        # Cambios del editor aún en la cola de escritura diferida
+        registros_df = aplicar_escrituras_pendientes(registros_df, "Registros")
         
         # VERIFICACIÓN AUTOMÁTICA DE INTEGRIDAD
         es_valido, mensaje = verificar_integridad_datos(registros_df)
@@ -333,19 +404,27 @@ def cargar_datos_con_respaldo():
             for columna in columnas_requeridas:
                 if columna not in registros_df.columns:
                     registros_df[columna] = ''
-            
+        
+        # ✅ Filas insertadas / modificadas / eliminadas respecto a la carga anterior
+        cambios = detectar_cambios(registros_df)
+        
+        if es_valido:
             # Crear respaldo automático de los datos válidos
-            crear_respaldo_automatico(registros_df)
+            crear_respaldo_automatico(registros_df, cambios)
             
             # Limpiar valores
             for col in registros_df.columns:
                 registros_df[col] = registros_df[col].apply(lambda x: '' if pd.isna(x) or x is None else str(x).strip())
         
-        # Cargar metas
+        # Cargar metas (ya leídas junto con Registros)
         try:
-            meta_df = sheets_manager.leer_hoja("Metas")
+            meta_df = hojas["Metas"]
             
-            if meta_df.empty:
+            if "Metas" in errores:
+                # Lectura fallida: usar la estructura inicial sin sobrescribir la hoja
+                st.warning("⚠️ No se pudo leer la hoja Metas; se usan metas por defecto en esta carga")
+                meta_df = crear_estructura_metas_inicial()
+            elif meta_df.empty:
                 meta_df = crear_estructura_metas_inicial()
                 sheets_manager.escribir_hoja(meta_df, "Metas", limpiar_hoja=True)
             else:
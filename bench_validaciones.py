@@ -0,0 +1,209 @@
+# bench_validaciones.py - Benchmark de validar_reglas_negocio (no lo importa la aplicación)
+"""
+Mide validar_reglas_negocio (máscaras por columna) sobre registros sintéticos y la
+compara con la versión original fila por fila: tiempos, aceleración y equivalencia.
+La versión fila por fila se ejecuta solo sobre una muestra de cada tamaño (tarda
+minutos con 100000 filas); su tiempo para el total se estima por fila.
+
+Uso: python bench_validaciones.py [filas ...]   (por defecto 250, 10000 y 100000 filas)
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_utils import procesar_fecha, calcular_porcentaje_avance, calcular_porcentaje_avance_vectorizado
+from validaciones_utils import CAMPOS_ESTANDARES_COMPLETO, validar_reglas_negocio
+
+TAMANOS_POR_DEFECTO = (250, 10_000, 100_000)
+FILAS_MUESTRA_EQUIVALENCIA = 250
+
+
+def validar_reglas_negocio_por_filas(df):
+    """
+    Versión original fila por fila (referencia para el benchmark).
+    Aplica nuevas reglas de negocio simplificadas:
+    1. Si suscripción acuerdo de compromiso o entrega acuerdo de compromiso no está vacío, acuerdo de compromiso = SI
+    2. Si análisis y cronograma tiene fecha, análisis de información y cronograma concertado = SI
+    3. Al introducir fecha en estándares, campos que no estén "Completo" se actualizan a "No aplica"
+    4. Si introduce fecha en publicación, disponer datos temáticos = SI automáticamente
+    5. Si oficio de cierre tiene fecha válida, actualizar estado a "Completado"
+    6. Si Estado es "Completado" pero no hay fecha de oficio de cierre, cambiar Estado a "En proceso"
+    """
+    df_actualizado = df.copy()
+
+    # Iterar sobre cada fila
+    for idx, row in df.iterrows():
+        # Regla 1: Si suscripción o entrega acuerdo de compromiso no está vacío, acuerdo de compromiso = SI
+        if 'Suscripción acuerdo de compromiso' in row and pd.notna(row['Suscripción acuerdo de compromiso']) and str(
+                row['Suscripción acuerdo de compromiso']).strip() != '':
+            df_actualizado.at[idx, 'Acuerdo de compromiso'] = 'Si'
+            # Recalcular porcentaje de avance
+            if 'Porcentaje Avance' in df_actualizado.columns:
+                df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+        if 'Entrega acuerdo de compromiso' in row and pd.notna(row['Entrega acuerdo de compromiso']) and str(
+                row['Entrega acuerdo de compromiso']).strip() != '':
+            df_actualizado.at[idx, 'Acuerdo de compromiso'] = 'Si'
+            # Recalcular porcentaje de avance
+            if 'Porcentaje Avance' in df_actualizado.columns:
+                df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+        # Regla 2: Si análisis y cronograma tiene fecha, análisis de información y cronograma concertado = SI
+        if 'Análisis y cronograma' in row and pd.notna(row['Análisis y cronograma']) and str(
+                row['Análisis y cronograma']).strip() != '':
+            fecha = procesar_fecha(row['Análisis y cronograma'])
+            if fecha is not None:
+                if 'Análisis de información' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Análisis de información'] = 'Si'
+                if 'Cronograma Concertado' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Cronograma Concertado'] = 'Si'
+                # Recalcular porcentaje de avance
+                if 'Porcentaje Avance' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+        # Regla 3: MODIFICADA - Al introducir fecha en estándares, actualizar campos no completos a "No aplica"
+        if 'Estándares' in row and pd.notna(row['Estándares']) and str(row['Estándares']).strip() != '':
+            fecha = procesar_fecha(row['Estándares'])
+            if fecha is not None:
+                # Campos de estándares a verificar
+                campos_estandares_completo = [
+                    'Registro (completo)', 'ET (completo)', 'CO (completo)',
+                    'DD (completo)', 'REC (completo)', 'SERVICIO (completo)'
+                ]
+                
+                for campo in campos_estandares_completo:
+                    if campo in df_actualizado.columns:
+                        valor_actual = df_actualizado.at[idx, campo] if pd.notna(df_actualizado.at[idx, campo]) else ""
+                        # Si no está "Completo", actualizar a "No aplica"
+                        if str(valor_actual).strip().upper() != "COMPLETO":
+                            df_actualizado.at[idx, campo] = "No aplica"
+                # Recalcular porcentaje de avance
+                if 'Porcentaje Avance' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+        # Regla 4: MODIFICADA - Si publicación tiene fecha, disponer datos temáticos = SI automáticamente
+        if 'Publicación' in row and pd.notna(row['Publicación']) and str(row['Publicación']).strip() != '':
+            fecha = procesar_fecha(row['Publicación'])
+            if fecha is not None and 'Disponer datos temáticos' in df_actualizado.columns:
+                df_actualizado.at[idx, 'Disponer datos temáticos'] = 'Si'
+                # Recalcular porcentaje de avance
+                if 'Porcentaje Avance' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+        # Regla 5: MODIFICADA - Si oficio de cierre tiene fecha, actualizar estado a "Completado" (validación simple)
+        if 'Fecha de oficio de cierre' in row and pd.notna(row['Fecha de oficio de cierre']) and str(
+                row['Fecha de oficio de cierre']).strip() != '':
+            fecha = procesar_fecha(row['Fecha de oficio de cierre'])
+            if fecha is not None:
+                # Solo verificar que Publicación esté completada
+                tiene_publicacion = ('Publicación' in row and pd.notna(row['Publicación']) and 
+                                   str(row['Publicación']).strip() != '')
+                
+                if tiene_publicacion:
+                    # Actualizar estado a "Completado"
+                    if 'Estado' in df_actualizado.columns:
+                        df_actualizado.at[idx, 'Estado'] = 'Completado'
+                    # Recalcular porcentaje de avance (será 100% automáticamente)
+                    if 'Porcentaje Avance' in df_actualizado.columns:
+                        df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+                else:
+                    # Si no tiene publicación, eliminar la fecha de oficio de cierre
+                    df_actualizado.at[idx, 'Fecha de oficio de cierre'] = ''
+                    # Y cambiar estado a "En proceso" si era "Completado"
+                    if 'Estado' in df_actualizado.columns and df_actualizado.at[idx, 'Estado'] == 'Completado':
+                        df_actualizado.at[idx, 'Estado'] = 'En proceso'
+                    # Recalcular porcentaje de avance
+                    if 'Porcentaje Avance' in df_actualizado.columns:
+                        df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+        
+        # Regla 6: Si Estado es "Completado" pero no hay fecha de oficio de cierre, cambiar Estado a "En proceso"
+        elif 'Estado' in df_actualizado.columns and df_actualizado.at[idx, 'Estado'] == 'Completado':
+            # Verificar si hay fecha de oficio de cierre válida
+            if 'Fecha de oficio de cierre' not in row or pd.isna(row['Fecha de oficio de cierre']) or row['Fecha de oficio de cierre'] == '':
+                df_actualizado.at[idx, 'Estado'] = 'En proceso'
+                # Recalcular porcentaje de avance
+                if 'Porcentaje Avance' in df_actualizado.columns:
+                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
+
+    return df_actualizado
+
+
+def generar_registros_sinteticos(n_filas, semilla=0):
+    """Registros sintéticos con mezcla de fechas válidas, inválidas y vacías"""
+    rng = np.random.default_rng(semilla)
+    
+    def fechas(probabilidad):
+        dias = rng.integers(1, 29, n_filas)
+        meses = rng.integers(1, 13, n_filas)
+        valores = np.array([f"{d:02d}/{m:02d}/2025" for d, m in zip(dias, meses)], dtype=object)
+        tipo = rng.random(n_filas)
+        valores[tipo > probabilidad] = ''
+        valores[(tipo > probabilidad * 0.95) & (tipo <= probabilidad)] = 'pendiente'
+        return valores
+    
+    def opciones(valores):
+        return rng.choice(np.array(valores, dtype=object), n_filas)
+    
+    df = pd.DataFrame({
+        'Cod': [str(i + 1) for i in range(n_filas)],
+        'Entidad': opciones(['Entidad A', 'Entidad B', 'Entidad C']),
+        'Suscripción acuerdo de compromiso': fechas(0.3),
+        'Entrega acuerdo de compromiso': fechas(0.4),
+        'Acuerdo de compromiso': opciones(['', 'Si', 'No']),
+        'Análisis y cronograma': fechas(0.5),
+        'Análisis de información': opciones(['', 'Si', 'No']),
+        'Cronograma Concertado': opciones(['', 'Si', 'No']),
+        'Estándares': fechas(0.4),
+        'Publicación': fechas(0.3),
+        'Disponer datos temáticos': opciones(['', 'Si', 'No']),
+        'Fecha de oficio de cierre': fechas(0.2),
+        'Estado': opciones(['', 'En proceso', 'Completado'])
+    })
+    for campo in CAMPOS_ESTANDARES_COMPLETO:
+        df[campo] = opciones(['', 'Completo', 'En proceso', 'No aplica'])
+    df['Porcentaje Avance'] = calcular_porcentaje_avance_vectorizado(df)
+    return df
+
+
+def benchmark_validar_reglas_negocio(tamanos=TAMANOS_POR_DEFECTO, filas_muestra=FILAS_MUESTRA_EQUIVALENCIA):
+    """
+    Mide validar_reglas_negocio (máscaras) sobre el total de filas de cada tamaño y
+    la versión fila por fila sobre una muestra al azar de filas_muestra filas, con la
+    que se comprueba la equivalencia de la salida y se estima la aceleración.
+    """
+    resultados = []
+    for n_filas in tamanos:
+        df = generar_registros_sinteticos(n_filas)
+        
+        inicio = time.perf_counter()
+        validar_reglas_negocio(df)
+        tiempo_vectorizado = time.perf_counter() - inicio
+        
+        # La versión original usa iloc[idx]: necesita un índice 0..n-1
+        muestra = df.sample(n=min(filas_muestra, n_filas), random_state=0).reset_index(drop=True)
+        vectorizado = validar_reglas_negocio(muestra)
+        inicio = time.perf_counter()
+        por_filas = validar_reglas_negocio_por_filas(muestra)
+        tiempo_por_filas = (time.perf_counter() - inicio) * n_filas / len(muestra)
+        
+        equivalente = vectorizado.fillna('').astype(str).equals(por_filas.fillna('').astype(str))
+        resultados.append({
+            'filas': n_filas,
+            'vectorizado_s': round(tiempo_vectorizado, 4),
+            'por_filas_estimado_s': round(tiempo_por_filas, 3),
+            'aceleracion': round(tiempo_por_filas / max(tiempo_vectorizado, 1e-9), 1),
+            'filas_muestra': len(muestra),
+            'equivalente': equivalente
+        })
+        print(resultados[-1])
+    
+    return pd.DataFrame(resultados)
+
+
+if __name__ == "__main__":
+    tamanos = tuple(int(arg) for arg in sys.argv[1:]) or TAMANOS_POR_DEFECTO
+    print("Benchmark validar_reglas_negocio (máscaras; por filas sobre una muestra):")
+    benchmark_validar_reglas_negocio(tamanos)
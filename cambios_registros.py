@@ -0,0 +1,123 @@
+# cambios_registros.py - Detección de cambios por fila entre cargas de Registros
+"""
+Captura de cambios (por 'Cod') entre dos cargas sucesivas de la hoja Registros:
+- Cada carga calcula una huella por fila y la compara con la carga anterior
+- El resultado (insertados / actualizados / eliminados) queda disponible con
+  obtener_ultimos_cambios() para respaldos, alertas y la bitácora de cargas
+- Los 'Cod' repetidos se distinguen por su número de aparición ('Cod#2', 'Cod#3'...)
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+MAX_HISTORIAL_CAMBIOS = 50
+
+
+class CambiosRegistros:
+    """Conjuntos de 'Cod' insertados, actualizados y eliminados respecto a la carga anterior"""
+
+    def __init__(self, insertados=(), actualizados=(), eliminados=(), total=0, primera_carga=False):
+        self.insertados = frozenset(insertados)
+        self.actualizados = frozenset(actualizados)
+        self.eliminados = frozenset(eliminados)
+        self.total = total
+        self.primera_carga = primera_carga
+        self.fecha = datetime.now()
+
+    def hay_cambios(self):
+        """Indica si algo cambió (la primera carga cuenta como cambio)"""
+        return self.primera_carga or bool(self.insertados or self.actualizados or self.eliminados)
+
+    def cods_afectados(self):
+        """'Cod' cuyas filas hay que volver a procesar (insertados + actualizados)"""
+        return self.insertados | self.actualizados
+
+    def resumen(self):
+        """Texto corto para la interfaz y la bitácora"""
+        if self.primera_carga:
+            return f"Primera carga: {self.total} registros"
+        if not self.hay_cambios():
+            return f"Sin cambios desde la carga anterior ({self.total} registros)"
+        return (f"{len(self.insertados)} nuevos, {len(self.actualizados)} modificados, "
+                f"{len(self.eliminados)} eliminados ({self.total} registros)")
+
+
+# Huellas de la carga anterior (Serie clave → hash) y últimos cambios detectados
+_snapshot = {'huellas': None}
+_ultimos_cambios = None
+_historial_cambios = deque(maxlen=MAX_HISTORIAL_CAMBIOS)
+_cambios_lock = threading.Lock()
+
+
+def huellas_por_cod(registros_df):
+    """
+    Huella (uint64) del contenido de cada fila, indexada por 'Cod'.
+    Los valores se comparan como texto sin espacios, igual que quedan tras la limpieza de la carga.
+    """
+    cods = registros_df['Cod'].fillna('').astype(str).str.strip()
+    repeticion = cods.groupby(cods).cumcount().to_numpy()
+    claves = [cod if n == 0 else f"{cod}#{n + 1}" for cod, n in zip(cods, repeticion)]
+
+    columnas = sorted(registros_df.columns, key=str)
+    texto = registros_df[columnas].fillna('').astype(str).apply(lambda columna: columna.str.strip())
+    texto.columns = [str(col) for col in columnas]
+    huellas = pd.util.hash_pandas_object(texto, index=False).to_numpy()
+    return pd.Series(huellas, index=pd.Index(claves, dtype=object))
+
+
+def detectar_cambios(registros_df):
+    """
+    NUEVA FUNCIÓN: Compara registros_df con la carga anterior y guarda el resultado
+    como últimos cambios. Devuelve un CambiosRegistros.
+    """
+    global _ultimos_cambios
+
+    if registros_df is None or 'Cod' not in registros_df.columns:
+        return obtener_ultimos_cambios()
+
+    huellas = huellas_por_cod(registros_df)
+
+    with _cambios_lock:
+        previas = _snapshot['huellas']
+        if previas is None:
+            cambios = CambiosRegistros(insertados=huellas.index, total=len(huellas), primera_carga=True)
+        else:
+            comunes = huellas.index.intersection(previas.index)
+            distintas = huellas[comunes].to_numpy() != previas[comunes].to_numpy()
+            cambios = CambiosRegistros(
+                insertados=huellas.index.difference(previas.index),
+                actualizados=comunes[distintas],
+                eliminados=previas.index.difference(huellas.index),
+                total=len(huellas)
+            )
+
+        _snapshot['huellas'] = huellas
+        _ultimos_cambios = cambios
+        if cambios.hay_cambios():
+            _historial_cambios.append({'fecha': cambios.fecha, 'resumen': cambios.resumen()})
+
+    if cambios.hay_cambios():
+        print(f"🔄 Cambios en Registros: {cambios.resumen()}")
+    return cambios
+
+
+def obtener_ultimos_cambios():
+    """Cambios de la última carga (None si todavía no hubo ninguna)"""
+    return _ultimos_cambios
+
+
+def obtener_historial_cambios():
+    """Bitácora de las últimas cargas con cambios (más reciente al final)"""
+    with _cambios_lock:
+        return list(_historial_cambios)
+
+
+def reiniciar_cambios():
+    """Olvida la carga anterior: la próxima se trata como primera carga"""
+    global _ultimos_cambios
+    with _cambios_lock:
+        _snapshot['huellas'] = None
+        _ultimos_cambios = None
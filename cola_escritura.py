@@ -0,0 +1,265 @@
+# cola_escritura.py - Escritura diferida (write-behind) hacia Google Sheets
+"""
+Cola de escritura diferida para la hoja Registros:
+- Los guardados del editor se encolan y retornan de inmediato
+- Un hilo en segundo plano aplica cada cambio con una operación por Cod
+  (actualizar_registro / agregar_registro / eliminar_registro)
+- Ediciones consecutivas del mismo registro se combinan en una sola petición
+- Si el Cod no identifica una sola fila (repetido o ausente), se guarda el
+  DataFrame completo del editor, igual que en el guardado directo
+- Mientras un cambio está pendiente, las lecturas lo superponen a los datos
+- Los fallos quedan visibles en la barra lateral con opción de reintentar; el hilo
+  no muestra mensajes (no tiene sesión de Streamlit), solo guarda su estado
+
+Se activa con SHEETS_ESCRITURA_DIFERIDA=1 (desactivada por defecto).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from sheets_utils import diferir_avisos, get_sheets_manager, tomar_avisos
+
+ESCRITURA_DIFERIDA = os.getenv('SHEETS_ESCRITURA_DIFERIDA', '0').strip().lower() in ('1', 'true', 'si', 'sí')
+
+
+def escritura_diferida_activa():
+    """Indica si los guardados del editor deben pasar por la cola"""
+    return ESCRITURA_DIFERIDA
+
+
+class ColaEscritura:
+    """Cola de mutaciones por registro (clave: hoja + Cod) con un hilo escritor"""
+
+    def __init__(self):
+        self.pendientes = OrderedDict()
+        self.en_curso = None
+        self.fallidos = []
+        self.escritas = 0
+        self.ultimo_error = None
+        self.condicion = threading.Condition()
+        self.hilo = threading.Thread(target=self._procesar, name="cola_escritura_sheets", daemon=True)
+        self.hilo.start()
+
+    # ----- Encolado y combinación -----
+
+    def encolar(self, operacion, cod, registro=None, nombre_hoja="Registros", df=None):
+        """
+        Encola 'actualizar', 'agregar' o 'eliminar' para un Cod.
+        Si ya hay un cambio pendiente del mismo registro se combinan en uno.
+        df es el DataFrame completo del editor, que se guarda entero si la operación
+        por Cod no se puede aplicar.
+        """
+        cod = str(cod).strip()
+        clave = (nombre_hoja, cod)
+        registro = dict(registro) if registro is not None else {}
+        registro = {campo: ('' if pd.isna(valor) else str(valor)) for campo, valor in registro.items()}
+
+        with self.condicion:
+            previo = self.pendientes.get(clave)
+
+            if previo is None:
+                self.pendientes[clave] = {
+                    'operacion': operacion, 'cod': cod, 'registro': registro,
+                    'nombre_hoja': nombre_hoja, 'df': df
+                }
+            elif operacion == 'eliminar':
+                if previo['operacion'] == 'agregar':
+                    # Se crea y se borra antes de escribir: no hay nada que enviar
+                    del self.pendientes[clave]
+                else:
+                    previo.update(operacion='eliminar', registro={})
+            elif previo['operacion'] == 'eliminar':
+                # La fila sigue existiendo en la hoja: basta con actualizarla
+                previo.update(operacion='actualizar', registro=registro)
+            else:
+                # agregar + actualizar → agregar con los últimos valores
+                previo['registro'] = registro
+
+            if previo is not None and df is not None:
+                previo['df'] = df
+
+            self.condicion.notify()
+
+    def reintentar_fallidos(self):
+        """Vuelve a encolar los cambios que fallaron"""
+        with self.condicion:
+            fallidos, self.fallidos = self.fallidos, []
+            self.ultimo_error = None
+        for item in fallidos:
+            self.encolar(item['operacion'], item['cod'], item['registro'], item['nombre_hoja'], item.get('df'))
+
+    # ----- Hilo escritor -----
+
+    def _procesar(self):
+        diferir_avisos()
+        while True:
+            with self.condicion:
+                while not self.pendientes:
+                    self.condicion.wait()
+                _, item = self.pendientes.popitem(last=False)
+                self.en_curso = item
+
+            try:
+                exito = self._aplicar(item)
+                error = None if exito else self._error_de_avisos() or "La hoja rechazó el cambio o el registro no existe"
+            except Exception as e:
+                exito, error = False, str(e)
+            tomar_avisos()
+
+            with self.condicion:
+                self.en_curso = None
+                if exito:
+                    self.escritas += 1
+                else:
+                    item['error'] = error
+                    self.fallidos.append(item)
+                    self.ultimo_error = f"Cod {item['cod']}: {error}"
+                self.condicion.notify_all()
+
+    def _aplicar(self, item):
+        """
+        Operación por Cod; si no se puede aplicar (Cod repetido o ausente, headers no
+        cubiertos) se guarda el DataFrame del editor completo, como el guardado directo
+        """
+        manager = get_sheets_manager()
+        if self._aplicable(manager, item):
+            if item['operacion'] == 'actualizar':
+                exito = manager.actualizar_registro(item['registro'], item['nombre_hoja'])
+            elif item['operacion'] == 'agregar':
+                exito = manager.agregar_registro(item['registro'], item['nombre_hoja'])
+            elif item['operacion'] == 'eliminar':
+                exito = manager.eliminar_registro(item['cod'], item['nombre_hoja'])
+            else:
+                exito = False
+            if exito:
+                return True
+
+        df = item.get('df')
+        if df is None:
+            return False
+        if manager.escribir_hoja_diferencial(df, item['nombre_hoja']) is None:
+            return False
+        self._tras_escritura_completa(df, item['nombre_hoja'])
+        return True
+
+    @staticmethod
+    def _aplicable(manager, item):
+        """El Cod identifica una sola fila y el registro cubre los headers de la hoja"""
+        nombre_hoja = item['nombre_hoja']
+        if item['operacion'] in ('actualizar', 'eliminar') and item['cod'] in manager.cods_repetidos(nombre_hoja):
+            return False
+        if item['operacion'] in ('actualizar', 'agregar'):
+            headers = manager.obtener_headers(nombre_hoja)
+            return bool(headers) and set(headers).issubset(item['registro'])
+        return True
+
+    def _tras_escritura_completa(self, df, nombre_hoja):
+        """Los registros por agregar que ya quedaron en la hoja pasan a actualizarse"""
+        if 'Cod' not in df.columns:
+            return
+        escritos = set(df['Cod'].astype(str).str.strip())
+        with self.condicion:
+            for item in self.pendientes.values():
+                if (item['nombre_hoja'] == nombre_hoja and item['operacion'] == 'agregar'
+                        and item['cod'] in escritos):
+                    item['operacion'] = 'actualizar'
+
+    @staticmethod
+    def _error_de_avisos():
+        """Último error o advertencia que el manager acumuló en este hilo"""
+        avisos = [mensaje for tipo, mensaje in tomar_avisos() if tipo in ('error', 'warning')]
+        return avisos[-1] if avisos else None
+
+    # ----- Consulta -----
+
+    def esperar(self, timeout=None):
+        """Espera a que la cola se vacíe; devuelve True si quedó vacía"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self.condicion:
+            while self.pendientes or self.en_curso is not None:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self.condicion.wait(restante)
+        return True
+
+    def estado(self):
+        """Resumen para la interfaz: pendientes, fallidos, escritas y último error"""
+        with self.condicion:
+            return {
+                'pendientes': len(self.pendientes) + (1 if self.en_curso is not None else 0),
+                'fallidos': len(self.fallidos),
+                'escritas': self.escritas,
+                'ultimo_error': self.ultimo_error
+            }
+
+    def aplicar_pendientes(self, df, nombre_hoja="Registros"):
+        """Superpone a un DataFrame leído de la hoja los cambios aún no escritos"""
+        with self.condicion:
+            items = [self.en_curso] if self.en_curso is not None else []
+            items += list(self.pendientes.values())
+        items = [item for item in items if item['nombre_hoja'] == nombre_hoja]
+
+        if not items or 'Cod' not in df.columns:
+            return df
+
+        df = df.copy()
+        for item in items:
+            coincide = df['Cod'].astype(str).str.strip() == item['cod']
+            if item['operacion'] == 'eliminar':
+                df = df[~coincide].reset_index(drop=True)
+            elif coincide.any():
+                for campo, valor in item['registro'].items():
+                    if campo in df.columns:
+                        df.loc[coincide, campo] = valor
+            elif item['operacion'] == 'agregar':
+                fila = {col: item['registro'].get(col, '') for col in df.columns}
+                df = pd.concat([df, pd.DataFrame([fila])], ignore_index=True)
+        return df
+
+
+# Instancia global de la cola (una por proceso)
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola_escritura():
+    """Obtiene o crea la cola de escritura del proceso"""
+    global _cola
+    if _cola is None:
+        with _cola_lock:
+            if _cola is None:
+                _cola = ColaEscritura()
+    return _cola
+
+
+def aplicar_escrituras_pendientes(df, nombre_hoja="Registros"):
+    """Superpone los cambios pendientes si la escritura diferida está activa"""
+    if not escritura_diferida_activa() or df is None or df.empty:
+        return df
+    return obtener_cola_escritura().aplicar_pendientes(df, nombre_hoja)
+
+
+def mostrar_estado_cola_escritura():
+    """Estado de la sincronización en segundo plano (barra lateral)"""
+    if not escritura_diferida_activa():
+        return
+
+    estado = obtener_cola_escritura().estado()
+
+    if estado['fallidos']:
+        st.sidebar.error(f"Sincronización: {estado['fallidos']} cambios sin guardar")
+        if estado['ultimo_error']:
+            st.sidebar.caption(estado['ultimo_error'])
+        if st.sidebar.button("Reintentar sincronización", key="reintentar_cola_escritura"):
+            obtener_cola_escritura().reintentar_fallidos()
+            st.rerun()
+    elif estado['pendientes']:
+        st.sidebar.info(f"Sincronizando {estado['pendientes']} cambios con Google Sheets...")
+    else:
+        st.sidebar.caption("Cambios sincronizados con Google Sheets")
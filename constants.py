@@ -50,6 +50,9 @@ HITOS = {
     'Publicación': 0.25
 }
 
+# Hitos que se marcan con Si/No (el resto se considera completo cuando tiene fecha)
+HITOS_SI_NO = ['Acuerdo de compromiso']
+
 # Mapeo de campos de fechas para presentación
 CAMPOS_FECHA = {
     'Análisis y cronograma': 'Análisis y cronograma (fecha programada)',
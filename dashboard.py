@@ -12,7 +12,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import io
 from datetime import datetime, timedelta
-from data_utils import formatear_fecha, es_fecha_valida, calcular_porcentaje_avance
+from data_utils import formatear_fecha, es_fecha_valida, calcular_porcentaje_avance, formatear_columna_fechas
 from visualization import comparar_avance_metas, crear_gantt
 
 
@@ -364,9 +364,7 @@ def mostrar_dashboard(df_filtrado, metas_nuevas_df, metas_actualizar_df, registr
 
         for col in columnas_fecha:
             if col in df_mostrar.columns:
-                df_mostrar[col] = df_mostrar[col].apply(
-                    lambda x: formatear_fecha(x) if es_fecha_valida(x) else ""
-                )
+                df_mostrar[col] = formatear_columna_fechas(df_mostrar[col])
 
         # Función de highlighting
         def highlight_estado_fechas_optimizado(s):
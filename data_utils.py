@@ -3,10 +3,20 @@ import numpy as np
 import io
 import re
 import os
+import threading
 import streamlit as st
-from datetime import datetime, timedelta, date  
-from constants import REGISTROS_DATA, META_DATA
+from collections import OrderedDict
+from datetime import datetime, date  
+from constants import REGISTROS_DATA, META_DATA, HITOS, HITOS_SI_NO, DIAS_ALERTA
 from sheets_utils import get_sheets_manager
+# Implementación única de fechas (re-exportada: otros módulos la importan desde aquí)
+from parseo_fechas import (
+    procesar_fecha, es_fecha_valida, formatear_fecha,
+    procesar_columna_fechas, formatear_columna_fechas
+)
+
+# Filas comparadas con el servidor tras guardar Registros (0 = solo contadores de la API)
+FILAS_MUESTRA_VERIFICACION = int(os.getenv('SHEETS_FILAS_MUESTRA_VERIFICACION', '3'))
 
 def normalizar_csv(contenido, separador=';'):
     """Normaliza el contenido de un CSV para asegurar mismo número de columnas."""
@@ -110,6 +120,10 @@ def cargar_datos_basico():
         else:
             st.success(f"✅ {len(registros_df)} registros cargados (modo básico)")
         
+        # Filas insertadas / modificadas / eliminadas respecto a la carga anterior
+        from cambios_registros import detectar_cambios
+        detectar_cambios(registros_df)
+        
         # Cargar metas
         try:
             meta_df = sheets_manager.leer_hoja("Metas")
@@ -195,66 +209,6 @@ def crear_estructura_metas_inicial():
         9: [0, 0, 0],  # Publicación actualizar
     })
 
-def procesar_fecha(fecha_str):
-    """
-    Procesa una fecha de manera segura manejando NaT.
-    CORRECCIÓN CRÍTICA: SIEMPRE devuelve datetime, NUNCA date
-    """
-    if pd.isna(fecha_str) or fecha_str == '' or fecha_str is None:
-        return None
-
-    # Si es un objeto datetime o Timestamp, retornarlo directamente
-    if isinstance(fecha_str, (pd.Timestamp, datetime)):
-        if pd.isna(fecha_str):
-            return None
-        # ASEGURAR que es datetime
-        if isinstance(fecha_str, pd.Timestamp):
-            return fecha_str.to_pydatetime()
-        return fecha_str
-    
-    # CORRECCIÓN CRÍTICA: Si es date, convertir SIEMPRE a datetime
-    if isinstance(fecha_str, date):
-        return datetime.combine(fecha_str, datetime.min.time())
-
-    # Si es un string, procesarlo
-    try:
-        fecha_str = re.sub(r'[^\d/\-]', '', str(fecha_str).strip())
-        formatos = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']
-
-        for formato in formatos:
-            try:
-                fecha = pd.to_datetime(fecha_str, format=formato)
-                if pd.notna(fecha):
-                    # CRÍTICO: Convertir a datetime puro si es Timestamp
-                    if hasattr(fecha, 'to_pydatetime'):
-                        return fecha.to_pydatetime()
-                    return fecha
-            except:
-                continue
-        return None
-    except Exception:
-        return None
-
-def es_fecha_valida(valor):
-    """Verifica si un valor es una fecha válida."""
-    try:
-        fecha = procesar_fecha(valor)
-        return fecha is not None and pd.notna(fecha)
-    except Exception:
-        return False
-
-
-def formatear_fecha(fecha_str):
-    """Formatea una fecha en formato DD/MM/YYYY manejando NaT."""
-    try:
-        fecha = procesar_fecha(fecha_str)
-        if fecha is not None and pd.notna(fecha):
-            return fecha.strftime('%d/%m/%Y')
-        return ""
-    except Exception:
-        # Si hay cualquier error, devuelve cadena vacía
-        return ""
-
 def verificar_completado_por_fecha(fecha_programada, fecha_completado=None):
     """
     Verifica si una tarea está completada basada en fechas.
@@ -275,128 +229,142 @@ def verificar_completado_por_fecha(fecha_programada, fecha_completado=None):
 
 def calcular_porcentaje_avance(registro):
     """
-    MODIFICADO: Calcula el porcentaje de avance de un registro basado en los campos de completitud.
-    NUEVA REGLA: Si tiene fecha de oficio de cierre, automáticamente 100% de avance.
-
-    Ponderación (cuando no hay fecha de cierre):
-    - Acuerdo de compromiso: 20%
-    - Análisis y cronograma (fecha real): 20%
-    - Estándares (fecha real): 30%
-    - Publicación (fecha real): 25%
-    - Fecha de oficio de cierre: 5%
+    Calcula el porcentaje de avance de un registro (una fila o dict).
+    Usa el mismo motor que calcular_porcentaje_avance_vectorizado: pesos de constants.HITOS
+    y 100% automático si tiene fecha de oficio de cierre.
     """
     try:
-        # NUEVA REGLA: Si tiene fecha de oficio de cierre, automáticamente 100%
-        if ('Fecha de oficio de cierre' in registro and 
-            registro['Fecha de oficio de cierre'] and 
-            pd.notna(registro['Fecha de oficio de cierre']) and
-            str(registro['Fecha de oficio de cierre']).strip() != ''):
-            return 100
-
-        # Si no hay fecha de cierre, calcular normalmente
-        # Inicializar el avance
-        avance = 0
-
-        # Verificar el acuerdo de compromiso (20%)
-        if 'Acuerdo de compromiso' in registro and str(registro['Acuerdo de compromiso']).strip().upper() in ['SI',
-                                                                                                              'SÍ', 'S',
-                                                                                                              'YES',
-                                                                                                              'Y',
-                                                                                                              'COMPLETO']:
-            avance += 20
-
-        # Verificar análisis y cronograma - VERIFICADO: basado en la fecha (20%)
-        if ('Análisis y cronograma' in registro and 
-            registro['Análisis y cronograma'] and 
-            pd.notna(registro['Análisis y cronograma']) and
-            str(registro['Análisis y cronograma']).strip() != ''):
-            avance += 20
-
-        # Verificar estándares - basado en la fecha (30%)
-        if ('Estándares' in registro and 
-            registro['Estándares'] and 
-            pd.notna(registro['Estándares']) and
-            str(registro['Estándares']).strip() != ''):
-            avance += 30
-
-        # Verificar publicación - VERIFICADO: basado en la fecha (25%)
-        if ('Publicación' in registro and 
-            registro['Publicación'] and 
-            pd.notna(registro['Publicación']) and
-            str(registro['Publicación']).strip() != ''):
-            avance += 25
-
-        # Nota: No sumamos los 5% del oficio de cierre aquí porque si llegáramos a este punto
-        # significa que no hay fecha de cierre, por lo que el máximo sería 95%
-
-        return avance
+        return int(calcular_porcentaje_avance_vectorizado(pd.DataFrame([registro])).iloc[0])
     except Exception as e:
         # En caso de error, retornar 0
         st.warning(f"Error al calcular porcentaje de avance: {e}")
         return 0
         
 
-def procesar_metas(meta_df):
-    """Procesa las metas a partir del DataFrame de metas."""
-    try:
-        # La estructura de las metas es compleja, vamos a procesarla
-        # Asumiendo que las filas 3 en adelante contienen las fechas y metas
-        fechas = []
-        metas_nuevas = {}
-        metas_actualizar = {}
-
-        # Inicializar listas para cada hito
-        for hito in ['Acuerdo de compromiso', 'Análisis y cronograma', 'Estándares', 'Publicación']:
-            metas_nuevas[hito] = []
-            metas_actualizar[hito] = []
-
-        # Procesar cada fila (desde la fila 3 que contiene las fechas y valores)
-        for i in range(len(meta_df)):
-            try:
-                fila = meta_df.iloc[i]
-
-                # La primera columna contiene la fecha
-                fecha = procesar_fecha(fila[0])
-                if fecha is not None:
-                    fechas.append(fecha)
-
-                    # Columnas 1-4 son para registros nuevos (asegurar que existan)
-                    metas_nuevas['Acuerdo de compromiso'].append(
-                        pd.to_numeric(fila[1] if len(fila) > 1 else 0, errors='coerce') or 0)
-                    metas_nuevas['Análisis y cronograma'].append(
-                        pd.to_numeric(fila[2] if len(fila) > 2 else 0, errors='coerce') or 0)
-                    metas_nuevas['Estándares'].append(
-                        pd.to_numeric(fila[3] if len(fila) > 3 else 0, errors='coerce') or 0)
-                    metas_nuevas['Publicación'].append(
-                        pd.to_numeric(fila[4] if len(fila) > 4 else 0, errors='coerce') or 0)
-
-                    # Columnas 6-9 son para registros a actualizar (asegurar que existan)
-                    metas_actualizar['Acuerdo de compromiso'].append(
-                        pd.to_numeric(fila[6] if len(fila) > 6 else 0, errors='coerce') or 0)
-                    metas_actualizar['Análisis y cronograma'].append(
-                        pd.to_numeric(fila[7] if len(fila) > 7 else 0, errors='coerce') or 0)
-                    metas_actualizar['Estándares'].append(
-                        pd.to_numeric(fila[8] if len(fila) > 8 else 0, errors='coerce') or 0)
-                    metas_actualizar['Publicación'].append(
-                        pd.to_numeric(fila[9] if len(fila) > 9 else 0, errors='coerce') or 0)
-            except Exception as e:
-                st.warning(f"Error al procesar fila {i} de metas: {e}")
+VALORES_AFIRMATIVOS = ['SI', 'SÍ', 'S', 'YES', 'Y', 'COMPLETO']
+
+
+def _columna_con_valor(df, columna):
+    """Máscara de celdas no vacías (NaN, vacío, 0 y False no cuentan)"""
+    if columna not in df.columns:
+        return pd.Series(False, index=df.index)
+    serie = df[columna]
+    return serie.notna() & serie.astype(str).str.strip().ne('') & ~serie.isin([0, False])
+
+
+def calcular_porcentaje_avance_vectorizado(df, pesos=None, campo_cierre='Fecha de oficio de cierre'):
+    """
+    Motor único de 'Porcentaje Avance' sobre columnas completas.
+    - pesos: hito → peso (por defecto constants.HITOS), normalizados a 100
+    - Hitos Si/No (constants.HITOS_SI_NO) cuentan con respuesta afirmativa; los de fecha, con valor
+    - Con fecha en campo_cierre el avance es 100%
+    Devuelve una Serie entera alineada con df.index.
+    """
+    pesos = HITOS if pesos is None else pesos
+    total_pesos = sum(pesos.values())
+    
+    avance = np.zeros(len(df), dtype=np.float64)
+    for hito, peso in pesos.items():
+        if hito in HITOS_SI_NO:
+            if hito not in df.columns:
                 continue
+            completo = df[hito].astype(str).str.strip().str.upper().isin(VALORES_AFIRMATIVOS)
+        else:
+            completo = _columna_con_valor(df, hito)
+        avance += peso * completo.to_numpy(dtype=np.float64)
+    
+    if total_pesos:
+        avance = np.rint(avance * (100.0 / total_pesos))
+    
+    cierre = _columna_con_valor(df, campo_cierre).to_numpy()
+    return pd.Series(np.where(cierre, 100, avance).astype(np.int64), index=df.index)
+        
 
-        # Si no hay fechas, mostrar un error
-        if not fechas:
-            st.warning("No se pudieron procesar las fechas de las metas, usando datos por defecto")
-            # Crear un DataFrame de ejemplo como respaldo
-            fechas = [datetime.now()]
-            for hito in metas_nuevas:
-                metas_nuevas[hito] = [0]
-                metas_actualizar[hito] = [0]
+# Estructura de la hoja Metas: columna 0 = fecha, 1-4 = metas de registros nuevos,
+# 5 = separador, 6-9 = metas de registros a actualizar (un hito por columna)
+HITOS_METAS = ['Acuerdo de compromiso', 'Análisis y cronograma', 'Estándares', 'Publicación']
+TIPOS_META = ['Nuevo', 'Actualizar']
+COLUMNAS_METAS = {'Nuevo': [1, 2, 3, 4], 'Actualizar': [6, 7, 8, 9]}
 
-        # Convertir a DataFrames
-        metas_nuevas_df = pd.DataFrame(metas_nuevas, index=fechas)
-        metas_actualizar_df = pd.DataFrame(metas_actualizar, index=fechas)
+# Metas ya interpretadas por hash de contenido de la hoja
+MAX_TENSORES_METAS = 4
+_tensores_metas = OrderedDict()
+_tensores_metas_lock = threading.Lock()
 
-        return metas_nuevas_df, metas_actualizar_df
+
+class TensorMetas:
+    """
+    Metas interpretadas: eje de fechas datetime64[D] ordenado y valores int32 de forma
+    [fechas × TIPOS_META × HITOS_METAS]. vista() entrega los DataFrames de siempre.
+    """
+    
+    def __init__(self, fechas, valores):
+        orden = np.argsort(fechas, kind='stable')
+        self.fechas = fechas[orden]
+        self.valores = valores[orden]
+    
+    @classmethod
+    def desde_hoja(cls, meta_df):
+        """Interpreta la hoja Metas por columnas (filas sin fecha en la columna 0 se ignoran)"""
+        if meta_df is None or meta_df.empty:
+            return cls(np.array([], dtype='datetime64[D]'), np.zeros((0, 2, 4), dtype=np.int32))
+        
+        fechas = procesar_columna_fechas(meta_df.iloc[:, 0]).to_numpy('datetime64[D]')
+        filas = np.flatnonzero(~np.isnat(fechas))
+        
+        valores = np.zeros((len(filas), len(TIPOS_META), len(HITOS_METAS)), dtype=np.int32)
+        for t, tipo in enumerate(TIPOS_META):
+            for h, columna in enumerate(COLUMNAS_METAS[tipo]):
+                if columna < meta_df.shape[1]:
+                    numeros = pd.to_numeric(meta_df.iloc[filas, columna], errors='coerce').fillna(0)
+                    valores[:, t, h] = np.rint(numeros.to_numpy(dtype=float))
+        
+        return cls(fechas[filas], valores)
+    
+    def __len__(self):
+        return len(self.fechas)
+    
+    def vista(self, tipo):
+        """DataFrame (fechas × hitos) de 'Nuevo' o 'Actualizar' sobre el mismo arreglo"""
+        return pd.DataFrame(
+            self.valores[:, TIPOS_META.index(tipo), :],
+            index=pd.DatetimeIndex(self.fechas.astype('datetime64[ns]')),
+            columns=HITOS_METAS
+        )
+
+
+def obtener_tensor_metas(meta_df):
+    """NUEVA FUNCIÓN: TensorMetas de la hoja, memorizado por hash de contenido"""
+    from backup_utils import calcular_hash_contenido
+    
+    huella = calcular_hash_contenido(meta_df) if meta_df is not None else None
+    with _tensores_metas_lock:
+        tensor = _tensores_metas.get(huella)
+        if tensor is not None:
+            _tensores_metas.move_to_end(huella)
+            return tensor
+    
+    tensor = TensorMetas.desde_hoja(meta_df)
+    with _tensores_metas_lock:
+        _tensores_metas[huella] = tensor
+        while len(_tensores_metas) > MAX_TENSORES_METAS:
+            _tensores_metas.popitem(last=False)
+    return tensor
+
+
+def procesar_metas(meta_df):
+    """Procesa las metas a partir del DataFrame de metas (vistas de TensorMetas)."""
+    try:
+        tensor = obtener_tensor_metas(meta_df)
+        
+        # Si no hay fechas, mostrar un error
+        if len(tensor) == 0:
+            st.warning("No se pudieron procesar las fechas de las metas, usando datos por defecto")
+            # Una fecha (hoy) con metas en cero como respaldo
+            tensor = TensorMetas(np.array([np.datetime64(date.today(), 'D')]),
+                                 np.zeros((1, 2, 4), dtype=np.int32))
+        
+        return tensor.vista('Nuevo'), tensor.vista('Actualizar')
     except Exception as e:
         st.error(f"Error al procesar metas: {e}")
         # Crear DataFrames vacíos como respaldo
@@ -411,31 +379,226 @@ def procesar_metas(meta_df):
 
         return metas_nuevas_df, metas_actualizar_df
 
-def verificar_estado_fechas(row):
+# Resultados de preparar_datos por huella de entradas (registros + metas + fecha del día)
+MAX_ENTRADAS_PREPARADOS = 8
+_datos_preparados = OrderedDict()
+_preparados_lock = threading.Lock()
+
+
+def _huella_entradas(registros_df, meta_df):
+    """Huella del contenido de las entradas y del día actual (los plazos dependen de hoy)"""
+    from backup_utils import calcular_hash_contenido
+    return (
+        calcular_hash_contenido(registros_df),
+        calcular_hash_contenido(meta_df) if meta_df is not None else None,
+        date.today().isoformat()
+    )
+
+
+def preparar_datos(registros_df, meta_df):
     """
-    Verifica si las fechas están vencidas o próximas a vencer.
-    CORRECCIÓN CRÍTICA: Comparaciones datetime seguras
+    NUEVA FUNCIÓN: Etapa única de datos derivados para la interfaz:
+    validaciones, plazos, metas procesadas, 'Porcentaje Avance' y 'Estado Fechas'.
+    El resultado se memoriza por huella de las entradas, así que los reruns que solo
+    cambian widgets no recalculan nada. Devuelve copias (registros, metas_nuevas, metas_actualizar).
     """
-    fecha_actual = datetime.now()  # SIEMPRE datetime
-    estado = "normal"
+    from validaciones_utils import validar_reglas_negocio
+    from fecha_utils import actualizar_plazos_incremental
+    
+    huella = _huella_entradas(registros_df, meta_df)
+    with _preparados_lock:
+        resultado = _datos_preparados.get(huella)
+        if resultado is not None:
+            _datos_preparados.move_to_end(huella)
+    
+    if resultado is None:
+        registros = validar_reglas_negocio(registros_df.copy())
+        registros = actualizar_plazos_incremental(registros)
+        
+        metas_nuevas_df, metas_actualizar_df = procesar_metas(meta_df)
+        
+        registros['Porcentaje Avance'] = calcular_porcentaje_avance_vectorizado(registros)
+        matriz = MatrizPlazos(registros)
+        registros['Estado Fechas'] = matriz.estado_fechas()
+        
+        resultado = (registros, metas_nuevas_df, metas_actualizar_df, matriz)
+        with _preparados_lock:
+            _datos_preparados[huella] = resultado
+            while len(_datos_preparados) > MAX_ENTRADAS_PREPARADOS:
+                _datos_preparados.popitem(last=False)
+    
+    global _matriz_plazos_actual
+    _matriz_plazos_actual = resultado[3]
+    
+    # Copias: los llamadores (editor, filtros) modifican los DataFrames
+    return tuple(df.copy() for df in resultado[:3])
+
+
+def limpiar_datos_preparados():
+    """Descarta los datos derivados memorizados (incluidas las huellas de plazos)"""
+    from fecha_utils import limpiar_plazos_incrementales
+    global _matriz_plazos_actual
+    with _preparados_lock:
+        _datos_preparados.clear()
+        _matriz_plazos_actual = None
+    limpiar_plazos_incrementales()
+
+CAMPOS_ESTADO_FECHAS = [
+    'Análisis y cronograma (fecha programada)',
+    'Estándares (fecha programada)',
+    'Fecha de publicación programada'
+]
+CATEGORIAS_ESTADO_FECHAS = ['normal', 'proximo', 'vencido']
+
+
+def columnas_a_datetime64(df, columnas):
+    """Convierte columnas de fecha (texto o datetime) a datetime64[ns]. Columnas ausentes → NaT."""
+    resultado = {}
+    for columna in columnas:
+        if columna not in df.columns:
+            resultado[columna] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        else:
+            resultado[columna] = procesar_columna_fechas(df[columna])
+    return pd.DataFrame(resultado, index=df.index)
 
-    campos_fecha = [
-        'Análisis y cronograma (fecha programada)',
-        'Estándares (fecha programada)',
-        'Fecha de publicación programada'
-    ]
 
-    for campo in campos_fecha:
-        if campo in row and pd.notna(row[campo]) and str(row[campo]).strip() != '':
-            fecha = procesar_fecha(row[campo])  # SIEMPRE devuelve datetime o None
-            if fecha is not None and pd.notna(fecha):
-                # Ya no necesitamos conversión manual
-                if fecha < fecha_actual:
-                    return "vencido"
-                if fecha <= fecha_actual + timedelta(days=30):
-                    estado = "proximo"
+def dia_de_referencia(hoy=None):
+    """'Hoy' para plazos y estados: el día (medianoche) de hoy o de la fecha indicada"""
+    return (pd.Timestamp.now() if hoy is None else pd.Timestamp(hoy)).normalize()
+
+
+def clasificar_estado_fechas(fechas_df, hoy=None, dias_alerta=DIAS_ALERTA):
+    """
+    NUEVA FUNCIÓN: estado de las fechas (vencido / proximo / normal) por columnas.
+    fechas_df: columnas datetime64 ya procesadas (ver columnas_a_datetime64).
+    Se compara por días: 'vencido' si alguna fecha es hoy o anterior; 'proximo' si alguna
+    cae dentro de dias_alerta días; si no, 'normal'. Devuelve una Serie categórica.
+    """
+    fechas = fechas_df.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    referencia = np.datetime64(dia_de_referencia(hoy).date(), 'D')
+    limite = referencia + np.timedelta64(dias_alerta, 'D')
+    
+    # NaT compara False en ambas condiciones
+    vencido = (fechas <= referencia).any(axis=1)
+    proximo = (fechas <= limite).any(axis=1)
+    codigos = np.where(vencido, 2, np.where(proximo, 1, 0))
+    
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, categories=CATEGORIAS_ESTADO_FECHAS),
+        index=fechas_df.index
+    )
+
+
+# Hitos con plazo: fecha programada → columna cuya fecha indica que el hito se completó
+HITOS_PLAZO = {
+    'Análisis y cronograma (fecha programada)': 'Análisis y cronograma',
+    'Estándares (fecha programada)': 'Estándares',
+    'Fecha de publicación programada': 'Publicación',
+    'Plazo de oficio de cierre': 'Fecha de oficio de cierre'
+}
+
+
+class MatrizPlazos:
+    """
+    Días hasta el vencimiento (int32) por registro × hito de HITOS_PLAZO, con máscara
+    de celdas con fecha y bitmask de hitos completados (bit k = hito k).
+    Se calcula una vez por versión de datos (preparar_datos); las pestañas la recortan
+    con filas() en lugar de volver a interpretar fechas.
+    """
+    SIN_FECHA = np.iinfo(np.int32).max
+    
+    def __init__(self, registros_df, hoy=None, hitos=None):
+        hitos = HITOS_PLAZO if hitos is None else hitos
+        self.hoy = dia_de_referencia(hoy)
+        self.campos = list(hitos.keys())
+        self.index = registros_df.index
+        self.huellas = self._huellas_filas(registros_df, hitos)
+        self._hitos = hitos
+        
+        programadas = columnas_a_datetime64(registros_df, self.campos).to_numpy('datetime64[D]')
+        self.tiene_fecha = ~np.isnat(programadas)
+        dias = (programadas - np.datetime64(self.hoy.date(), 'D')).astype(np.int64)
+        self.dias = np.where(self.tiene_fecha, dias, self.SIN_FECHA).astype(np.int32)
+        
+        reales = columnas_a_datetime64(registros_df, list(hitos.values())).to_numpy('datetime64[D]')
+        self.completado = np.zeros(len(registros_df), dtype=np.uint8)
+        for k in range(len(self.campos)):
+            self.completado |= (~np.isnat(reales[:, k])).astype(np.uint8) << k
+    
+    @staticmethod
+    def _huellas_filas(df, hitos):
+        """Hash por fila de las columnas de origen (detecta filas editadas)"""
+        columnas = [col for col in list(hitos.keys()) + list(hitos.values()) if col in df.columns]
+        if not columnas or df.empty:
+            return np.zeros(len(df), dtype=np.uint64)
+        return pd.util.hash_pandas_object(df[columnas].astype(str), index=False).to_numpy()
+    
+    def _posicion(self, campo):
+        return self.campos.index(campo)
+    
+    def dias_de(self, campo):
+        """Días hasta el vencimiento del hito (SIN_FECHA donde no hay fecha)"""
+        return self.dias[:, self._posicion(campo)]
+    
+    def tiene_fecha_de(self, campo):
+        return self.tiene_fecha[:, self._posicion(campo)]
+    
+    def completado_de(self, campo):
+        return (self.completado >> self._posicion(campo) & 1).astype(bool)
+    
+    def vigente(self):
+        """La matriz corresponde al día actual"""
+        return self.hoy == dia_de_referencia()
+    
+    def cubre(self, registros_df):
+        """Las filas de registros_df existen en la matriz y no cambiaron desde su cálculo"""
+        posiciones = self.index.get_indexer(registros_df.index)
+        if (posiciones < 0).any():
+            return False
+        return np.array_equal(self.huellas[posiciones], self._huellas_filas(registros_df, self._hitos))
+    
+    def filas(self, index):
+        """Submatriz alineada con las etiquetas de index"""
+        posiciones = self.index.get_indexer(index)
+        submatriz = MatrizPlazos.__new__(MatrizPlazos)
+        submatriz.hoy = self.hoy
+        submatriz.campos = self.campos
+        submatriz._hitos = self._hitos
+        submatriz.index = pd.Index(index)
+        submatriz.huellas = self.huellas[posiciones]
+        submatriz.dias = self.dias[posiciones]
+        submatriz.tiene_fecha = self.tiene_fecha[posiciones]
+        submatriz.completado = self.completado[posiciones]
+        return submatriz
+    
+    def estado_fechas(self, campos=None, dias_alerta=DIAS_ALERTA):
+        """'Estado Fechas' categórico de la matriz (clasificar_estado_fechas con su mismo 'hoy')"""
+        campos = CAMPOS_ESTADO_FECHAS if campos is None else campos
+        columnas = [self._posicion(campo) for campo in campos]
+        referencia = np.datetime64(self.hoy.date(), 'D')
+        fechas = np.where(
+            self.tiene_fecha[:, columnas],
+            referencia + self.dias[:, columnas].astype('timedelta64[D]'),
+            np.datetime64('NaT', 'D')
+        )
+        fechas_df = pd.DataFrame(fechas.astype('datetime64[ns]'), index=self.index, columns=campos)
+        return clasificar_estado_fechas(fechas_df, hoy=self.hoy, dias_alerta=dias_alerta)
+
+
+# Matriz de la última versión de datos preparada (ver preparar_datos)
+_matriz_plazos_actual = None
+
+
+def obtener_matriz_plazos(registros_df):
+    """
+    NUEVA FUNCIÓN: Matriz de plazos para registros_df. Usa la de la versión de datos actual
+    recortada a sus filas; solo se recalcula si las filas no corresponden o cambió el día.
+    """
+    matriz = _matriz_plazos_actual
+    if matriz is not None and matriz.vigente() and matriz.cubre(registros_df):
+        return matriz.filas(registros_df.index)
+    return MatrizPlazos(registros_df)
 
-    return estado
 
 def validar_campos_fecha(df, campos_fecha=['Análisis y cronograma', 'Estándares', 'Publicación']):
     """
@@ -446,12 +609,39 @@ def validar_campos_fecha(df, campos_fecha=['Análisis y cronograma', 'Estándare
 
     for campo in campos_fecha:
         if campo in df_validado.columns:
-            df_validado[campo] = df_validado[campo].apply(
-                lambda x: formatear_fecha(x) if es_fecha_valida(x) else ""
-            )
+            df_validado[campo] = formatear_columna_fechas(df_validado[campo])
 
     return df_validado
 
+def verificar_metas_tras_operacion(sheets_manager, silencioso=False):
+    """
+    NUEVA FUNCIÓN: Verifica Metas después de escribir en Registros.
+    Metas tiene un rango protegido (solo la cuenta de servicio puede editarla); una
+    sonda de una celda y, si cambió, una lectura comparada por hash de contenido con
+    el resguardo en memoria deciden si hay que avisar o restaurar.
+    """
+    try:
+        estado, resguardo = sheets_manager.verificar_hoja_protegida("Metas")
+        
+        if estado == 'vacia' and resguardo is not None and not resguardo.empty:
+            if not silencioso:
+                st.warning("🚨 ALERTA: Tabla Metas se borró - Restaurando automáticamente...")
+            if sheets_manager.escribir_hoja(resguardo, "Metas", limpiar_hoja=True):
+                st.info("🔄 Tabla Metas restaurada automáticamente")
+            else:
+                st.error("❌ ERROR CRÍTICO: No se pudo restaurar tabla Metas")
+        elif estado == 'modificada' and not silencioso:
+            st.info("ℹ️ Tabla Metas fue modificada fuera de la aplicación")
+        elif estado == 'error_lectura' and not silencioso:
+            st.warning("⚠️ No se pudo leer la tabla Metas para verificarla; se revisará en la próxima operación")
+        
+        return estado
+        
+    except Exception as e:
+        if not silencioso:
+            st.error(f"❌ Error verificando/restaurando Metas: {e}")
+        return None
+
 # Extracto de data_utils.py - FUNCIÓN DE GUARDADO CORREGIDA
 
 def guardar_datos_editados(df, crear_backup=True):
@@ -468,15 +658,6 @@ def guardar_datos_editados(df, crear_backup=True):
         
         sheets_manager = get_sheets_manager()
         
-        # ✅ PROTECCIÓN METAS: Crear backup de Metas ANTES de cualquier operación
-        metas_backup = None
-        try:
-            metas_backup = sheets_manager.leer_hoja("Metas")
-            if metas_backup.empty:
-                metas_backup = None
-        except:
-            metas_backup = None
-        
         # NUEVO: Crear respaldo automático antes de guardar
         if crear_backup:
             try:
@@ -499,28 +680,24 @@ def guardar_datos_editados(df, crear_backup=True):
         import streamlit as st
         st.info("💾 Guardando en hoja 'Registros' de Google Sheets...")
         
-        exito = sheets_manager.escribir_hoja(df_validado, "Registros", limpiar_hoja=True)
+        reporte = sheets_manager.escribir_hoja_diferencial(df_validado, "Registros")
         
-        # ✅ VERIFICACIÓN Y RESTAURACIÓN AUTOMÁTICA DE METAS
-        if metas_backup is not None:
-            try:
-                # Verificar si Metas se mantuvo intacta
-                metas_actual = sheets_manager.leer_hoja("Metas")
-                if metas_actual.empty:
-                    # ¡EMERGENCIA! Metas se borró, restaurar inmediatamente
-                    st.warning("🚨 ALERTA: Tabla Metas se borró - Restaurando automáticamente...")
-                    restaurar_exito = sheets_manager.escribir_hoja(metas_backup, "Metas", limpiar_hoja=True)
-                    if restaurar_exito:
-                        st.success("✅ Tabla Metas restaurada exitosamente")
-                    else:
-                        st.error("❌ ERROR CRÍTICO: No se pudo restaurar tabla Metas")
-            except Exception as verificacion_error:
-                st.error(f"❌ Error verificando/restaurando Metas: {verificacion_error}")
+        # ✅ VERIFICACIÓN DE METAS: sonda de una celda; lectura completa solo si cambió
+        verificar_metas_tras_operacion(sheets_manager)
         
-        if exito:
-            # NUEVO: Verificar que los datos se guardaron correctamente
+        if reporte is not None:
+            # Verificar con los contadores de la respuesta y una muestra de filas;
+            # solo se relee la hoja completa si no coinciden
             try:
-                df_verificacion = sheets_manager.leer_hoja("Registros")
+                verificado, detalle = sheets_manager.verificar_escritura(
+                    reporte, muestras=FILAS_MUESTRA_VERIFICACION
+                )
+                if verificado:
+                    st.success("✅ Guardado verificado en Google Sheets - Hoja 'Registros'")
+                    return True, "✅ Datos guardados y verificados exitosamente en Google Sheets."
+                
+                st.info(f"🔍 {detalle} - verificando con lectura completa...")
+                df_verificacion = sheets_manager.leer_hoja("Registros", usar_cache=False)
                 if not df_verificacion.empty and len(df_verificacion) >= len(df_validado) * 0.9:
                     st.success("✅ Guardado verificado en Google Sheets - Hoja 'Registros'")
                     return True, "✅ Datos guardados y verificados exitosamente en Google Sheets."
@@ -551,15 +728,6 @@ def guardar_datos_editados_rapido(df, numero_fila=None):
         
         sheets_manager = get_sheets_manager()
         
-        # ✅ PROTECCIÓN METAS: Backup rápido de Metas
-        metas_backup = None
-        try:
-            metas_backup = sheets_manager.leer_hoja("Metas")
-            if metas_backup.empty:
-                metas_backup = None
-        except:
-            metas_backup = None
-        
         # NUEVO: Verificación básica antes de guardar
         if df.empty:
             st.error("❌ No se puede guardar: DataFrame vacío")
@@ -570,18 +738,10 @@ def guardar_datos_editados_rapido(df, numero_fila=None):
             exito = sheets_manager.actualizar_fila(df, numero_fila, "Registros")
         else:
             # Guardar todo el DataFrame
-            exito = sheets_manager.escribir_hoja(df, "Registros", limpiar_hoja=True)
+            exito = sheets_manager.escribir_hoja(df, "Registros", limpiar_hoja=True, diferencial=True)
         
         # ✅ VERIFICACIÓN RÁPIDA DE METAS
-        if metas_backup is not None:
-            try:
-                metas_actual = sheets_manager.leer_hoja("Metas")
-                if metas_actual.empty:
-                    # Restaurar Metas si se borró
-                    sheets_manager.escribir_hoja(metas_backup, "Metas", limpiar_hoja=True)
-                    st.info("🔄 Tabla Metas restaurada automáticamente")
-            except:
-                pass  # En modo rápido, no mostrar errores de verificación
+        verificar_metas_tras_operacion(sheets_manager, silencioso=True)
         
         if exito:
             return True, "✅ Datos guardados."
@@ -647,28 +807,11 @@ def proteger_metas_durante_operacion(funcion_operacion, *args, **kwargs):
     try:
         sheets_manager = get_sheets_manager()
         
-        # Crear backup de Metas antes de la operación
-        metas_backup = None
-        try:
-            metas_backup = sheets_manager.leer_hoja("Metas")
-            if metas_backup.empty:
-                metas_backup = None
-        except:
-            metas_backup = None
-        
         # Ejecutar la operación
         resultado = funcion_operacion(*args, **kwargs)
         
         # Verificar Metas después de la operación
-        if metas_backup is not None:
-            try:
-                metas_actual = sheets_manager.leer_hoja("Metas")
-                if metas_actual.empty:
-                    # Restaurar Metas si se borró
-                    sheets_manager.escribir_hoja(metas_backup, "Metas", limpiar_hoja=True)
-                    st.warning("🔄 Tabla Metas restaurada automáticamente después de operación")
-            except Exception as restore_error:
-                st.error(f"❌ Error restaurando Metas: {restore_error}")
+        verificar_metas_tras_operacion(sheets_manager)
         
         return resultado
         
@@ -724,7 +867,7 @@ def sincronizar_con_google_sheets(df, hoja="Registros", crear_backup=True):
         # Usar protección de Metas
         def operacion_sincronizacion():
             sheets_manager = get_sheets_manager()
-            return sheets_manager.escribir_hoja(df_validado, hoja, limpiar_hoja=True)
+            return sheets_manager.escribir_hoja(df_validado, hoja, limpiar_hoja=True, diferencial=True)
         
         # Ejecutar con protección
         exito = proteger_metas_durante_operacion(operacion_sincronizacion)
@@ -766,43 +909,59 @@ def obtener_estado_sistema():
         except Exception as e:
             estado['errores'].append(f"Error listando hojas: {str(e)}")
         
-        # Verificar Registros
+        # Leer las tres hojas en una sola petición
+        hojas = {}
+        errores_lectura = {}
         try:
-            registros_df = sheets_manager.leer_hoja("Registros")
-            estado['registros']['existe'] = True
-            estado['registros']['filas'] = len(registros_df)
-            estado['registros']['columnas'] = len(registros_df.columns)
-            
-            # Validar registros
-            if 'Cod' in registros_df.columns and 'Entidad' in registros_df.columns:
-                registros_validos = registros_df[
-                    (registros_df['Cod'].notna()) & 
-                    (registros_df['Cod'].astype(str).str.strip() != '') &
-                    (registros_df['Entidad'].notna()) & 
-                    (registros_df['Entidad'].astype(str).str.strip() != '')
-                ]
-                estado['registros']['valido'] = len(registros_validos) > 0
+            hojas, errores_lectura = sheets_manager.leer_hojas(["Registros", "Metas", "Respaldo_Registros"])
         except Exception as e:
-            estado['errores'].append(f"Error verificando Registros: {str(e)}")
+            estado['errores'].append(f"Error leyendo hojas: {str(e)}")
+        
+        # Una hoja que no se pudo leer no cuenta como existente (aunque venga vacía)
+        for nombre_hoja, error in errores_lectura.items():
+            estado['errores'].append(f"Error leyendo {nombre_hoja}: {error}")
+            hojas.pop(nombre_hoja, None)
+        
+        # Verificar Registros
+        if "Registros" in hojas:
+            try:
+                registros_df = hojas["Registros"]
+                estado['registros']['existe'] = True
+                estado['registros']['filas'] = len(registros_df)
+                estado['registros']['columnas'] = len(registros_df.columns)
+                
+                # Validar registros
+                if 'Cod' in registros_df.columns and 'Entidad' in registros_df.columns:
+                    registros_validos = registros_df[
+                        (registros_df['Cod'].notna()) & 
+                        (registros_df['Cod'].astype(str).str.strip() != '') &
+                        (registros_df['Entidad'].notna()) & 
+                        (registros_df['Entidad'].astype(str).str.strip() != '')
+                    ]
+                    estado['registros']['valido'] = len(registros_validos) > 0
+            except Exception as e:
+                estado['errores'].append(f"Error verificando Registros: {str(e)}")
         
         # Verificar Metas
-        try:
-            metas_df = sheets_manager.leer_hoja("Metas")
-            estado['metas']['existe'] = True
-            estado['metas']['filas'] = len(metas_df)
-            estado['metas']['columnas'] = len(metas_df.columns)
-            estado['metas']['valido'] = len(metas_df) > 0 and len(metas_df.columns) >= 5
-        except Exception as e:
-            estado['errores'].append(f"Error verificando Metas: {str(e)}")
+        if "Metas" in hojas:
+            try:
+                metas_df = hojas["Metas"]
+                estado['metas']['existe'] = True
+                estado['metas']['filas'] = len(metas_df)
+                estado['metas']['columnas'] = len(metas_df.columns)
+                estado['metas']['valido'] = len(metas_df) > 0 and len(metas_df.columns) >= 5
+            except Exception as e:
+                estado['errores'].append(f"Error verificando Metas: {str(e)}")
         
         # Verificar Respaldo
-        try:
-            respaldo_df = sheets_manager.leer_hoja("Respaldo_Registros")
-            estado['respaldo']['existe'] = True
-            estado['respaldo']['filas'] = len(respaldo_df)
-            estado['respaldo']['valido'] = len(respaldo_df) > 0
-        except Exception as e:
-            estado['errores'].append(f"Error verificando Respaldo: {str(e)}")
+        if "Respaldo_Registros" in hojas:
+            try:
+                respaldo_df = hojas["Respaldo_Registros"]
+                estado['respaldo']['existe'] = True
+                estado['respaldo']['filas'] = len(respaldo_df)
+                estado['respaldo']['valido'] = len(respaldo_df) > 0
+            except Exception as e:
+                estado['errores'].append(f"Error verificando Respaldo: {str(e)}")
         
         return estado
         
@@ -822,47 +981,65 @@ def reparar_sistema_automatico():
         sheets_manager = get_sheets_manager()
         reparaciones = []
         
-        # Verificar y reparar Metas
+        # Leer Metas, Registros y Respaldo en una sola petición
+        nombres_hojas = ["Metas", "Registros", "Respaldo_Registros"]
         try:
-            metas_df = sheets_manager.leer_hoja("Metas")
-            if metas_df.empty:
-                # Recrear estructura de Metas
+            hojas, errores = sheets_manager.leer_hojas(nombres_hojas)
+        except Exception as e:
+            hojas, errores = {}, {nombre: str(e) for nombre in nombres_hojas}
+        
+        # No reparar ni reescribir hojas que no se pudieron leer: una lectura fallida no es una hoja vacía
+        for nombre_hoja, error in errores.items():
+            reparaciones.append(f"⚠️ {nombre_hoja} no se pudo leer, se omite su reparación: {error}")
+        
+        # Verificar y reparar Metas
+        if "Metas" not in errores:
+            try:
+                metas_df = hojas["Metas"]
+                if metas_df.empty:
+                    # Recrear estructura de Metas
+                    metas_nueva = crear_estructura_metas_inicial()
+                    sheets_manager.escribir_hoja(metas_nueva, "Metas", limpiar_hoja=True)
+                    reparaciones.append("✅ Tabla Metas recreada")
+            except:
+                # Crear Metas desde cero
                 metas_nueva = crear_estructura_metas_inicial()
                 sheets_manager.escribir_hoja(metas_nueva, "Metas", limpiar_hoja=True)
-                reparaciones.append("✅ Tabla Metas recreada")
-        except:
-            # Crear Metas desde cero
-            metas_nueva = crear_estructura_metas_inicial()
-            sheets_manager.escribir_hoja(metas_nueva, "Metas", limpiar_hoja=True)
-            reparaciones.append("✅ Tabla Metas creada desde cero")
+                reparaciones.append("✅ Tabla Metas creada desde cero")
         
-        # Verificar y reparar Registros
-        try:
-            registros_df = sheets_manager.leer_hoja("Registros")
-            if registros_df.empty:
-                # Intentar restaurar desde respaldo
-                try:
-                    respaldo_df = sheets_manager.leer_hoja("Respaldo_Registros")
-                    if not respaldo_df.empty:
-                        sheets_manager.escribir_hoja(respaldo_df, "Registros", limpiar_hoja=True)
-                        reparaciones.append("✅ Registros restaurados desde respaldo")
-                    else:
-                        # Crear estructura mínima
+        # Verificar y reparar Registros (el respaldo debe haberse leído para decidir)
+        if "Registros" not in errores and "Respaldo_Registros" not in errores:
+            try:
+                registros_df = hojas["Registros"]
+                if registros_df.empty:
+                    # Intentar restaurar desde respaldo
+                    try:
+                        respaldo_df = hojas["Respaldo_Registros"]
+                        if not respaldo_df.empty:
+                            sheets_manager.escribir_hoja(respaldo_df, "Registros", limpiar_hoja=True)
+                            reparaciones.append("✅ Registros restaurados desde respaldo")
+                        else:
+                            # Crear estructura mínima
+                            registros_nuevo = crear_estructura_registros_basica()
+                            sheets_manager.escribir_hoja(registros_nuevo, "Registros", limpiar_hoja=True)
+                            reparaciones.append("✅ Estructura básica de Registros creada")
+                    except:
                         registros_nuevo = crear_estructura_registros_basica()
                         sheets_manager.escribir_hoja(registros_nuevo, "Registros", limpiar_hoja=True)
                         reparaciones.append("✅ Estructura básica de Registros creada")
-                except:
-                    registros_nuevo = crear_estructura_registros_basica()
-                    sheets_manager.escribir_hoja(registros_nuevo, "Registros", limpiar_hoja=True)
-                    reparaciones.append("✅ Estructura básica de Registros creada")
-        except:
-            registros_nuevo = crear_estructura_registros_basica()
-            sheets_manager.escribir_hoja(registros_nuevo, "Registros", limpiar_hoja=True)
-            reparaciones.append("✅ Tabla Registros creada desde cero")
+            except:
+                registros_nuevo = crear_estructura_registros_basica()
+                sheets_manager.escribir_hoja(registros_nuevo, "Registros", limpiar_hoja=True)
+                reparaciones.append("✅ Tabla Registros creada desde cero")
         
         # Verificar columnas requeridas en Registros
         try:
-            registros_df = sheets_manager.leer_hoja("Registros")
+            if "Registros" in errores:
+                raise RuntimeError("Registros no se pudo leer")
+            releidas, errores_registros = sheets_manager.leer_hojas(["Registros"], usar_cache=False)
+            if errores_registros:
+                raise RuntimeError(errores_registros["Registros"])
+            registros_df = releidas["Registros"]
             columnas_requeridas = [
                 'Cod', 'Entidad', 'TipoDato', 'Nivel Información ', 'Mes Proyectado',
                 'Acuerdo de compromiso', 'Análisis y cronograma', 'Estándares', 'Publicación',
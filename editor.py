@@ -86,10 +86,14 @@ SEGUIMIENTO_OPCIONES = [
 
 # IMPORTS SEGUROS
 try:
-    from sheets_utils import GoogleSheetsManager
+    from sheets_utils import GoogleSheetsManager, get_sheets_manager
 except ImportError:
     st.error("Error: No se puede importar GoogleSheetsManager")
     GoogleSheetsManager = None
+    get_sheets_manager = None
+
+from cola_escritura import escritura_diferida_activa, obtener_cola_escritura
+from data_utils import calcular_porcentaje_avance
 
 def get_safe_value(row, column_name, default=''):
     """Obtiene un valor de forma segura del DataFrame"""
@@ -185,7 +189,7 @@ def guardar_en_sheets(df):
         return False, "GoogleSheetsManager no disponible"
     
     try:
-        manager = GoogleSheetsManager()
+        manager = get_sheets_manager()
         
         if df.empty:
             return False, "No se puede guardar un DataFrame vacío"
@@ -197,7 +201,7 @@ def guardar_en_sheets(df):
         df_clean = df_clean.replace('nan', '').replace('None', '')
         
         # SOLO escribir en Registros
-        exito = manager.escribir_hoja(df_clean, "Registros", limpiar_hoja=True)
+        exito = manager.escribir_hoja(df_clean, "Registros", limpiar_hoja=True, diferencial=True)
         
         if exito:
             # Forzar actualización en session_state
@@ -215,28 +219,87 @@ def guardar_en_sheets(df):
         else:
             return False, f"Error: {str(e)}"
 
-def calcular_avance(row):
-    """Calcula el porcentaje de avance basado en campos clave"""
+def _guardar_registro_individual(df, operacion, cambio=None):
+    """
+    Ejecuta una operación direccionada por Cod sobre la hoja Registros.
+    Con escritura diferida activa, el cambio (operacion, cod, registro) se encola y
+    se retorna de inmediato. Si la operación no se puede aplicar (hoja sin headers,
+    columnas de la hoja ausentes en el DataFrame, Cod no encontrado) se guarda el
+    DataFrame completo como respaldo.
+    """
+    if GoogleSheetsManager is None:
+        return False, "GoogleSheetsManager no disponible"
+    
     try:
-        avance = 0
+        manager = get_sheets_manager()
+        if (cambio is not None and escritura_diferida_activa()
+                and _cambio_aplicable(manager, df, cambio[0], cambio[1])):
+            obtener_cola_escritura().encolar(*cambio, nombre_hoja="Registros", df=df)
+            st.session_state['registros_df'] = df
+            return True, "Cambio guardado (sincronizando con Google Sheets)"
         
-        # Acuerdo de compromiso
-        if get_safe_value(row, 'Acuerdo de compromiso', '').lower() in ['si', 'sí']:
-            avance += 25
-            
-        # Análisis y cronograma
-        if get_safe_value(row, 'Análisis y cronograma', '').strip():
-            avance += 25
-            
-        # Estándares
-        if get_safe_value(row, 'Estándares', '').strip():
-            avance += 25
-            
-        # Publicación
-        if get_safe_value(row, 'Publicación', '').strip():
-            avance += 25
-        
-        return min(avance, 100)
+        if operacion(manager):
+            st.session_state['registros_df'] = df
+            return True, "Registro sincronizado en Google Sheets"
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo guardar solo el registro ({str(e)}); guardando la hoja completa...")
+    
+    return guardar_en_sheets(df)
+
+def _cambio_aplicable(manager, df, tipo, cod=None):
+    """
+    Verifica que la hoja tenga headers cubiertos por el DataFrame (y registros, si se edita)
+    y que el Cod identifique una sola fila (con Cod repetidos se guarda la hoja completa).
+    """
+    if tipo in ('actualizar', 'eliminar') and cod is not None:
+        cod = str(cod).strip()
+        if cod in manager.cods_repetidos("Registros"):
+            return False
+        if 'Cod' in df.columns and (df['Cod'].astype(str).str.strip() == cod).sum() > 1:
+            return False
+    if tipo == 'eliminar':
+        return True
+    headers = manager.obtener_headers("Registros")
+    if not headers or not set(headers).issubset(df.columns):
+        return False
+    if tipo == 'actualizar':
+        return bool(manager.obtener_indice_filas("Registros"))
+    return True
+
+def guardar_registro_editado(df, registro):
+    """Guarda solo la fila del registro editado (una petición de rango)"""
+    def operacion(manager):
+        if not _cambio_aplicable(manager, df, 'actualizar', get_safe_value(registro, 'Cod')):
+            return False
+        return manager.actualizar_registro(registro, "Registros")
+    
+    cambio = ('actualizar', get_safe_value(registro, 'Cod'), registro)
+    return _guardar_registro_individual(df, operacion, cambio)
+
+def guardar_registro_nuevo(df, registro):
+    """Agrega el nuevo registro al final de la hoja con values.append"""
+    def operacion(manager):
+        if not _cambio_aplicable(manager, df, 'agregar'):
+            return False
+        return manager.agregar_registro(registro, "Registros")
+    
+    cambio = ('agregar', get_safe_value(registro, 'Cod'), registro)
+    return _guardar_registro_individual(df, operacion, cambio)
+
+def borrar_registro_en_sheets(df, cod):
+    """Elimina solo la fila del registro borrado con deleteDimension"""
+    def operacion(manager):
+        if not _cambio_aplicable(manager, df, 'eliminar', cod):
+            return False
+        return manager.eliminar_registro(cod, "Registros")
+    
+    cambio = ('eliminar', cod, None)
+    return _guardar_registro_individual(df, operacion, cambio)
+
+def calcular_avance(row):
+    """Calcula el porcentaje de avance (mismo motor que el resto de pestañas)"""
+    try:
+        return calcular_porcentaje_avance(row)
     except:
         return 0
 
@@ -805,10 +868,11 @@ def mostrar_edicion_registros(registros_df):
                 if st.button("SÍ, BORRAR", type="primary", key="confirmar_borrar_definitivo"):
                     try:
                         # Borrar registro del DataFrame
+                        cod_borrar = get_safe_value(registros_df.iloc[st.session_state.registro_a_borrar], 'Cod')
                         registros_df_actualizado = registros_df.drop(registros_df.index[st.session_state.registro_a_borrar]).reset_index(drop=True)
                         
-                        # Guardar en Google Sheets
-                        exito, mensaje = guardar_en_sheets(registros_df_actualizado)
+                        # Guardar en Google Sheets (solo la fila borrada)
+                        exito, mensaje = borrar_registro_en_sheets(registros_df_actualizado, cod_borrar)
                         
                         if exito:
                             st.success(f"Registro borrado exitosamente. {mensaje}")
@@ -820,7 +884,8 @@ def mostrar_edicion_registros(registros_df):
                             del st.session_state.registro_a_borrar
                             
                             # Forzar actualización completa
-                            time.sleep(1)
+                            if not escritura_diferida_activa():
+                                time.sleep(1)
                             st.rerun()
                         else:
                             st.error(mensaje)
@@ -933,14 +998,15 @@ def mostrar_edicion_registros(registros_df):
                         if 'Porcentaje Avance' in registros_df.columns:
                             registros_df.iloc[indice_real, registros_df.columns.get_loc('Porcentaje Avance')] = nuevo_avance
                         
-                        # Guardar en Google Sheets
-                        exito, mensaje = guardar_en_sheets(registros_df)
+                        # Guardar en Google Sheets (solo la fila editada)
+                        exito, mensaje = guardar_registro_editado(registros_df, registros_df.iloc[indice_real])
                         
                         if exito:
                             st.success(f"{mensaje}. Avance: {nuevo_avance}%")
                             st.session_state.ultimo_guardado = datetime.now().strftime("%H:%M:%S")
                             st.session_state['registros_df'] = registros_df
-                            time.sleep(1)
+                            if not escritura_diferida_activa():
+                                time.sleep(1)
                             st.rerun()
                         else:
                             st.error(mensaje)
@@ -1046,8 +1112,8 @@ def mostrar_edicion_registros(registros_df):
                     # Agregar al DataFrame
                     registros_df = pd.concat([registros_df, nuevo_registro.to_frame().T], ignore_index=True)
                     
-                    # Guardar en Google Sheets
-                    exito, mensaje = guardar_en_sheets(registros_df)
+                    # Guardar en Google Sheets (append de la nueva fila)
+                    exito, mensaje = guardar_registro_nuevo(registros_df, nuevo_registro)
                     
                     if exito:
                         st.success(f"Registro {nuevo_codigo} creado exitosamente")
@@ -1055,7 +1121,8 @@ def mostrar_edicion_registros(registros_df):
                         st.session_state.ultimo_guardado = datetime.now().strftime("%H:%M:%S")
                         st.session_state['registros_df'] = registros_df
                         st.balloons()
-                        time.sleep(1)
+                        if not escritura_diferida_activa():
+                            time.sleep(1)
                         st.rerun()
                     else:
                         st.error(mensaje)
@@ -1077,9 +1144,10 @@ def mostrar_edicion_registros_con_autenticacion(registros_df):
                 if st.button("Verificar Google Sheets"):
                     if GoogleSheetsManager:
                         try:
-                            manager = GoogleSheetsManager()
-                            hojas = manager.listar_hojas()
-                            st.success(f"Conexión exitosa. Hojas: {', '.join(hojas)}")
+                            manager = get_sheets_manager()
+                            if manager.verificar_conexion():
+                                hojas = manager.listar_hojas()
+                                st.success(f"Conexión exitosa. Hojas: {', '.join(hojas)}")
                         except Exception as e:
                             st.error(f"Error de conexión: {str(e)}")
                     else:
@@ -1,353 +1,326 @@
 # fecha_utils.py - CORRECCIÓN COMPLETA PARA ERROR datetime.date + timedelta
 
 from datetime import datetime, timedelta, date
+import numpy as np
 import pandas as pd
 import re
+import threading
+from functools import lru_cache
+from parseo_fechas import procesar_fecha, formatear_fecha, procesar_columna_fechas
+
+# ===== FESTIVOS DE COLOMBIA =====
+
+# Fijos: no se trasladan
+FESTIVOS_FIJOS = [
+    (1, 1, 'Año Nuevo'),
+    (5, 1, 'Día del Trabajo'),
+    (7, 20, 'Día de la Independencia'),
+    (8, 7, 'Batalla de Boyacá'),
+    (12, 8, 'Día de la Inmaculada Concepción'),
+    (12, 25, 'Navidad')
+]
+
+# Ley Emiliani (Ley 51 de 1983): se trasladan al lunes siguiente si no caen en lunes
+FESTIVOS_EMILIANI = [
+    (1, 6, 'Día de los Reyes Magos'),
+    (3, 19, 'Día de San José'),
+    (6, 29, 'San Pedro y San Pablo'),
+    (8, 15, 'Asunción de la Virgen'),
+    (10, 12, 'Día de la Raza'),
+    (11, 1, 'Todos los Santos'),
+    (11, 11, 'Independencia de Cartagena')
+]
 
-# Lista de días festivos en Colombia para 2025
-FESTIVOS_2025 = [
-    datetime(2025, 1, 1),   # Año Nuevo
-    datetime(2025, 1, 6),   # Día de los Reyes Magos
-    datetime(2025, 3, 24),  # Día de San José
-    datetime(2025, 4, 17),  # Jueves Santo
-    datetime(2025, 4, 18),  # Viernes Santo
-    datetime(2025, 5, 1),   # Día del Trabajo
-    datetime(2025, 5, 29),  # Ascensión del Señor
-    datetime(2025, 6, 19),  # Corpus Christi
-    datetime(2025, 6, 27),  # Sagrado Corazón
-    datetime(2025, 6, 30),  # San Pedro y San Pablo
-    datetime(2025, 7, 20),  # Día de la Independencia
-    datetime(2025, 8, 7),   # Batalla de Boyacá
-    datetime(2025, 8, 18),  # Asunción de la Virgen
-    datetime(2025, 10, 13), # Día de la Raza
-    datetime(2025, 11, 3),  # Todos los Santos
-    datetime(2025, 11, 17), # Independencia de Cartagena
-    datetime(2025, 12, 8),  # Día de la Inmaculada Concepción
-    datetime(2025, 12, 25)  # Navidad
+# Relativos al domingo de Pascua: (días desde Pascua, se traslada a lunes, nombre)
+FESTIVOS_PASCUA = [
+    (-3, False, 'Jueves Santo'),
+    (-2, False, 'Viernes Santo'),
+    (39, True, 'Ascensión del Señor'),
+    (60, True, 'Corpus Christi'),
+    (68, True, 'Sagrado Corazón')
 ]
 
+# Años precalculados para el calendario de días hábiles
+RANGO_ANIOS_FESTIVOS = (2000, 2100)
 
-def es_festivo(fecha):
+
+def calcular_domingo_pascua(anio):
+    """Domingo de Pascua (calendario gregoriano, algoritmo de Meeus/Jones/Butcher)"""
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def _siguiente_lunes(fecha):
+    return fecha + timedelta(days=(7 - fecha.weekday()) % 7)
+
+
+def generar_festivos_colombia(anio_inicio, anio_fin=None):
     """
-    Verifica si una fecha es festivo en Colombia.
-    CORREGIDO: Manejo uniforme de tipos datetime - SIEMPRE convierte a datetime
+    Festivos de Colombia entre anio_inicio y anio_fin (inclusive):
+    fijos, trasladables por Ley Emiliani y relativos a Pascua.
+    Devuelve una lista ordenada de (date, nombre).
     """
+    anio_fin = anio_inicio if anio_fin is None else anio_fin
+    festivos = []
+    for anio in range(anio_inicio, anio_fin + 1):
+        for mes, dia, nombre in FESTIVOS_FIJOS:
+            festivos.append((date(anio, mes, dia), nombre))
+        for mes, dia, nombre in FESTIVOS_EMILIANI:
+            festivos.append((_siguiente_lunes(date(anio, mes, dia)), nombre))
+        pascua = calcular_domingo_pascua(anio)
+        for desplazamiento, trasladable, nombre in FESTIVOS_PASCUA:
+            fecha = pascua + timedelta(days=desplazamiento)
+            festivos.append((_siguiente_lunes(fecha) if trasladable else fecha, nombre))
+    return sorted(festivos)
+
+
+@lru_cache(maxsize=None)
+def festivos_del_anio(anio):
+    """Ordinales de los festivos de un año (conjunto para búsqueda O(1))"""
+    return frozenset(fecha.toordinal() for fecha, _ in generar_festivos_colombia(anio))
+
+
+# Precalculados: arreglo ordenado datetime64[D] para busdaycalendar y lista de 2025 (compatibilidad)
+FESTIVOS_NP = np.array(
+    sorted({fecha for fecha, _ in generar_festivos_colombia(*RANGO_ANIOS_FESTIVOS)}),
+    dtype='datetime64[D]'
+)
+FESTIVOS_2025 = [datetime.combine(fecha, datetime.min.time()) for fecha, _ in generar_festivos_colombia(2025)]
+
+
+def es_festivo(fecha):
+    """Verifica si una fecha (date, datetime o Timestamp) es festivo en Colombia, para cualquier año."""
     try:
-        # CORRECCIÓN CRÍTICA: Convertir SIEMPRE a datetime para comparación uniforme
-        if isinstance(fecha, datetime):
-            fecha_dt = fecha
-        elif isinstance(fecha, date):
-            fecha_dt = datetime.combine(fecha, datetime.min.time())
-        else:
+        if not isinstance(fecha, date):
             # Si no es un tipo de fecha conocido, devolver False
             return False
-        
-        for festivo in FESTIVOS_2025:
-            if (fecha_dt.day == festivo.day and
-                fecha_dt.month == festivo.month and
-                fecha_dt.year == festivo.year):
-                return True
-        return False
+        return fecha.toordinal() in festivos_del_anio(fecha.year)
     except Exception:
         return False
 
 
-def procesar_fecha(fecha_str):
-    """
-    CORRECCIÓN CRÍTICA: Procesa una fecha de manera segura manejando NaT.
-    GARANTÍA: SIEMPRE devuelve datetime, NUNCA date
-    """
-    if pd.isna(fecha_str) or fecha_str == '' or fecha_str is None:
-        return None
+# ===== MOTOR DE DÍAS HÁBILES (numpy.busday_offset) =====
 
-    # Si es un objeto datetime, retornarlo directamente
-    if isinstance(fecha_str, datetime):
-        if pd.isna(fecha_str):
-            return None
-        return fecha_str
+# Plazos en días hábiles (lunes a viernes sin festivos)
+DIAS_HABILES_PLAZO_ANALISIS = 5
+DIAS_HABILES_PLAZO_CRONOGRAMA = 3
+DIAS_HABILES_PLAZO_OFICIO_CIERRE = 7
 
-    # CORRECCIÓN CRÍTICA: Si es date, convertir OBLIGATORIAMENTE a datetime
-    if isinstance(fecha_str, date):
-        return datetime.combine(fecha_str, datetime.min.time())
+_calendario_habiles = None
 
-    # Si es Timestamp, convertir a datetime
-    if isinstance(fecha_str, pd.Timestamp):
-        if pd.isna(fecha_str):
-            return None
-        return fecha_str.to_pydatetime()
 
-    # Si es un string, procesarlo
-    try:
-        fecha_str = re.sub(r'[^\d/\-]', '', str(fecha_str).strip())
-        formatos = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']
-
-        for formato in formatos:
-            try:
-                fecha = pd.to_datetime(fecha_str, format=formato)
-                if pd.notna(fecha):
-                    # CRÍTICO: Asegurar que SIEMPRE devolvemos datetime
-                    resultado = fecha.to_pydatetime() if hasattr(fecha, 'to_pydatetime') else fecha
-                    # Verificación adicional: si por alguna razón es date, convertir
-                    if isinstance(resultado, date) and not isinstance(resultado, datetime):
-                        return datetime.combine(resultado, datetime.min.time())
-                    return resultado
-            except:
-                continue
-        return None
-    except Exception:
-        return None
+def obtener_calendario_habiles():
+    """Calendario de días hábiles (L-V sin festivos) para numpy.busday_offset"""
+    global _calendario_habiles
+    if _calendario_habiles is None:
+        _calendario_habiles = np.busdaycalendar(weekmask='1111100', holidays=FESTIVOS_NP)
+    return _calendario_habiles
 
 
-def formatear_fecha(fecha_str):
+def sumar_dias_habiles(fechas, dias_habiles):
     """
-    Formatea una fecha en formato DD/MM/YYYY manejando NaT.
-    CORREGIDO: Usa procesar_fecha segura
+    Suma días hábiles a una columna de fechas en una sola llamada.
+    fechas: Serie (texto, datetime o datetime64). Devuelve una Serie datetime64[ns] (NaT si no hay fecha).
+    Un día no hábil se cuenta desde el hábil anterior (roll='backward'), igual que avanzar
+    día a día desde la fecha original.
     """
-    try:
-        fecha = procesar_fecha(fecha_str)
-        if fecha is not None and pd.notna(fecha):
-            return fecha.strftime('%d/%m/%Y')
-        return ""
-    except Exception:
-        return ""
+    fechas = procesar_columna_fechas(pd.Series(fechas))
+    dias = fechas.to_numpy(dtype='datetime64[D]')
+    resultado = np.busday_offset(dias, dias_habiles, roll='backward', busdaycal=obtener_calendario_habiles())
+    return pd.Series(resultado.astype('datetime64[ns]'), index=fechas.index)
 
 
-def calcular_plazo_analisis(fecha_entrega):
-    """
-    Calcula el plazo de análisis como 5 días hábiles después de la fecha de entrega.
-    CORRECCIÓN CRÍTICA: Uso GARANTIZADO de datetime + timedelta
-    """
-    try:
-        # PASO 1: Procesar fecha de entrega (GARANTÍA: devuelve datetime o None)
-        fecha = procesar_fecha(fecha_entrega)
-        if fecha is None or pd.isna(fecha):
-            return None
-
-        # PASO 2: VERIFICACIÓN ADICIONAL - Asegurar que es datetime
-        if not isinstance(fecha, datetime):
-            if isinstance(fecha, date):
-                fecha = datetime.combine(fecha, datetime.min.time())
-            else:
-                print(f"⚠️  Tipo inesperado en calcular_plazo_analisis: {type(fecha)}")
-                return None
-
-        # PASO 3: Calcular días hábiles (OPERACIÓN SEGURA: datetime + timedelta)
-        fecha_actual = fecha
-        dias_habiles = 0
-
-        while dias_habiles < 5:
-            fecha_actual = fecha_actual + timedelta(days=1)  # SEGURO: datetime + timedelta = datetime
-            
-            dia_semana = fecha_actual.weekday()
-            if dia_semana < 5 and not es_festivo(fecha_actual):
-                dias_habiles += 1
+def _sumar_dias_habiles_fecha(fecha_valor, dias_habiles):
+    """Versión escalar de sumar_dias_habiles: devuelve datetime (conserva la hora) o None"""
+    fecha = procesar_fecha(fecha_valor)
+    if fecha is None:
+        return None
+    dia = np.busday_offset(np.datetime64(fecha.date(), 'D'), dias_habiles, roll='backward',
+                           busdaycal=obtener_calendario_habiles())
+    return datetime.combine(dia.astype(date), fecha.time())
 
-        return fecha_actual
 
+def calcular_plazo_analisis(fecha_entrega):
+    """Calcula el plazo de análisis como 5 días hábiles después de la fecha de entrega."""
+    try:
+        return _sumar_dias_habiles_fecha(fecha_entrega, DIAS_HABILES_PLAZO_ANALISIS)
     except Exception as e:
         print(f"❌ Error en calcular_plazo_analisis: {e}")
         return None
 
 
 def calcular_plazo_cronograma(fecha_plazo_analisis):
-    """
-    Calcula el plazo de cronograma como 3 días hábiles después del plazo de análisis.
-    CORRECCIÓN CRÍTICA: Uso GARANTIZADO de datetime + timedelta
-    """
+    """Calcula el plazo de cronograma como 3 días hábiles después del plazo de análisis."""
     try:
-        # PASO 1: Procesar fecha (GARANTÍA: devuelve datetime o None)
-        fecha = procesar_fecha(fecha_plazo_analisis)
-        if fecha is None or pd.isna(fecha):
-            return None
-
-        # PASO 2: VERIFICACIÓN ADICIONAL - Asegurar que es datetime
-        if not isinstance(fecha, datetime):
-            if isinstance(fecha, date):
-                fecha = datetime.combine(fecha, datetime.min.time())
-            else:
-                print(f"⚠️  Tipo inesperado en calcular_plazo_cronograma: {type(fecha)}")
-                return None
-
-        # PASO 3: Calcular días hábiles (OPERACIÓN SEGURA: datetime + timedelta)
-        fecha_actual = fecha
-        dias_habiles = 0
-
-        while dias_habiles < 3:
-            fecha_actual = fecha_actual + timedelta(days=1)  # SEGURO: datetime + timedelta = datetime
-            
-            dia_semana = fecha_actual.weekday()
-            if dia_semana < 5 and not es_festivo(fecha_actual):
-                dias_habiles += 1
-
-        return fecha_actual
-
+        return _sumar_dias_habiles_fecha(fecha_plazo_analisis, DIAS_HABILES_PLAZO_CRONOGRAMA)
     except Exception as e:
         print(f"❌ Error en calcular_plazo_cronograma: {e}")
         return None
 
 
 def calcular_plazo_oficio_cierre(fecha_publicacion):
-    """
-    Calcula el plazo de oficio de cierre como 7 días hábiles después de la fecha de publicación.
-    CORRECCIÓN CRÍTICA: Uso GARANTIZADO de datetime + timedelta
-    """
+    """Calcula el plazo de oficio de cierre como 7 días hábiles después de la fecha de publicación."""
     try:
-        # PASO 1: Procesar fecha (GARANTÍA: devuelve datetime o None)
-        fecha = procesar_fecha(fecha_publicacion)
-        if fecha is None or pd.isna(fecha):
-            return None
-
-        # PASO 2: VERIFICACIÓN ADICIONAL - Asegurar que es datetime
-        if not isinstance(fecha, datetime):
-            if isinstance(fecha, date):
-                fecha = datetime.combine(fecha, datetime.min.time())
-            else:
-                print(f"⚠️  Tipo inesperado en calcular_plazo_oficio_cierre: {type(fecha)}")
-                return None
-
-        # PASO 3: Calcular días hábiles (OPERACIÓN SEGURA: datetime + timedelta)
-        fecha_actual = fecha
-        dias_habiles = 0
-
-        while dias_habiles < 7:
-            fecha_actual = fecha_actual + timedelta(days=1)  # SEGURO: datetime + timedelta = datetime
-            
-            dia_semana = fecha_actual.weekday()
-            if dia_semana < 5 and not es_festivo(fecha_actual):
-                dias_habiles += 1
-
-        return fecha_actual
-
+        return _sumar_dias_habiles_fecha(fecha_publicacion, DIAS_HABILES_PLAZO_OFICIO_CIERRE)
     except Exception as e:
         print(f"❌ Error en calcular_plazo_oficio_cierre: {e}")
         return None
 
 
+def _escribir_plazo(df, columna, plazos):
+    """Escribe en formato DD/MM/YYYY los plazos calculados (las filas sin plazo no se tocan)"""
+    if columna not in df.columns:
+        df[columna] = ''
+    calculados = plazos.notna()
+    if calculados.any():
+        df.loc[calculados, columna] = plazos[calculados].dt.strftime('%d/%m/%Y')
+    return plazos
+
+
 def actualizar_plazo_analisis(df):
     """
-    Actualiza la columna 'Plazo de análisis' en el DataFrame.
-    CORREGIDO: Manejo de errores mejorado y preparación del DataFrame
+    Actualiza 'Plazo de análisis' (y 'Plazo de cronograma' derivado) en una sola
+    operación por columna.
     """
     if 'Fecha de entrega de información' not in df.columns:
         return df
 
-    # NUEVO: Preparar DataFrame para cálculos seguros
-    try:
-        from data_utils import preparar_dataframe_para_calculos
-        df_seguro = preparar_dataframe_para_calculos(df)
-    except ImportError:
-        # Si no está disponible, usar el DataFrame original con cuidado
-        df_seguro = df.copy()
-
-    df_actualizado = df_seguro.copy()
+    df_actualizado = df.copy()
+    plazos = _escribir_plazo(
+        df_actualizado, 'Plazo de análisis',
+        sumar_dias_habiles(df_actualizado['Fecha de entrega de información'], DIAS_HABILES_PLAZO_ANALISIS)
+    )
+    if 'Plazo de cronograma' not in df_actualizado.columns:
+        df_actualizado['Plazo de cronograma'] = ''
+    _escribir_plazo(
+        df_actualizado, 'Plazo de cronograma',
+        sumar_dias_habiles(plazos, DIAS_HABILES_PLAZO_CRONOGRAMA)
+    )
+    return df_actualizado
 
-    # Asegurar que la columna existe
-    if 'Plazo de análisis' not in df_actualizado.columns:
-        df_actualizado['Plazo de análisis'] = ''
 
-    for idx, row in df_actualizado.iterrows():
-        try:
-            fecha_entrega = row.get('Fecha de entrega de información', None)
-            if fecha_entrega and pd.notna(fecha_entrega) and str(fecha_entrega).strip() != '':
-                # VERIFICACIÓN ADICIONAL: Asegurar que no sea un objeto date peligroso
-                if isinstance(fecha_entrega, date) and not isinstance(fecha_entrega, datetime):
-                    print(f"⚠️  Objeto date detectado en fila {idx}, convirtiendo...")
-                    fecha_entrega = datetime.combine(fecha_entrega, datetime.min.time())
-                
-                plazo = calcular_plazo_analisis(fecha_entrega)
-                if plazo is not None:
-                    df_actualizado.at[idx, 'Plazo de análisis'] = formatear_fecha(plazo)
-                    
-                    # También actualizar plazo de cronograma
-                    plazo_cronograma = calcular_plazo_cronograma(plazo)
-                    if plazo_cronograma is not None:
-                        if 'Plazo de cronograma' not in df_actualizado.columns:
-                            df_actualizado['Plazo de cronograma'] = ''
-                        df_actualizado.at[idx, 'Plazo de cronograma'] = formatear_fecha(plazo_cronograma)
-        except Exception as e:
-            print(f"❌ Error procesando fila {idx}: {e}")
-            continue
+def actualizar_plazo_cronograma(df):
+    """Actualiza 'Plazo de cronograma' a partir de 'Plazo de análisis' (por columna)."""
+    if 'Plazo de análisis' not in df.columns:
+        return df
 
+    df_actualizado = df.copy()
+    _escribir_plazo(
+        df_actualizado, 'Plazo de cronograma',
+        sumar_dias_habiles(df_actualizado['Plazo de análisis'], DIAS_HABILES_PLAZO_CRONOGRAMA)
+    )
     return df_actualizado
 
 
-def actualizar_plazo_cronograma(df):
-    """
-    Actualiza la columna 'Plazo de cronograma' en el DataFrame.
-    CORREGIDO: Manejo de errores mejorado y preparación del DataFrame
-    """
-    if 'Plazo de análisis' not in df.columns:
+def actualizar_plazo_oficio_cierre(df):
+    """Actualiza 'Plazo de oficio de cierre' a partir de 'Publicación' (por columna)."""
+    if 'Publicación' not in df.columns:
         return df
 
-    # NUEVO: Preparar DataFrame para cálculos seguros
-    try:
-        from data_utils import preparar_dataframe_para_calculos
-        df_seguro = preparar_dataframe_para_calculos(df)
-    except ImportError:
-        df_seguro = df.copy()
+    df_actualizado = df.copy()
+    _escribir_plazo(
+        df_actualizado, 'Plazo de oficio de cierre',
+        sumar_dias_habiles(df_actualizado['Publicación'], DIAS_HABILES_PLAZO_OFICIO_CIERRE)
+    )
+    return df_actualizado
 
-    df_actualizado = df_seguro.copy()
 
-    if 'Plazo de cronograma' not in df_actualizado.columns:
-        df_actualizado['Plazo de cronograma'] = ''
 
-    for idx, row in df_actualizado.iterrows():
-        try:
-            plazo_analisis = row.get('Plazo de análisis', None)
-            if plazo_analisis and pd.notna(plazo_analisis) and str(plazo_analisis).strip() != '':
-                # VERIFICACIÓN ADICIONAL: Asegurar que no sea un objeto date peligroso
-                if isinstance(plazo_analisis, date) and not isinstance(plazo_analisis, datetime):
-                    print(f"⚠️  Objeto date detectado en fila {idx}, convirtiendo...")
-                    plazo_analisis = datetime.combine(plazo_analisis, datetime.min.time())
-                
-                plazo_cronograma = calcular_plazo_cronograma(plazo_analisis)
-                if plazo_cronograma is not None:
-                    df_actualizado.at[idx, 'Plazo de cronograma'] = formatear_fecha(plazo_cronograma)
-        except Exception as e:
-            print(f"❌ Error procesando cronograma fila {idx}: {e}")
-            continue
+# ===== RECÁLCULO INCREMENTAL DE PLAZOS =====
 
-    return df_actualizado
+# Columnas de las que dependen los plazos (las de plazo también: si no hay fecha de
+# entrega/publicación se conserva el valor existente)
+COLUMNAS_ENTRADA_PLAZOS = [
+    'Fecha de entrega de información', 'Publicación',
+    'Plazo de análisis', 'Plazo de cronograma', 'Plazo de oficio de cierre'
+]
+COLUMNAS_PLAZO = ['Plazo de análisis', 'Plazo de cronograma', 'Plazo de oficio de cierre']
 
+# Resultado de la ejecución anterior: huella de entradas y plazos por 'Cod'
+_plazos_previos = {'columnas': None, 'tabla': None}
+_plazos_lock = threading.Lock()
 
-def actualizar_plazo_oficio_cierre(df):
-    """
-    Actualiza la columna 'Plazo de oficio de cierre' en el DataFrame.
-    CORREGIDO: Manejo de errores mejorado y preparación del DataFrame
-    """
-    if 'Publicación' not in df.columns:
-        return df
 
-    # NUEVO: Preparar DataFrame para cálculos seguros
-    try:
-        from data_utils import preparar_dataframe_para_calculos
-        df_seguro = preparar_dataframe_para_calculos(df)
-    except ImportError:
-        df_seguro = df.copy()
+def actualizar_plazos(df):
+    """Cálculo completo de los tres plazos (análisis, cronograma y oficio de cierre)"""
+    df = actualizar_plazo_analisis(df)
+    df = actualizar_plazo_cronograma(df)
+    return actualizar_plazo_oficio_cierre(df)
 
-    df_actualizado = df_seguro.copy()
 
-    if 'Plazo de oficio de cierre' not in df_actualizado.columns:
-        df_actualizado['Plazo de oficio de cierre'] = ''
+def actualizar_plazos_incremental(df):
+    """
+    NUEVA FUNCIÓN: Igual que actualizar_plazos, pero recalcula solo las filas nuevas o
+    cuyas entradas cambiaron desde la ejecución anterior (huella por 'Cod'); el resto
+    reutiliza los plazos ya calculados.
+    Los 'Cod' repetidos se recalculan siempre.
+    """
+    if 'Cod' not in df.columns or df.empty:
+        return actualizar_plazos(df)
+
+    columnas_entrada = tuple(c for c in COLUMNAS_ENTRADA_PLAZOS if c in df.columns)
+    huellas = pd.util.hash_pandas_object(
+        df[list(columnas_entrada)].astype(str), index=False
+    ).to_numpy()
+    cods = df['Cod'].astype(str).to_numpy()
+    unicos = ~pd.Series(cods).duplicated(keep=False).to_numpy()
+
+    with _plazos_lock:
+        tabla_previa = _plazos_previos['tabla'] if _plazos_previos['columnas'] == columnas_entrada else None
+
+    # Filas reutilizables: mismo 'Cod' (único) y misma huella que en la ejecución anterior
+    reutilizables = np.zeros(len(df), dtype=bool)
+    if tabla_previa is not None:
+        posiciones = tabla_previa.index.get_indexer(cods)
+        encontradas = (posiciones >= 0) & unicos
+        reutilizables[encontradas] = (
+            tabla_previa['huella'].to_numpy()[posiciones[encontradas]] == huellas[encontradas]
+        )
+
+    pendientes = np.flatnonzero(~reutilizables)
+    calculado = actualizar_plazos(df.iloc[pendientes])
+
+    # Mismas columnas (y en el mismo orden) que produciría el cálculo completo
+    resultado = df.copy()
+    for columna in calculado.columns:
+        if columna not in resultado.columns:
+            resultado[columna] = ''
+    columnas_plazo = [c for c in COLUMNAS_PLAZO if c in calculado.columns]
+
+    for columna in columnas_plazo:
+        valores = resultado[columna].to_numpy(dtype=object, copy=True)
+        valores[pendientes] = calculado[columna].to_numpy(dtype=object)
+        if reutilizables.any():
+            valores[reutilizables] = tabla_previa[columna].to_numpy(dtype=object)[posiciones[reutilizables]]
+        resultado[columna] = valores
+
+    # Guardar huellas y plazos de esta ejecución (las filas eliminadas salen de la tabla)
+    tabla = pd.DataFrame(
+        {'huella': huellas[unicos], **{c: resultado[c].to_numpy(dtype=object)[unicos] for c in columnas_plazo}},
+        index=pd.Index(cods[unicos])
+    )
+    with _plazos_lock:
+        _plazos_previos['columnas'] = columnas_entrada
+        _plazos_previos['tabla'] = tabla
 
-    for idx, row in df_actualizado.iterrows():
-        try:
-            fecha_publicacion = row.get('Publicación', None)
-            if fecha_publicacion and pd.notna(fecha_publicacion) and str(fecha_publicacion).strip() != '':
-                # VERIFICACIÓN ADICIONAL: Asegurar que no sea un objeto date peligroso
-                if isinstance(fecha_publicacion, date) and not isinstance(fecha_publicacion, datetime):
-                    print(f"⚠️  Objeto date detectado en fila {idx}, convirtiendo...")
-                    fecha_publicacion = datetime.combine(fecha_publicacion, datetime.min.time())
-                
-                plazo_oficio = calcular_plazo_oficio_cierre(fecha_publicacion)
-                if plazo_oficio is not None:
-                    df_actualizado.at[idx, 'Plazo de oficio de cierre'] = formatear_fecha(plazo_oficio)
-        except Exception as e:
-            print(f"❌ Error procesando oficio cierre fila {idx}: {e}")
-            continue
+    print(f"🔄 Plazos recalculados: {len(pendientes)} de {len(df)} registros")
+    return resultado
 
-    return df_actualizado
 
+def limpiar_plazos_incrementales():
+    """Descarta las huellas guardadas (la próxima ejecución recalcula todo)"""
+    with _plazos_lock:
+        _plazos_previos['columnas'] = None
+        _plazos_previos['tabla'] = None
 
 # NUEVAS FUNCIONES DE VERIFICACIÓN Y TEST
 
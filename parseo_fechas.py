@@ -0,0 +1,185 @@
+# parseo_fechas.py - Interpretación de fechas (implementación única)
+"""
+Implementación única de la interpretación de fechas del sistema:
+- procesar_fecha: valor escalar → datetime o None, con caché LRU por texto
+- procesar_columna_fechas: columna completa → datetime64[ns], infiriendo el formato
+  dominante y resolviendo el resto con los demás formatos en pocas llamadas
+- es_fecha_valida / formatear_fecha / formatear_columna_fechas
+
+data_utils y fecha_utils re-exportan estas funciones, así que los imports existentes
+siguen funcionando.
+"""
+
+import os
+import re
+from datetime import datetime, date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Formatos aceptados en orden de prioridad (día/mes antes que mes/día)
+FORMATOS_FECHA = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']
+PATRON_CARACTERES_NO_FECHA = r'[^\d/\-]'
+TAMANO_CACHE_FECHAS = int(os.getenv('TAMANO_CACHE_FECHAS', '8192'))
+MUESTRA_INFERENCIA_FORMATO = 200
+
+# Rango representable en datetime64[ns]; fuera de él (p. ej. año 2925 o 0225 por un
+# error de digitación) la fecha se trata como no válida en ambos caminos
+FECHA_MINIMA = datetime(1677, 9, 22)
+FECHA_MAXIMA = datetime(2262, 4, 11)
+
+_regex_no_fecha = re.compile(PATRON_CARACTERES_NO_FECHA)
+
+
+def _en_rango(fecha):
+    """None si la fecha no cabe en datetime64[ns]"""
+    return fecha if FECHA_MINIMA <= fecha <= FECHA_MAXIMA else None
+
+
+@lru_cache(maxsize=TAMANO_CACHE_FECHAS)
+def _procesar_texto_fecha(texto):
+    """Interpreta un texto de fecha probando FORMATOS_FECHA en orden (resultado memorizado)"""
+    texto = _regex_no_fecha.sub('', texto)
+    for formato in FORMATOS_FECHA:
+        try:
+            return _en_rango(datetime.strptime(texto, formato))
+        except ValueError:
+            continue
+    return None
+
+
+def procesar_fecha(fecha_str):
+    """
+    Procesa una fecha de manera segura manejando NaT.
+    GARANTÍA: SIEMPRE devuelve datetime (o None), NUNCA date
+    """
+    if pd.isna(fecha_str) or fecha_str == '' or fecha_str is None:
+        return None
+
+    # Timestamp antes que datetime (Timestamp es subclase de datetime)
+    if isinstance(fecha_str, pd.Timestamp):
+        return _en_rango(fecha_str.to_pydatetime())
+
+    if isinstance(fecha_str, datetime):
+        return _en_rango(fecha_str)
+
+    # Si es date, convertir SIEMPRE a datetime
+    if isinstance(fecha_str, date):
+        return _en_rango(datetime.combine(fecha_str, datetime.min.time()))
+
+    try:
+        return _procesar_texto_fecha(str(fecha_str).strip())
+    except Exception:
+        return None
+
+
+def es_fecha_valida(valor):
+    """Verifica si un valor es una fecha válida."""
+    try:
+        return procesar_fecha(valor) is not None
+    except Exception:
+        return False
+
+
+def formatear_fecha(fecha_str):
+    """Formatea una fecha en formato DD/MM/YYYY manejando NaT."""
+    try:
+        fecha = procesar_fecha(fecha_str)
+        if fecha is not None:
+            return fecha.strftime('%d/%m/%Y')
+        return ""
+    except Exception:
+        return ""
+
+
+def _orden_formatos(textos):
+    """
+    Formatos ordenados con el dominante primero (según una muestra de valores distintos).
+    %m/%d/%Y nunca pasa delante de %d/%m/%Y para conservar la prioridad día/mes;
+    los demás formatos son excluyentes entre sí, así que el orden no cambia el resultado.
+    """
+    muestra = pd.Series(pd.unique(textos)[:MUESTRA_INFERENCIA_FORMATO], dtype=object)
+    aciertos = {
+        formato: pd.to_datetime(muestra, format=formato, errors='coerce').notna().sum()
+        for formato in FORMATOS_FECHA
+    }
+    orden = sorted(FORMATOS_FECHA, key=lambda formato: (-aciertos[formato], FORMATOS_FECHA.index(formato)))
+    if orden.index('%m/%d/%Y') < orden.index('%d/%m/%Y'):
+        orden.remove('%m/%d/%Y')
+        orden.insert(orden.index('%d/%m/%Y') + 1, '%m/%d/%Y')
+    return orden
+
+
+def _a_ns(fechas):
+    """Serie de fechas (cualquier resolución) a datetime64[ns], con NaT fuera de rango"""
+    fechas = fechas.astype('datetime64[us]') if fechas.dt.unit != 'ns' else fechas
+    fuera = (fechas < FECHA_MINIMA) | (fechas > FECHA_MAXIMA)
+    return fechas.mask(fuera).astype('datetime64[ns]')
+
+
+def procesar_columna_fechas(serie):
+    """
+    Versión por columna de procesar_fecha: devuelve una Serie datetime64[ns] (NaT donde
+    no hay fecha válida o está fuera de rango) con el mismo resultado que aplicar
+    procesar_fecha fila por fila.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return _a_ns(serie.dt.tz_localize(None) if serie.dt.tz is not None else serie)
+
+    resultado = pd.Series(pd.NaT, index=pd.RangeIndex(len(serie)), dtype='datetime64[ns]')
+    presentes = serie.notna().to_numpy()
+    if presentes.any():
+        # Se trabaja por posición para no depender de que el índice sea único
+        valores = pd.Series(serie.to_numpy()[presentes], index=np.flatnonzero(presentes))
+
+        if pd.api.types.infer_dtype(valores, skipna=True) != 'string':
+            # Columna mixta (fechas, números, texto): camino escalar, una vez por valor distinto
+            fechas = {valor: procesar_fecha(valor) for valor in pd.unique(valores)}
+            resultado[valores.index] = _a_ns(pd.to_datetime(valores.map(fechas), errors='coerce'))
+        else:
+            textos = valores.str.strip().str.replace(PATRON_CARACTERES_NO_FECHA, '', regex=True)
+            textos = textos[textos != '']
+
+            for formato in (_orden_formatos(textos) if len(textos) else []):
+                fechas = pd.to_datetime(textos, format=formato, errors='coerce')
+                interpretadas = fechas.notna()
+                # Las fuera de rango cuentan como interpretadas (NaT), igual que en procesar_fecha
+                resultado[fechas.index[interpretadas]] = _a_ns(fechas[interpretadas])
+                textos = textos[~interpretadas]
+                if textos.empty:
+                    break
+
+    resultado.index = serie.index
+    return resultado
+
+
+def formatear_columna_fechas(serie):
+    """formatear_fecha por columna: 'DD/MM/YYYY' o cadena vacía"""
+    fechas = procesar_columna_fechas(serie)
+    return fechas.dt.strftime('%d/%m/%Y').fillna('')
+
+
+def limpiar_cache_fechas():
+    """Vacía la caché del camino escalar"""
+    _procesar_texto_fecha.cache_clear()
+
+
+def test_fechas_fuera_de_rango():
+    """Años fuera de datetime64[ns] (errores de digitación): NaT/None en ambos caminos"""
+    valores = ['01/01/2925', '01/01/0225', '2925-01-01', '15/03/2025', '', None]
+    esperado = [None, None, None, datetime(2025, 3, 15), None, None]
+
+    escalar = [procesar_fecha(valor) for valor in valores]
+    columna = procesar_columna_fechas(pd.Series(valores, dtype=object))
+    columna = [None if pd.isna(f) else f.to_pydatetime() for f in columna]
+    mixta = procesar_columna_fechas(pd.Series([datetime(2925, 1, 1), date(2025, 3, 15), 'x']))
+
+    correcto = (escalar == esperado and columna == esperado
+                and mixta.isna().tolist() == [True, False, True])
+    print(f"{'✅' if correcto else '❌'} Fechas fuera de rango: escalar={escalar} columna={columna}")
+    return correcto
+
+
+if __name__ == "__main__":
+    test_fechas_fuera_de_rango()
@@ -1,90 +1,23 @@
 # plazo_utils.py - CORREGIDO PARA ERROR datetime.date + timedelta
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import pandas as pd
+import fecha_utils
 from fecha_utils import procesar_fecha, es_festivo, formatear_fecha
 
 def calcular_plazo_oficio_cierre(fecha_publicacion):
     """
-    CORRECCIÓN CRÍTICA: Calcula el plazo de oficio de cierre como 7 días hábiles 
-    después de la fecha de publicación, sin contar sábados, domingos y festivos en Colombia.
-    GARANTÍA: Usa solo datetime para evitar error date + timedelta
+    Plazo de oficio de cierre: 7 días hábiles después de la fecha de publicación,
+    sin contar sábados, domingos y festivos en Colombia (motor de días hábiles de fecha_utils).
     """
-    # PASO 1: Convertir la fecha de publicación a objeto datetime (NUNCA date)
-    fecha = procesar_fecha(fecha_publicacion)
-    if fecha is None or pd.isna(fecha):
-        return None
-
-    # PASO 2: VERIFICACIÓN ADICIONAL - Asegurar que es datetime
-    if not isinstance(fecha, datetime):
-        if isinstance(fecha, date):
-            fecha = datetime.combine(fecha, datetime.min.time())
-        else:
-            print(f"⚠️  Tipo inesperado en calcular_plazo_oficio_cierre: {type(fecha)}")
-            return None
-
-    # PASO 3: Contador de días hábiles
-    dias_habiles = 0
-    fecha_actual = fecha
-
-    # PASO 4: Calcular 7 días hábiles a partir de la fecha de publicación
-    while dias_habiles < 7:
-        # OPERACIÓN SEGURA: datetime + timedelta = datetime
-        fecha_actual = fecha_actual + timedelta(days=1)
-
-        # Verificar si es día hábil (no es fin de semana ni festivo)
-        dia_semana = fecha_actual.weekday()  # 0 = lunes, 6 = domingo
-
-        # Si no es sábado (5) ni domingo (6) ni festivo, contamos como día hábil
-        if dia_semana < 5 and not es_festivo(fecha_actual):
-            dias_habiles += 1
-
-    # PASO 5: Retornar la fecha calculada (garantizado datetime)
-    return fecha_actual
+    return fecha_utils.calcular_plazo_oficio_cierre(fecha_publicacion)
 
 def actualizar_plazo_oficio_cierre(df):
     """
-    CORREGIDO: Actualiza la columna 'Plazo de oficio de cierre' en el DataFrame
-    basándose en la columna 'Publicación' con protección contra errores datetime.
+    Actualiza la columna 'Plazo de oficio de cierre' a partir de 'Publicación'
+    (cálculo por columna de fecha_utils).
     """
-    if 'Publicación' not in df.columns:
-        return df
-
-    # NUEVO: Preparar DataFrame para cálculos seguros
-    try:
-        from data_utils import preparar_dataframe_para_calculos
-        df_seguro = preparar_dataframe_para_calculos(df)
-    except ImportError:
-        # Si no está disponible, usar el DataFrame original con cuidado
-        df_seguro = df.copy()
-
-    # Asegurarse de que la columna 'Plazo de oficio de cierre' exista
-    if 'Plazo de oficio de cierre' not in df_seguro.columns:
-        df_seguro['Plazo de oficio de cierre'] = ''
-
-    # Crear una copia del DataFrame
-    df_actualizado = df_seguro.copy()
-
-    # Iterar sobre cada fila
-    for idx, row in df_actualizado.iterrows():
-        try:
-            fecha_publicacion = row.get('Publicación', None)
-            if fecha_publicacion and pd.notna(fecha_publicacion) and fecha_publicacion != '':
-                
-                # VERIFICACIÓN ADICIONAL: Detectar objetos date peligrosos
-                if isinstance(fecha_publicacion, date) and not isinstance(fecha_publicacion, datetime):
-                    print(f"⚠️  Objeto date detectado en fila {idx}, convirtiendo...")
-                    fecha_publicacion = datetime.combine(fecha_publicacion, datetime.min.time())
-                
-                plazo = calcular_plazo_oficio_cierre(fecha_publicacion)
-                if plazo is not None:
-                    df_actualizado.at[idx, 'Plazo de oficio de cierre'] = formatear_fecha(plazo)
-                    
-        except Exception as e:
-            print(f"❌ Error procesando fila {idx} para plazo oficio cierre: {e}")
-            continue
-
-    return df_actualizado
+    return fecha_utils.actualizar_plazo_oficio_cierre(df)
 
 # NUEVA FUNCIÓN DE VERIFICACIÓN
 def verificar_calculo_seguro(fecha_input):
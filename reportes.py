@@ -15,7 +15,10 @@ from datetime import datetime
 
 # Imports locales
 try:
-    from data_utils import formatear_fecha, es_fecha_valida, calcular_porcentaje_avance
+    from data_utils import (
+        formatear_fecha, es_fecha_valida, calcular_porcentaje_avance,
+        calcular_porcentaje_avance_vectorizado
+    )
 except ImportError:
     # Funciones de respaldo
     def formatear_fecha(fecha):
@@ -44,6 +47,9 @@ except ImportError:
         if es_fecha_valida(row.get('Publicación', '')):
             avance += 25
         return avance
+    
+    def calcular_porcentaje_avance_vectorizado(df):
+        return df.apply(calcular_porcentaje_avance, axis=1)
 
 def aplicar_filtros(registros_df, entidad_reporte, tipo_dato_reporte, acuerdo_filtro, 
                    analisis_filtro, estandares_filtro, publicacion_filtro, 
@@ -123,7 +129,7 @@ def mostrar_reportes_limpio(registros_df, entidad_reporte, tipo_dato_reporte,
     
     # Calcular porcentajes de avance si no existe la columna
     if 'Porcentaje Avance' not in df_filtrado.columns:
-        df_filtrado['Porcentaje Avance'] = df_filtrado.apply(calcular_porcentaje_avance, axis=1)
+        df_filtrado['Porcentaje Avance'] = calcular_porcentaje_avance_vectorizado(df_filtrado)
     
     # MÉTRICAS ESENCIALES
     st.markdown("### Métricas")
@@ -291,7 +297,7 @@ def test_reportes():
     }
     
     df_test = pd.DataFrame(test_data)
-    df_test['Porcentaje Avance'] = df_test.apply(calcular_porcentaje_avance, axis=1)
+    df_test['Porcentaje Avance'] = calcular_porcentaje_avance_vectorizado(df_test)
     
     print(f"Test completado: {len(df_test)} registros")
     return df_test
@@ -2,20 +2,365 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import re
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import math
 import time
+import random
+import ssl
+import threading
+import httplib2
+import google_auth_httplib2
 from datetime import datetime
 
+# ===== CACHÉ DE LECTURAS =====
+# Caché compartida por todo el proceso (todas las sesiones de Streamlit usan el
+# mismo spreadsheet). Clave: (spreadsheet_id, nombre_hoja, rango)
+CACHE_TTL_SEGUNDOS = float(os.getenv('SHEETS_CACHE_TTL', '60'))
+_cache_lecturas = {}
+_cache_lock = threading.Lock()
+
+
+def configurar_cache(ttl_segundos):
+    """Configura el tiempo de vida (en segundos) de la caché de lecturas. 0 la desactiva"""
+    global CACHE_TTL_SEGUNDOS
+    CACHE_TTL_SEGUNDOS = max(0, float(ttl_segundos))
+    if CACHE_TTL_SEGUNDOS == 0:
+        invalidar_cache()
+
+
+def _obtener_de_cache(clave):
+    """Devuelve una copia del DataFrame en caché o None si no existe o expiró"""
+    if CACHE_TTL_SEGUNDOS <= 0:
+        return None
+    with _cache_lock:
+        entrada = _cache_lecturas.get(clave)
+        if entrada is None:
+            return None
+        momento, df = entrada
+        if time.monotonic() - momento > CACHE_TTL_SEGUNDOS:
+            del _cache_lecturas[clave]
+            return None
+    return df.copy()
+
+
+def _guardar_en_cache(clave, df):
+    """Guarda una copia del DataFrame leído en la caché"""
+    if CACHE_TTL_SEGUNDOS <= 0:
+        return
+    with _cache_lock:
+        _cache_lecturas[clave] = (time.monotonic(), df.copy())
+
+
+def invalidar_cache(spreadsheet_id=None, nombre_hoja=None):
+    """
+    Invalida entradas de la caché de lecturas.
+    Sin argumentos limpia todo; con nombre_hoja elimina todos los rangos de esa hoja.
+    """
+    with _cache_lock:
+        if spreadsheet_id is None and nombre_hoja is None:
+            _cache_lecturas.clear()
+            _sondas_integridad.clear()
+            return
+        for clave in list(_sondas_integridad.keys()):
+            if (spreadsheet_id is None or clave[0] == spreadsheet_id) and (nombre_hoja is None or clave[1] == nombre_hoja):
+                del _sondas_integridad[clave]
+        for clave in list(_cache_lecturas.keys()):
+            if spreadsheet_id is not None and clave[0] != spreadsheet_id:
+                continue
+            if nombre_hoja is not None and clave[1] != nombre_hoja:
+                continue
+            del _cache_lecturas[clave]
+
+
+# ===== SNAPSHOTS DEL SERVIDOR =====
+# Última versión conocida de cada hoja en el servidor (matriz de strings con headers),
+# usada por las escrituras diferenciales. Clave: (spreadsheet_id, nombre_hoja)
+# _momentos_snapshot guarda cuándo se registró cada uno (lectura o escritura propia)
+_snapshots = {}
+_momentos_snapshot = {}
+
+
+def _guardar_snapshot(spreadsheet_id, nombre_hoja, valores):
+    """Registra la última versión conocida de una hoja"""
+    with _cache_lock:
+        _snapshots[(spreadsheet_id, nombre_hoja)] = [list(fila) for fila in valores]
+        _momentos_snapshot[(spreadsheet_id, nombre_hoja)] = time.monotonic()
+
+
+def _snapshot_vigente(spreadsheet_id, nombre_hoja):
+    """Indica si el snapshot de la hoja tiene menos de CACHE_TTL_SEGUNDOS"""
+    with _cache_lock:
+        momento = _momentos_snapshot.get((spreadsheet_id, nombre_hoja))
+    return momento is not None and time.monotonic() - momento <= CACHE_TTL_SEGUNDOS
+
+
+def _obtener_snapshot(spreadsheet_id, nombre_hoja):
+    """Devuelve la última versión conocida de una hoja o None"""
+    with _cache_lock:
+        valores = _snapshots.get((spreadsheet_id, nombre_hoja))
+        return [list(fila) for fila in valores] if valores is not None else None
+
+
+def _descartar_snapshot(spreadsheet_id=None, nombre_hoja=None):
+    """Descarta snapshots (todos si no se indica hoja)"""
+    with _cache_lock:
+        if spreadsheet_id is None and nombre_hoja is None:
+            _snapshots.clear()
+            _momentos_snapshot.clear()
+            return
+        _snapshots.pop((spreadsheet_id, nombre_hoja), None)
+        _momentos_snapshot.pop((spreadsheet_id, nombre_hoja), None)
+
+
+# Origen de los números de serie de fecha de Google Sheets (igual que Excel/Lotus)
+ORIGEN_SERIAL_SHEETS = '1899-12-30'
+
+
+# ===== CONTROL DE CUOTA Y REINTENTOS =====
+# Cuotas por minuto de la API (lecturas y escrituras se cuentan por separado).
+# Las peticiones que exceden la cuota esperan en lugar de fallar con 429.
+CUOTA_LECTURAS_MINUTO = int(os.getenv('SHEETS_CUOTA_LECTURAS', '60'))
+CUOTA_ESCRITURAS_MINUTO = int(os.getenv('SHEETS_CUOTA_ESCRITURAS', '60'))
+MAX_REINTENTOS = int(os.getenv('SHEETS_MAX_REINTENTOS', '5'))
+BACKOFF_BASE_SEGUNDOS = float(os.getenv('SHEETS_BACKOFF_BASE', '1'))
+BACKOFF_MAXIMO_SEGUNDOS = float(os.getenv('SHEETS_BACKOFF_MAXIMO', '32'))
+TIMEOUT_SEGUNDOS = float(os.getenv('SHEETS_TIMEOUT', '30'))
+CODIGOS_REINTENTABLES = (429, 500, 502, 503, 504)
+TAMANO_POOL_HTTP = int(os.getenv('SHEETS_POOL_HTTP', '8'))
+
+
+class _TokenBucket:
+    """Token bucket: 'capacidad' peticiones por minuto, recargado de forma continua"""
+    
+    def __init__(self, capacidad):
+        self.capacidad = max(1, capacidad)
+        self.tokens = float(self.capacidad)
+        self.recarga_por_segundo = self.capacidad / 60.0
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def adquirir(self):
+        """Bloquea hasta que haya un token disponible y lo consume"""
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.recarga_por_segundo)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.recarga_por_segundo
+            time.sleep(espera)
+
+
+_buckets = {
+    'lectura': _TokenBucket(CUOTA_LECTURAS_MINUTO),
+    'escritura': _TokenBucket(CUOTA_ESCRITURAS_MINUTO)
+}
+
+
+def _es_error_reintentable(error):
+    """Indica si un error de la API es transitorio (cuota, error del servidor o red)"""
+    if isinstance(error, HttpError):
+        return error.resp.status in CODIGOS_REINTENTABLES
+    return isinstance(error, (TimeoutError, ConnectionError, ssl.SSLError))
+
+
+def ejecutar_peticion(request, tipo='lectura', http=None):
+    """
+    Ejecutor central de peticiones a Google Sheets.
+    Respeta la cuota por minuto del tipo de petición y reintenta los errores
+    transitorios con backoff exponencial y jitter. Los demás errores se propagan.
+    Con http se ejecuta sobre esa conexión (ver _PoolHttp) en lugar de la del servicio.
+    """
+    bucket = _buckets.get(tipo, _buckets['lectura'])
+    intento = 0
+    
+    while True:
+        bucket.adquirir()
+        try:
+            if http is not None:
+                return request.execute(http=http)
+            return request.execute()
+        except Exception as e:
+            if not _es_error_reintentable(e) or intento >= MAX_REINTENTOS:
+                raise
+            espera = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** intento))
+            time.sleep(espera / 2 + random.uniform(0, espera / 2))
+            intento += 1
+
+
+# ===== POOL DE CONEXIONES HTTP =====
+# httplib2.Http no es seguro entre hilos: cada petición toma prestada una conexión
+# autorizada del pool (o crea una nueva si no hay libres) y la devuelve al terminar.
+# El pool es del manager, compartido por todo el proceso, así que las sesiones y
+# reruns nuevos (cada uno en su propio hilo) reutilizan conexiones ya abiertas.
+class _PoolHttp:
+    """Conexiones AuthorizedHttp libres, protegidas por un lock"""
+    
+    def __init__(self, credenciales, tamano=TAMANO_POOL_HTTP):
+        self.credenciales = credenciales
+        self.tamano = max(1, tamano)
+        self.libres = []
+        self.lock = threading.Lock()
+    
+    def crear(self):
+        """Conexión autorizada nueva, con timeout por petición"""
+        return google_auth_httplib2.AuthorizedHttp(
+            self.credenciales,
+            http=httplib2.Http(timeout=TIMEOUT_SEGUNDOS)
+        )
+    
+    def tomar(self):
+        """Saca una conexión libre del pool (o crea una si no hay)"""
+        with self.lock:
+            if self.libres:
+                return self.libres.pop()
+        return self.crear()
+    
+    def devolver(self, http):
+        """Devuelve una conexión al pool; las que sobran del tamaño máximo se cierran"""
+        with self.lock:
+            if len(self.libres) < self.tamano:
+                self.libres.append(http)
+                return
+        http.close()
+    
+    def descartar(self, http):
+        """Cierra una conexión que falló a nivel de red (no vuelve al pool)"""
+        try:
+            http.close()
+        except Exception:
+            pass
+
+
+# Hoja pequeña de clave/valor para estado del sistema (hash del último respaldo, etc.)
+HOJA_METADATOS = "Metadatos_Sistema"
+
+# Protección de hojas: rangos protegidos ya verificados en este proceso y, por hoja,
+# el valor de la sonda y el hash de contenido de la última verificación con una copia de la hoja
+DESCRIPCION_PROTECCION = "DTEM: hoja protegida, solo editable por la aplicación"
+RANGO_HUELLA = "A:AZ"
+_hojas_protegidas = set()
+_sondas_integridad = {}
+
+
+# ===== AVISOS EN LA INTERFAZ =====
+# Los hilos sin sesión de Streamlit (la cola de escritura diferida) no pueden mostrar
+# mensajes. Un hilo que llama a diferir_avisos() acumula los avisos del manager en
+# lugar de mostrarlos; tomar_avisos() los entrega para que la interfaz los muestre.
+_avisos_hilo = threading.local()
+
+
+def _avisar(tipo, mensaje):
+    """st.error / st.warning / st.success / st.info, o acumulado si el hilo difiere avisos"""
+    avisos = getattr(_avisos_hilo, 'avisos', None)
+    if avisos is not None:
+        avisos.append((tipo, mensaje))
+        return
+    getattr(st, tipo)(mensaje)
+
+
+def diferir_avisos():
+    """El hilo actual acumula los avisos del manager en lugar de mostrarlos"""
+    if getattr(_avisos_hilo, 'avisos', None) is None:
+        _avisos_hilo.avisos = []
+
+
+def tomar_avisos():
+    """Avisos acumulados por el hilo actual, [(tipo, mensaje)], y vacía la lista"""
+    avisos = getattr(_avisos_hilo, 'avisos', None) or []
+    if avisos:
+        _avisos_hilo.avisos = []
+    return avisos
+
+
+# ===== METADATOS DEL SPREADSHEET =====
+# Título del spreadsheet y mapa título de hoja → sheetId, obtenidos con máscara de campos.
+# Clave: spreadsheet_id. Valor: {'titulo', 'hojas' (dict ordenado), 'timestamp'}
+METADATOS_TTL_SEGUNDOS = float(os.getenv('SHEETS_METADATA_TTL', '300'))
+_metadatos = {}
+
+
+def _descartar_metadatos(spreadsheet_id=None):
+    """Descarta los metadatos en memoria (todos si no se indica spreadsheet)"""
+    with _cache_lock:
+        if spreadsheet_id is None:
+            _metadatos.clear()
+        else:
+            _metadatos.pop(spreadsheet_id, None)
+
+
+def refrescar_datos():
+    """Hook manual de actualización: descarta la caché para forzar lectura desde Google Sheets"""
+    invalidar_cache()
+    _descartar_snapshot()
+    _descartar_metadatos()
+
+
+# El backend local (almacenamiento_local) no es otra implementación de esta clase:
+# AlmacenamientoLocal hereda de GoogleSheetsManager y sustituye solo el servicio de la
+# API, así que toda la lógica (caché, escrituras diferenciales, operaciones por Cod,
+# sondas) es la misma en los dos backends.
 class GoogleSheetsManager:
     def __init__(self):
-        self.service = None
+        self._credenciales = None
+        self._servicio_fijo = None
+        self._servicio_lock = threading.Lock()
+        self._pool_http = None
         self.spreadsheet_id = None
         self.conectar()
     
+    def _ejecutar(self, request, tipo='lectura'):
+        """
+        Ejecuta una petición con control de cuota y reintentos (ver ejecutar_peticion)
+        sobre una conexión prestada del pool, que se devuelve al terminar.
+        """
+        pool = self._pool_http
+        if pool is None:
+            return ejecutar_peticion(request, tipo)
+        
+        http = pool.tomar()
+        try:
+            resultado = ejecutar_peticion(request, tipo, http)
+        except HttpError:
+            # Error de la API: la conexión sigue siendo válida
+            pool.devolver(http)
+            raise
+        except Exception:
+            pool.descartar(http)
+            raise
+        pool.devolver(http)
+        return resultado
+    
+    @property
+    def service(self):
+        """
+        Servicio de la API, uno solo por proceso. Solo se usa para construir peticiones
+        (sin E/S); la ejecución va siempre por _ejecutar con una conexión del pool.
+        """
+        if self._servicio_fijo is None:
+            with self._servicio_lock:
+                if self._servicio_fijo is None:
+                    self._servicio_fijo = build(
+                        'sheets', 'v4', http=self._pool_http.crear(), cache_discovery=False
+                    )
+        return self._servicio_fijo
+    
+    @service.setter
+    def service(self, servicio):
+        """Fija el servicio (backends locales, que no usan el pool)"""
+        self._servicio_fijo = servicio
+    
     def conectar(self):
-        """Establece conexión con Google Sheets API"""
+        """
+        Carga credenciales y configuración de Google Sheets API.
+        La conexión se verifica de forma diferida: los errores aparecen en la primera
+        petición (o con verificar_conexion / test_connection).
+        """
         try:
             # Método 1: Desde st.secrets (recomendado para Streamlit Cloud)
             if 'google_sheets' in st.secrets:
@@ -61,151 +406,473 @@ class GoogleSheetsManager:
                 )
                 self.spreadsheet_id = os.getenv('SPREADSHEET_ID')
             
-            # Construir el servicio
-            self.service = build('sheets', 'v4', credentials=credentials)
+            # Las conexiones (con timeout por petición) se crean en el pool al primer uso
+            self._credenciales = credentials
+            self._pool_http = _PoolHttp(credentials)
             
             if not self.spreadsheet_id:
                 raise ValueError("No se encontró SPREADSHEET_ID en la configuración")
-                
-            # Verificar conexión
-            self.verificar_conexion()
             
         except Exception as e:
-            st.error(f"Error al conectar con Google Sheets: {str(e)}")
-            st.error("Por favor, verifica la configuración de credenciales.")
+            _avisar('error', f"Error al conectar con Google Sheets: {str(e)}")
+            _avisar('error', "Por favor, verifica la configuración de credenciales.")
             raise e
     
     def verificar_conexion(self):
         """Verifica que la conexión funcione correctamente"""
         try:
-            # Intentar obtener metadatos del spreadsheet
-            metadata = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
+            # Intentar obtener metadatos del spreadsheet (quedan en memoria)
+            metadata = self._obtener_metadatos(refrescar=True)
             
-            st.success(f"✅ Conectado exitosamente a: {metadata.get('properties', {}).get('title', 'Google Sheet')}")
+            _avisar('success', f"✅ Conectado exitosamente a: {metadata['titulo'] or 'Google Sheet'}")
             return True
             
         except HttpError as e:
             if e.resp.status == 404:
-                st.error("❌ Spreadsheet no encontrado. Verifica el SPREADSHEET_ID.")
+                _avisar('error', "❌ Spreadsheet no encontrado. Verifica el SPREADSHEET_ID.")
             elif e.resp.status == 403:
-                st.error("❌ Sin permisos. Verifica que el service account tenga acceso al spreadsheet.")
+                _avisar('error', "❌ Sin permisos. Verifica que el service account tenga acceso al spreadsheet.")
             else:
-                st.error(f"❌ Error HTTP {e.resp.status}: {e}")
+                _avisar('error', f"❌ Error HTTP {e.resp.status}: {e}")
             return False
         except Exception as e:
-            st.error(f"❌ Error de conexión: {str(e)}")
+            _avisar('error', f"❌ Error de conexión: {str(e)}")
             return False
     
-    def leer_hoja(self, nombre_hoja="Registros", rango=None):
-        """Lee datos de una hoja específica"""
+    def _obtener_metadatos(self, refrescar=False):
+        """
+        Devuelve título y mapa de hojas (título → sheetId) desde memoria.
+        Solo consulta la API (properties.title y sheets.properties) si no hay
+        metadatos, si expiraron o si se pide refrescar.
+        """
+        with _cache_lock:
+            metadata = _metadatos.get(self.spreadsheet_id)
+            vigente = (
+                metadata is not None and
+                time.monotonic() - metadata['timestamp'] <= METADATOS_TTL_SEGUNDOS
+            )
+            if vigente and not refrescar:
+                return {'titulo': metadata['titulo'], 'hojas': dict(metadata['hojas'])}
+        
+        spreadsheet = self._ejecutar(self.service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id,
+            fields='properties.title,sheets.properties(sheetId,title)'
+        ), 'lectura')
+        
+        hojas = {}
+        for sheet in spreadsheet.get('sheets', []):
+            hojas[sheet['properties']['title']] = sheet['properties']['sheetId']
+        titulo = spreadsheet.get('properties', {}).get('title', '')
+        
+        with _cache_lock:
+            _metadatos[self.spreadsheet_id] = {
+                'titulo': titulo,
+                'hojas': hojas,
+                'timestamp': time.monotonic()
+            }
+        return {'titulo': titulo, 'hojas': dict(hojas)}
+    
+    def _registrar_hoja_en_metadatos(self, nombre_hoja, sheet_id):
+        """Actualiza el mapa de hojas en memoria tras crear (sheet_id) o eliminar (None) una hoja"""
+        with _cache_lock:
+            metadata = _metadatos.get(self.spreadsheet_id)
+            if metadata is None:
+                return
+            if sheet_id is None:
+                metadata['hojas'].pop(nombre_hoja, None)
+            else:
+                metadata['hojas'][nombre_hoja] = sheet_id
+    
+    def _valores_a_dataframe(self, values, nombre_hoja):
+        """
+        Convierte la lista de filas devuelta por la API en un DataFrame de strings.
+        La lectura es siempre textual: el editor devuelve este mismo DataFrame a la hoja
+        y las escrituras diferenciales comparan texto contra el snapshot. Las fechas se
+        interpretan una vez por columna en parseo_fechas, no al leer.
+        """
+        if not values:
+            _avisar('warning', f"La hoja '{nombre_hoja}' está vacía.")
+            return pd.DataFrame()
+        
+        # Convertir a DataFrame
+        if len(values) > 1:
+            headers = values[0]
+            data = values[1:]
+            
+            # Asegurar que todas las filas tengan el mismo número de columnas
+            max_cols = len(headers)
+            data_normalized = []
+            for row in data:
+                # Extender filas cortas con valores vacíos
+                if len(row) < max_cols:
+                    row.extend([''] * (max_cols - len(row)))
+                # Truncar filas largas
+                elif len(row) > max_cols:
+                    row = row[:max_cols]
+                data_normalized.append(row)
+            
+            df = pd.DataFrame(data_normalized, columns=headers)
+            
+            # Limpiar valores None y convertir a string
+            df = df.fillna('')
+            df = df.astype(str)
+            
+            # Limpiar valores que sean 'None' como string
+            df = df.replace('None', '')
+            
+            return df
+        else:
+            # Solo headers, sin datos
+            return pd.DataFrame(columns=values[0])
+    
+    def leer_hoja(self, nombre_hoja="Registros", rango=None, usar_cache=True):
+        """Lee datos de una hoja específica (usa la caché de lecturas si está vigente)"""
+        return self._leer_hoja(nombre_hoja, rango, usar_cache)[0]
+    
+    def _leer_hoja(self, nombre_hoja="Registros", rango=None, usar_cache=True):
+        """
+        Igual que leer_hoja, pero devuelve (df, error): error es None si la lectura
+        funcionó (aunque la hoja esté vacía) o el mensaje si no se pudo leer.
+        El estado va con la respuesta y no en el manager, que comparten todas las sesiones.
+        """
+        clave_cache = (self.spreadsheet_id, nombre_hoja, rango)
+        if usar_cache:
+            df_cache = _obtener_de_cache(clave_cache)
+            if df_cache is not None:
+                return df_cache, None
+        
         try:
             if rango:
                 range_name = f"{nombre_hoja}!{rango}"
             else:
                 range_name = nombre_hoja
             
-            result = self.service.spreadsheets().values().get(
+            result = self._ejecutar(self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_name,
                 valueRenderOption='UNFORMATTED_VALUE',
                 dateTimeRenderOption='FORMATTED_STRING'
-            ).execute()
-            
-            values = result.get('values', [])
+            ), 'lectura')
             
-            if not values:
-                st.warning(f"La hoja '{nombre_hoja}' está vacía.")
-                return pd.DataFrame()
-            
-            # Convertir a DataFrame
-            if len(values) > 1:
-                headers = values[0]
-                data = values[1:]
-                
-                # Asegurar que todas las filas tengan el mismo número de columnas
-                max_cols = len(headers)
-                data_normalized = []
-                for row in data:
-                    # Extender filas cortas con valores vacíos
-                    if len(row) < max_cols:
-                        row.extend([''] * (max_cols - len(row)))
-                    # Truncar filas largas
-                    elif len(row) > max_cols:
-                        row = row[:max_cols]
-                    data_normalized.append(row)
-                
-                df = pd.DataFrame(data_normalized, columns=headers)
-                
-                # Limpiar valores None y convertir a string
-                df = df.fillna('')
-                df = df.astype(str)
-                
-                # Limpiar valores que sean 'None' como string
-                df = df.replace('None', '')
-                
-                return df
-            else:
-                # Solo headers, sin datos
-                return pd.DataFrame(columns=values[0])
+            df = self._valores_a_dataframe(result.get('values', []), nombre_hoja)
+            _guardar_en_cache(clave_cache, df)
+            if rango is None:
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, self._dataframe_a_valores(df))
+            return df, None
                 
         except HttpError as e:
             if e.resp.status == 400:
-                st.error(f"❌ Rango inválido o hoja '{nombre_hoja}' no existe.")
-            else:
-                st.error(f"❌ Error al leer Google Sheets: {e}")
-            return pd.DataFrame()
+                # La hoja no existe: se trata como vacía, no como error de lectura
+                _avisar('error', f"❌ Rango inválido o hoja '{nombre_hoja}' no existe.")
+                return pd.DataFrame(), None
+            _avisar('error', f"❌ Error al leer Google Sheets: {e}")
+            return pd.DataFrame(), str(e)
         except Exception as e:
-            st.error(f"❌ Error inesperado al leer datos: {str(e)}")
-            return pd.DataFrame()
+            _avisar('error', f"❌ Error inesperado al leer datos: {str(e)}")
+            return pd.DataFrame(), str(e)
+    
+    def leer_hojas(self, nombres_hojas, usar_cache=True):
+        """
+        Lee varias hojas completas en una sola petición values.batchGet.
+        Devuelve (hojas, errores): hojas es {nombre_hoja: DataFrame} en el orden solicitado
+        y errores {nombre_hoja: mensaje} con las hojas que no se pudieron leer (un
+        DataFrame vacío sin error es una hoja realmente vacía).
+        """
+        resultado = {}
+        errores = {}
+        pendientes = []
+        
+        for nombre_hoja in nombres_hojas:
+            df_cache = _obtener_de_cache((self.spreadsheet_id, nombre_hoja, None)) if usar_cache else None
+            if df_cache is not None:
+                resultado[nombre_hoja] = df_cache
+            elif nombre_hoja not in pendientes:
+                pendientes.append(nombre_hoja)
+        
+        if pendientes:
+            try:
+                result = self._ejecutar(self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=pendientes,
+                    valueRenderOption='UNFORMATTED_VALUE',
+                    dateTimeRenderOption='FORMATTED_STRING'
+                ), 'lectura')
+                
+                for nombre_hoja, rango_valores in zip(pendientes, result.get('valueRanges', [])):
+                    df = self._valores_a_dataframe(rango_valores.get('values', []), nombre_hoja)
+                    _guardar_en_cache((self.spreadsheet_id, nombre_hoja, None), df)
+                    _guardar_snapshot(self.spreadsheet_id, nombre_hoja, self._dataframe_a_valores(df))
+                    resultado[nombre_hoja] = df
+                    
+            except HttpError as e:
+                if e.resp.status == 400:
+                    # batchGet falla completo si alguna hoja no existe: leer una por una
+                    for nombre_hoja in pendientes:
+                        resultado[nombre_hoja], error = self._leer_hoja(nombre_hoja, usar_cache=False)
+                        if error is not None:
+                            errores[nombre_hoja] = error
+                else:
+                    for nombre_hoja in pendientes:
+                        errores[nombre_hoja] = str(e)
+                    _avisar('error', f"❌ Error al leer Google Sheets: {e}")
+            except Exception as e:
+                for nombre_hoja in pendientes:
+                    errores[nombre_hoja] = str(e)
+                _avisar('error', f"❌ Error inesperado al leer datos: {str(e)}")
+        
+        hojas = {nombre_hoja: resultado.get(nombre_hoja, pd.DataFrame()) for nombre_hoja in nombres_hojas}
+        return hojas, errores
+    
+    def _dataframe_a_valores(self, df):
+        """Convierte un DataFrame en lista de listas de strings (headers incluidos) para la API"""
+        if df.empty:
+            if len(df.columns) == 0:
+                return []
+            return [[str(col) for col in df.columns]]  # Solo headers
+        
+        # Reemplazar NaN y None con cadenas vacías
+        df_clean = df.fillna('')
+        df_clean = df_clean.astype(str)
+        df_clean = df_clean.replace('nan', '')
+        df_clean = df_clean.replace('None', '')
+        
+        return [[str(col) for col in df_clean.columns]] + df_clean.values.tolist()
+    
+    def _calcular_diferencias(self, anteriores, nuevos, nombre_hoja):
+        """
+        Compara dos matrices de valores y devuelve los tramos de celdas cambiadas
+        como entradas para values.batchUpdate. Las celdas que sobran de la versión
+        anterior (filas o columnas eliminadas) se escriben vacías.
+        """
+        data = []
+        total_filas = max(len(anteriores), len(nuevos))
+        
+        for i in range(total_filas):
+            fila_anterior = anteriores[i] if i < len(anteriores) else []
+            fila_nueva = nuevos[i] if i < len(nuevos) else []
+            ancho = max(len(fila_anterior), len(fila_nueva))
+            fila_anterior = list(fila_anterior) + [''] * (ancho - len(fila_anterior))
+            fila_nueva = list(fila_nueva) + [''] * (ancho - len(fila_nueva))
+            
+            j = 0
+            while j < ancho:
+                if fila_nueva[j] == fila_anterior[j]:
+                    j += 1
+                    continue
+                # Agrupar celdas contiguas cambiadas en un solo rango
+                k = j
+                while k < ancho and fila_nueva[k] != fila_anterior[k]:
+                    k += 1
+                numero_fila = i + 1
+                data.append({
+                    'range': f"{nombre_hoja}!{self._get_column_letter(j + 1)}{numero_fila}:"
+                             f"{self._get_column_letter(k)}{numero_fila}",
+                    'values': [fila_nueva[j:k]]
+                })
+                j = k
+        
+        return data
+    
+    @staticmethod
+    def _reporte_escritura(nombre_hoja, valores, esperado, reportado):
+        """Lo enviado y lo que la API dice haber escrito (se pasa a verificar_escritura)"""
+        return {
+            'nombre_hoja': nombre_hoja,
+            'valores': valores,
+            'esperado': esperado,
+            'reportado': reportado
+        }
+    
+    @staticmethod
+    def _celdas_equivalentes(enviada, leida):
+        """
+        Compara una celda enviada como texto USER_ENTERED con la leída sin formato
+        (números como número, fechas como número de serie): se normalizan ambos lados
+        para no confundir diferencias de formato con errores de escritura.
+        """
+        from parseo_fechas import procesar_fecha
+        
+        enviada = '' if enviada is None else str(enviada).strip()
+        if isinstance(leida, str):
+            leida = leida.strip()
+        if enviada == '' or leida in ('', None):
+            return enviada == '' and leida in ('', None)
+        if isinstance(leida, bool):
+            return enviada.upper() == str(leida).upper()
+        
+        fecha = procesar_fecha(enviada)
+        if fecha is not None:
+            if isinstance(leida, (int, float)):
+                leida = pd.Timestamp(ORIGEN_SERIAL_SHEETS) + pd.Timedelta(days=int(leida))
+            leida = procesar_fecha(leida)
+            return leida is not None and leida.date() == fecha.date()
+        
+        if isinstance(leida, (int, float)):
+            texto = enviada.replace(',', '.')
+            factor = 100.0 if texto.endswith('%') else 1.0
+            try:
+                return math.isclose(float(texto.rstrip('%')) / factor, float(leida), rel_tol=1e-9, abs_tol=1e-9)
+            except ValueError:
+                return False
+        
+        return str(leida) == enviada
     
-    def escribir_hoja(self, df, nombre_hoja="Registros", limpiar_hoja=True):
-        """Escribe un DataFrame completo a una hoja"""
+    def verificar_escritura(self, reporte, muestras=0):
+        """
+        Verifica una escritura con el reporte que devolvió (escribir_hoja_diferencial):
+        primero los contadores de la respuesta (updatedRows/updatedColumns/updatedCells),
+        sin volver a leer la hoja. Con muestras > 0 compara además unas pocas filas al
+        azar (una sola petición). Devuelve (ok, detalle).
+        """
+        if not reporte:
+            return False, "Sin escritura registrada para verificar"
+        nombre_hoja = reporte['nombre_hoja']
+        
+        for campo, esperado in reporte['esperado'].items():
+            reportado = reporte['reportado'].get(campo, 0)
+            if reportado != esperado:
+                return False, f"La API reportó {reportado} {campo} actualizadas (esperadas {esperado})"
+        
+        valores = reporte['valores']
+        if muestras <= 0 or len(valores) < 2:
+            return True, "Escritura verificada por la respuesta de la API"
+        
+        try:
+            ancho = max(len(fila) for fila in valores)
+            indices = sorted(random.sample(range(1, len(valores)), min(muestras, len(valores) - 1)))
+            rangos = [
+                f"{nombre_hoja}!A{i + 1}:{self._get_column_letter(ancho)}{i + 1}" for i in indices
+            ]
+            result = self._ejecutar(self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=rangos,
+                valueRenderOption='UNFORMATTED_VALUE',
+                dateTimeRenderOption='SERIAL_NUMBER'
+            ), 'lectura')
+        
+            for i, rango_valores in zip(indices, result.get('valueRanges', [])):
+                leida = (rango_valores.get('values') or [[]])[0]
+                leida = list(leida) + [''] * (ancho - len(leida))
+                enviada = list(valores[i]) + [''] * (ancho - len(valores[i]))
+                if not all(self._celdas_equivalentes(e, l) for e, l in zip(enviada, leida)):
+                    return False, f"La fila {i + 1} no coincide con lo enviado"
+        
+            return True, f"Escritura verificada ({len(indices)} filas de muestra)"
+        
+        except Exception as e:
+            return False, f"No se pudo verificar la muestra: {str(e)}"
+    
+    def escribir_hoja_diferencial(self, df, nombre_hoja="Registros"):
+        """
+        Escribe un DataFrame enviando solo las celdas que cambiaron respecto a la
+        última versión conocida del servidor, en una única petición values.batchUpdate.
+        No limpia la hoja, por lo que nunca queda vacía durante la escritura.
+        Devuelve el reporte de la escritura (para verificar_escritura) o None si falló.
+        """
+        try:
+            anteriores = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+            if anteriores is None:
+                # Sin versión conocida: leer la hoja para obtenerla
+                if nombre_hoja in self.listar_hojas():
+                    self.leer_hoja(nombre_hoja, usar_cache=False)
+                    anteriores = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+        
+            if anteriores is None:
+                return self._escribir_hoja_completa(df, nombre_hoja, limpiar_hoja=True)
+        
+            nuevos = self._dataframe_a_valores(df)
+            data = self._calcular_diferencias(anteriores, nuevos, nombre_hoja)
+        
+            if not data:
+                _avisar('success', f"✅ Sin cambios que guardar en '{nombre_hoja}'")
+                return self._reporte_escritura(nombre_hoja, nuevos, {'celdas': 0}, {'celdas': 0})
+        
+            body = {
+                'valueInputOption': 'USER_ENTERED',
+                'data': data
+            }
+        
+            result = self._ejecutar(self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            _guardar_snapshot(self.spreadsheet_id, nombre_hoja, nuevos)
+        
+            cells_updated = result.get('totalUpdatedCells', 0)
+            _avisar('success', f"✅ {cells_updated} celdas actualizadas en '{nombre_hoja}'")
+        
+            return self._reporte_escritura(nombre_hoja, nuevos, {
+                'celdas': sum(len(d['values'][0]) for d in data)
+            }, {
+                'celdas': cells_updated
+            })
+        
+        except Exception as e:
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+            _avisar('error', f"❌ Error al escribir en Google Sheets: {str(e)}")
+            return None
+    
+    def escribir_hoja(self, df, nombre_hoja="Registros", limpiar_hoja=True, diferencial=False):
+        """
+        Escribe un DataFrame completo a una hoja.
+        Con diferencial=True solo envía las celdas modificadas (ver escribir_hoja_diferencial).
+        """
+        if diferencial:
+            return self.escribir_hoja_diferencial(df, nombre_hoja) is not None
+        return self._escribir_hoja_completa(df, nombre_hoja, limpiar_hoja) is not None
+    
+    def _escribir_hoja_completa(self, df, nombre_hoja, limpiar_hoja=True):
+        """Escritura completa (update desde A1); devuelve el reporte o None si falló"""
         try:
             # Preparar datos para Google Sheets
             # Convertir DataFrame a lista de listas
-            if df.empty:
-                values = [df.columns.tolist()]  # Solo headers
-            else:
-                # Reemplazar NaN y None con cadenas vacías
-                df_clean = df.fillna('')
-                df_clean = df_clean.astype(str)
-                df_clean = df_clean.replace('nan', '')
-                df_clean = df_clean.replace('None', '')
-                
-                values = [df_clean.columns.tolist()] + df_clean.values.tolist()
-            
+            values = self._dataframe_a_valores(df)
+        
             # Limpiar la hoja si se solicita
             if limpiar_hoja:
                 self.limpiar_hoja(nombre_hoja)
-            
+        
             # Escribir datos
             body = {
                 'values': values
             }
-            
-            result = self.service.spreadsheets().values().update(
+        
+            result = self._ejecutar(self.service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range=f"{nombre_hoja}!A1",
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
-            
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            if limpiar_hoja:
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, values)
+            else:
+                _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+        
             rows_updated = result.get('updatedRows', 0)
-            st.success(f"✅ {rows_updated} filas actualizadas en '{nombre_hoja}'")
-            
-            return True
-            
+            _avisar('success', f"✅ {rows_updated} filas actualizadas en '{nombre_hoja}'")
+        
+            return self._reporte_escritura(nombre_hoja, values, {
+                'filas': len(values),
+                'columnas': max((len(fila) for fila in values), default=0),
+                'celdas': sum(len(fila) for fila in values)
+            }, {
+                'filas': result.get('updatedRows', 0),
+                'columnas': result.get('updatedColumns', 0),
+                'celdas': result.get('updatedCells', 0)
+            })
+        
         except Exception as e:
-            st.error(f"❌ Error al escribir en Google Sheets: {str(e)}")
-            return False
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+            _avisar('error', f"❌ Error al escribir en Google Sheets: {str(e)}")
+            return None
     
     def actualizar_fila(self, df, numero_fila, nombre_hoja="Registros"):
         """Actualiza una fila específica (número_fila empezando desde 1 para headers)"""
         try:
             if numero_fila < 2:  # Fila 1 son los headers
-                st.error("No se puede actualizar la fila de headers")
+                _avisar('error', "No se puede actualizar la fila de headers")
                 return False
             
             # Preparar datos de la fila
@@ -220,90 +887,140 @@ class GoogleSheetsManager:
                 'values': [fila_datos]
             }
             
-            result = self.service.spreadsheets().values().update(
+            result = self._ejecutar(self.service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range=rango,
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            
+            snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+            if snapshot is not None and len(snapshot) >= numero_fila:
+                snapshot[numero_fila - 1] = fila_datos
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, snapshot)
+            else:
+                _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
             
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al actualizar fila: {str(e)}")
+            _avisar('error', f"❌ Error al actualizar fila: {str(e)}")
             return False
     
+    def _hoja_tiene_headers(self, nombre_hoja):
+        """Indica si la hoja tiene fila de headers (usa el snapshot o lee solo la fila 1)"""
+        snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+        if snapshot is not None:
+            return bool(snapshot and snapshot[0])
+        
+        if nombre_hoja not in self.listar_hojas():
+            # Si no existe la hoja, crearla
+            self.crear_hoja(nombre_hoja)
+            return False
+        
+        result = self._ejecutar(self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{nombre_hoja}!1:1"
+        ), 'lectura')
+        return bool(result.get('values'))
+    
+    def _append_filas(self, filas, nombre_hoja):
+        """
+        Agrega filas al final de la tabla con values.append (INSERT_ROWS).
+        La API resuelve la posición, así que dos sesiones pueden agregar a la vez.
+        """
+        result = self._ejecutar(self.service.spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{nombre_hoja}!A1",
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            body={'values': filas}
+        ), 'escritura')
+        invalidar_cache(self.spreadsheet_id, nombre_hoja)
+        
+        # Conservar el snapshot solo si las filas quedaron justo después de la última conocida
+        rango_actualizado = result.get('updates', {}).get('updatedRange', '')
+        coincidencia = re.search(r'![A-Z]+(\d+)', rango_actualizado)
+        snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+        if coincidencia and snapshot is not None and int(coincidencia.group(1)) == len(snapshot) + 1:
+            _guardar_snapshot(self.spreadsheet_id, nombre_hoja, snapshot + filas)
+        else:
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+        
+        return result.get('updates', {}).get('updatedRows', 0)
+    
     def agregar_filas(self, df, nombre_hoja="Registros"):
         """Agrega nuevas filas al final de la hoja"""
+        return self.agregar_filas_lote([df], nombre_hoja)
+    
+    def agregar_filas_lote(self, lotes, nombre_hoja="Registros"):
+        """
+        Agrega varios lotes de filas en una sola petición values.append.
+        Cada lote puede ser un DataFrame o una lista de filas (listas de valores).
+        Si la hoja no tiene headers, se escriben los del primer DataFrame.
+        """
         try:
-            # Leer datos existentes para saber dónde agregar
-            df_existente = self.leer_hoja(nombre_hoja)
-            
-            if df_existente.empty:
-                # Si no hay datos, escribir todo incluyendo headers
-                return self.escribir_hoja(df, nombre_hoja, limpiar_hoja=True)
+            nuevas_filas = []
+            headers = None
+            for lote in lotes:
+                if isinstance(lote, pd.DataFrame):
+                    if lote.empty:
+                        continue
+                    valores = self._dataframe_a_valores(lote)
+                    headers = headers or valores[0]
+                    nuevas_filas.extend(valores[1:])
+                else:
+                    nuevas_filas.extend(
+                        ['' if v is None or str(v) in ('nan', 'None') else str(v) for v in fila]
+                        for fila in lote
+                    )
             
-            # Preparar nuevas filas
-            if df.empty:
+            if not nuevas_filas:
                 return True
             
-            df_clean = df.fillna('').astype(str)
-            df_clean = df_clean.replace('nan', '').replace('None', '')
-            nuevas_filas = df_clean.values.tolist()
-            
-            # Calcular el rango para agregar
-            fila_inicio = len(df_existente) + 2  # +2 porque: +1 por headers, +1 por siguiente fila disponible
-            
-            body = {
-                'values': nuevas_filas
-            }
-            
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{nombre_hoja}!A{fila_inicio}",
-                valueInputOption='USER_ENTERED',
-                body=body
-            ).execute()
+            if not self._hoja_tiene_headers(nombre_hoja):
+                if headers is None:
+                    _avisar('error', f"❌ La hoja '{nombre_hoja}' no tiene headers y los lotes no los incluyen")
+                    return False
+                # Si no hay datos, escribir todo incluyendo headers
+                nuevas_filas = [headers] + nuevas_filas
             
-            rows_updated = result.get('updatedRows', 0)
-            st.success(f"✅ {rows_updated} filas agregadas en '{nombre_hoja}'")
+            rows_updated = self._append_filas(nuevas_filas, nombre_hoja)
+            _avisar('success', f"✅ {rows_updated} filas agregadas en '{nombre_hoja}'")
             
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al agregar filas: {str(e)}")
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+            _avisar('error', f"❌ Error al agregar filas: {str(e)}")
             return False
     
     def limpiar_hoja(self, nombre_hoja="Registros"):
         """Limpia completamente una hoja"""
         try:
-            # Obtener información de la hoja
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            # Buscar el sheet_id
-            sheet_id = None
-            for sheet in spreadsheet['sheets']:
-                if sheet['properties']['title'] == nombre_hoja:
-                    sheet_id = sheet['properties']['sheetId']
-                    break
+            # Buscar el sheet_id (desde los metadatos en memoria)
+            sheet_id = self._obtener_sheet_id(nombre_hoja)
             
             if sheet_id is None:
                 # Si no existe la hoja, crearla
-                self.crear_hoja(nombre_hoja)
+                if not self.crear_hoja(nombre_hoja):
+                    return False
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, [])
                 return True
             
             # Limpiar contenido
-            self.service.spreadsheets().values().clear(
+            self._ejecutar(self.service.spreadsheets().values().clear(
                 spreadsheetId=self.spreadsheet_id,
                 range=nombre_hoja
-            ).execute()
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            _guardar_snapshot(self.spreadsheet_id, nombre_hoja, [])
             
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al limpiar hoja: {str(e)}")
+            _avisar('error', f"❌ Error al limpiar hoja: {str(e)}")
             return False
     
     def crear_hoja(self, nombre_hoja):
@@ -319,34 +1036,450 @@ class GoogleSheetsManager:
                 }]
             }
             
-            self.service.spreadsheets().batchUpdate(
+            result = self._ejecutar(self.service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ), 'escritura')
+            
+            propiedades = result.get('replies', [{}])[0].get('addSheet', {}).get('properties', {})
+            if 'sheetId' in propiedades:
+                self._registrar_hoja_en_metadatos(nombre_hoja, propiedades['sheetId'])
+            else:
+                _descartar_metadatos(self.spreadsheet_id)
+            
+            _avisar('success', f"✅ Hoja '{nombre_hoja}' creada exitosamente")
+            return True
+            
+        except Exception as e:
+            # Otra sesión pudo crear o borrar hojas: los metadatos ya no son confiables
+            _descartar_metadatos(self.spreadsheet_id)
+            _avisar('error', f"❌ Error al crear hoja: {str(e)}")
+            return False
+    
+    def eliminar_hoja(self, nombre_hoja):
+        """Elimina una hoja del spreadsheet"""
+        try:
+            sheet_id = self._obtener_sheet_id(nombre_hoja)
+            if sheet_id is None:
+                return True
+            
+            body = {
+                'requests': [{
+                    'deleteSheet': {
+                        'sheetId': sheet_id
+                    }
+                }]
+            }
+            
+            self._ejecutar(self.service.spreadsheets().batchUpdate(
                 spreadsheetId=self.spreadsheet_id,
                 body=body
-            ).execute()
+            ), 'escritura')
+            self._registrar_hoja_en_metadatos(nombre_hoja, None)
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
             
-            st.success(f"✅ Hoja '{nombre_hoja}' creada exitosamente")
+            _avisar('success', f"✅ Hoja '{nombre_hoja}' eliminada")
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al crear hoja: {str(e)}")
+            _descartar_metadatos(self.spreadsheet_id)
+            _avisar('error', f"❌ Error al eliminar hoja: {str(e)}")
             return False
     
     def listar_hojas(self):
         """Lista todas las hojas disponibles en el spreadsheet"""
         try:
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
+            return list(self._obtener_metadatos()['hojas'].keys())
             
-            hojas = []
-            for sheet in spreadsheet['sheets']:
-                hojas.append(sheet['properties']['title'])
+        except Exception as e:
+            _avisar('error', f"❌ Error al listar hojas: {str(e)}")
+            return []
+    
+    # ===== METADATOS DEL SISTEMA (hoja clave/valor) =====
+    
+    def leer_metadato(self, clave, nombre_hoja=HOJA_METADATOS):
+        """Lee un valor de la hoja de metadatos (columna A: clave, B: valor). None si no existe"""
+        try:
+            if nombre_hoja not in self.listar_hojas():
+                return None
+            result = self._ejecutar(self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{nombre_hoja}!A:B"
+            ), 'lectura')
+            for fila in result.get('values', []):
+                if fila and str(fila[0]) == clave:
+                    return str(fila[1]) if len(fila) > 1 else ''
+            return None
+        except Exception:
+            return None
+    
+    def guardar_metadato(self, clave, valor, nombre_hoja=HOJA_METADATOS, es_formula=False):
+        """
+        Guarda un valor en la hoja de metadatos (una fila por clave, con fecha de actualización).
+        Con es_formula=True el valor se interpreta como fórmula de Sheets.
+        """
+        try:
+            if nombre_hoja not in self.listar_hojas():
+                if not self.crear_hoja(nombre_hoja):
+                    return False
             
-            return hojas
+            result = self._ejecutar(self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{nombre_hoja}!A:A"
+            ), 'lectura')
+            claves = [fila[0] if fila else '' for fila in result.get('values', [])]
+            numero_fila = claves.index(clave) + 1 if clave in claves else len(claves) + 1
             
+            self._ejecutar(self.service.spreadsheets().values().update(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{nombre_hoja}!A{numero_fila}:C{numero_fila}",
+                valueInputOption='USER_ENTERED' if es_formula else 'RAW',
+                body={'values': [[clave, str(valor), datetime.now().strftime("%Y-%m-%d %H:%M:%S")]]}
+            ), 'escritura')
+            return True
         except Exception as e:
-            st.error(f"❌ Error al listar hojas: {str(e)}")
-            return []
+            _avisar('warning', f"⚠️ No se pudo guardar el metadato '{clave}': {str(e)}")
+            return False
+    
+    # ===== PROTECCIÓN DE HOJAS (Metas) =====
+    
+    def proteger_hoja(self, nombre_hoja="Metas"):
+        """
+        Instalación única: rango protegido sobre toda la hoja, editable solo por la
+        cuenta de servicio de la aplicación. Se comprueba una vez por proceso.
+        """
+        clave = (self.spreadsheet_id, nombre_hoja)
+        if clave in _hojas_protegidas:
+            return True
+        
+        try:
+            sheet_id = self._obtener_sheet_id(nombre_hoja)
+            if sheet_id is None:
+                return False
+            
+            spreadsheet = self._ejecutar(self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                fields='sheets(properties(sheetId,title),protectedRanges(protectedRangeId,description))'
+            ), 'lectura')
+            
+            ya_protegida = False
+            for sheet in spreadsheet.get('sheets', []):
+                if sheet['properties']['sheetId'] == sheet_id:
+                    ya_protegida = any(
+                        rango.get('description') == DESCRIPCION_PROTECCION
+                        for rango in sheet.get('protectedRanges', [])
+                    )
+            
+            if not ya_protegida:
+                rango_protegido = {
+                    'range': {'sheetId': sheet_id},
+                    'description': DESCRIPCION_PROTECCION,
+                    'warningOnly': False
+                }
+                email_servicio = getattr(self._credenciales, 'service_account_email', None)
+                if email_servicio:
+                    rango_protegido['editors'] = {'users': [email_servicio]}
+                
+                self._ejecutar(self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'requests': [{'addProtectedRange': {'protectedRange': rango_protegido}}]}
+                ), 'escritura')
+                _avisar('info', f"🔒 Hoja '{nombre_hoja}' protegida: solo la aplicación puede modificarla")
+            
+            _hojas_protegidas.add(clave)
+            return True
+            
+        except Exception as e:
+            _avisar('warning', f"⚠️ No se pudo proteger la hoja '{nombre_hoja}': {str(e)}")
+            return False
+    
+    @staticmethod
+    def _formula_huella(nombre_hoja):
+        """
+        Fórmula de la sonda: cada celda no vacía de la hoja con su dirección ('B3=7'),
+        unidas en un solo texto, así que cualquier cambio de valor o de posición cambia
+        el resultado. Sheets limita una celda a 50.000 caracteres: si la hoja lo excede
+        la fórmula da error y la verificación usa la lectura completa.
+        """
+        rango = f"'{nombre_hoja}'!{RANGO_HUELLA}"
+        return (
+            f'=TEXTJOIN("|",TRUE,ARRAYFORMULA(IF(LEN({rango}),'
+            f'ADDRESS(ROW({rango}),COLUMN({rango}),4)&"="&{rango},"")))'
+        )
+    
+    def verificar_hoja_protegida(self, nombre_hoja="Metas"):
+        """
+        Sonda de integridad barata: lee la celda de Metadatos_Sistema (también protegida)
+        cuya fórmula resume el contenido de la hoja (ver _formula_huella). Solo si la
+        sonda cambió, o no está disponible, se lee la hoja completa y se compara por hash
+        de contenido (calcular_hash_contenido) con el resguardo en memoria.
+        Devuelve (estado, resguardo):
+        - 'ok': sin cambios desde la última verificación
+        - 'inicializada': primera verificación (se guardó un resguardo en memoria)
+        - 'modificada': cambió por fuera de la aplicación, pero tiene datos
+        - 'vacia': la hoja quedó vacía; resguardo es la última copia conocida
+        - 'error_lectura': no se pudo leer la hoja; no se sabe si cambió
+        Las escrituras de la propia aplicación sobre la hoja reinician la sonda.
+        """
+        from backup_utils import calcular_hash_contenido
+        
+        clave = (self.spreadsheet_id, nombre_hoja)
+        clave_metadato = f"huella_{nombre_hoja}"
+        
+        self.proteger_hoja(nombre_hoja)
+        
+        checksum = self.leer_metadato(clave_metadato)
+        if checksum is None and self.guardar_metadato(clave_metadato, self._formula_huella(nombre_hoja), es_formula=True):
+            checksum = self.leer_metadato(clave_metadato)
+        if checksum is not None:
+            self.proteger_hoja(HOJA_METADATOS)
+        
+        # Sin sonda utilizable (no se pudo leer, fórmula sin evaluar o con error)
+        if checksum is None or checksum.startswith(('=', '#')):
+            checksum = None
+        
+        with _cache_lock:
+            sonda = _sondas_integridad.get(clave)
+        
+        if sonda is not None and checksum is not None and sonda['checksum'] == checksum:
+            return 'ok', sonda['resguardo']
+        
+        # Primera verificación, sonda cambiada o no disponible: leer la hoja para decidir
+        df_actual, error = self._leer_hoja(nombre_hoja, usar_cache=False)
+        if error is not None:
+            return 'error_lectura', sonda['resguardo'] if sonda else None
+        
+        if df_actual.empty and sonda is not None:
+            return 'vacia', sonda['resguardo']
+        
+        huella = calcular_hash_contenido(df_actual)
+        if sonda is not None and sonda['huella'] == huella:
+            with _cache_lock:
+                _sondas_integridad[clave] = dict(sonda, checksum=checksum)
+            return 'ok', sonda['resguardo']
+        
+        with _cache_lock:
+            _sondas_integridad[clave] = {
+                'checksum': checksum, 'huella': huella, 'resguardo': df_actual.copy()
+            }
+        return ('inicializada' if sonda is None else 'modificada'), df_actual
+    
+    # ===== OPERACIONES POR REGISTRO (direccionadas por Cod) =====
+    
+    def _obtener_sheet_id(self, nombre_hoja):
+        """Obtiene el sheetId numérico de una hoja por su título (desde memoria)"""
+        sheet_id = self._obtener_metadatos()['hojas'].get(nombre_hoja)
+        if sheet_id is None:
+            # Pudo crearla otra sesión: confirmar con el servidor antes de responder
+            sheet_id = self._obtener_metadatos(refrescar=True)['hojas'].get(nombre_hoja)
+        return sheet_id
+    
+    def _registro_a_fila(self, registro, headers):
+        """Ordena los valores de un registro (dict o Series) según los headers de la hoja"""
+        fila = []
+        for header in headers:
+            valor = registro.get(header, '')
+            if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+                valor = ''
+            valor = str(valor)
+            fila.append('' if valor in ('nan', 'None') else valor)
+        return fila
+    
+    def _snapshot_con_headers(self, nombre_hoja):
+        """Devuelve el snapshot de la hoja, leyéndola si aún no se conoce"""
+        snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+        if snapshot is None:
+            self.leer_hoja(nombre_hoja, usar_cache=False)
+            snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+        if not snapshot or not snapshot[0]:
+            return None
+        return snapshot
+    
+    def obtener_headers(self, nombre_hoja="Registros"):
+        """Headers de la hoja: del snapshot si se conoce, si no leyendo solo la fila 1"""
+        with _cache_lock:
+            valores = _snapshots.get((self.spreadsheet_id, nombre_hoja))
+            if valores:
+                return list(valores[0])
+        
+        result = self._ejecutar(self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{nombre_hoja}!1:1"
+        ), 'lectura')
+        valores = result.get('values', [])
+        return list(valores[0]) if valores else []
+    
+    def _indice_y_repetidos(self, nombre_hoja, columna_clave):
+        """Cod → fila para claves únicas, y el conjunto de claves repetidas en la hoja"""
+        snapshot = self._snapshot_con_headers(nombre_hoja)
+        if snapshot is None or columna_clave not in snapshot[0]:
+            return {}, set()
+        
+        pos = snapshot[0].index(columna_clave)
+        indice = {}
+        repetidos = set()
+        for numero_fila, fila in enumerate(snapshot[1:], start=2):
+            clave = str(fila[pos]).strip() if pos < len(fila) else ''
+            if not clave:
+                continue
+            if clave in indice:
+                repetidos.add(clave)
+            else:
+                indice[clave] = numero_fila
+        for clave in repetidos:
+            del indice[clave]
+        return indice, repetidos
+    
+    def obtener_indice_filas(self, nombre_hoja="Registros", columna_clave="Cod"):
+        """
+        Índice Cod → número de fila en la hoja (1 = headers, datos desde la fila 2),
+        construido a partir del último snapshot conocido.
+        Los Cod repetidos no se incluyen: no identifican una sola fila.
+        """
+        return self._indice_y_repetidos(nombre_hoja, columna_clave)[0]
+    
+    def cods_repetidos(self, nombre_hoja="Registros", columna_clave="Cod"):
+        """Cod que aparecen en más de una fila de la hoja (según el último snapshot)"""
+        return self._indice_y_repetidos(nombre_hoja, columna_clave)[1]
+    
+    def _localizar_registro(self, cod, nombre_hoja, columna_clave):
+        """
+        Devuelve la fila actual del registro verificando solo la celda clave en el servidor.
+        Con un snapshot de menos de CACHE_TTL_SEGUNDOS se usa su fila sin verificar (el
+        mismo margen que la caché de lecturas). Si otro usuario desplazó las filas,
+        relee únicamente la columna clave.
+        Devuelve None si el Cod no está o aparece en más de una fila (el llamador
+        debe recurrir a la escritura de la hoja completa).
+        """
+        snapshot = self._snapshot_con_headers(nombre_hoja)
+        if snapshot is None or columna_clave not in snapshot[0]:
+            return None
+        
+        cod = str(cod).strip()
+        letra = self._get_column_letter(snapshot[0].index(columna_clave) + 1)
+        indice, repetidos = self._indice_y_repetidos(nombre_hoja, columna_clave)
+        if cod in repetidos:
+            return None
+        numero_fila = indice.get(cod)
+        
+        if numero_fila is not None and _snapshot_vigente(self.spreadsheet_id, nombre_hoja):
+            return numero_fila
+        
+        if numero_fila is not None:
+            result = self._ejecutar(self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{nombre_hoja}!{letra}{numero_fila}"
+            ), 'lectura')
+            celda = result.get('values', [['']])
+            if celda and celda[0] and str(celda[0][0]).strip() == cod:
+                return numero_fila
+        
+        # Índice desactualizado: releer solo la columna clave
+        result = self._ejecutar(self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{nombre_hoja}!{letra}:{letra}"
+        ), 'lectura')
+        _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+        filas = [
+            numero_fila for numero_fila, fila in enumerate(result.get('values', []), start=1)
+            if numero_fila > 1 and fila and str(fila[0]).strip() == cod
+        ]
+        return filas[0] if len(filas) == 1 else None
+    
+    def actualizar_registro(self, registro, nombre_hoja="Registros", columna_clave="Cod"):
+        """Actualiza en una sola petición la fila del registro identificado por su Cod"""
+        try:
+            snapshot = self._snapshot_con_headers(nombre_hoja)
+            if snapshot is None:
+                return False
+            headers = snapshot[0]
+            
+            numero_fila = self._localizar_registro(registro.get(columna_clave, ''), nombre_hoja, columna_clave)
+            if numero_fila is None:
+                return False
+            
+            fila_datos = self._registro_a_fila(registro, headers)
+            rango = f"{nombre_hoja}!A{numero_fila}:{self._get_column_letter(len(headers))}{numero_fila}"
+            
+            self._ejecutar(self.service.spreadsheets().values().update(
+                spreadsheetId=self.spreadsheet_id,
+                range=rango,
+                valueInputOption='USER_ENTERED',
+                body={'values': [fila_datos]}
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            
+            snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+            if snapshot is not None and len(snapshot) >= numero_fila:
+                snapshot[numero_fila - 1] = fila_datos
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, snapshot)
+            
+            return True
+            
+        except Exception as e:
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+            _avisar('error', f"❌ Error al actualizar registro: {str(e)}")
+            return False
+    
+    def agregar_registro(self, registro, nombre_hoja="Registros"):
+        """Agrega un registro al final de la hoja con values.append"""
+        try:
+            snapshot = self._snapshot_con_headers(nombre_hoja)
+            if snapshot is None:
+                return False
+            
+            fila_datos = self._registro_a_fila(registro, snapshot[0])
+            
+            self._append_filas([fila_datos], nombre_hoja)
+            
+            return True
+            
+        except Exception as e:
+            _avisar('error', f"❌ Error al agregar registro: {str(e)}")
+            return False
+    
+    def eliminar_registro(self, cod, nombre_hoja="Registros", columna_clave="Cod"):
+        """Elimina la fila del registro identificado por su Cod con deleteDimension"""
+        try:
+            numero_fila = self._localizar_registro(cod, nombre_hoja, columna_clave)
+            if numero_fila is None:
+                return False
+            
+            sheet_id = self._obtener_sheet_id(nombre_hoja)
+            if sheet_id is None:
+                return False
+            
+            body = {
+                'requests': [{
+                    'deleteDimension': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'dimension': 'ROWS',
+                            'startIndex': numero_fila - 1,
+                            'endIndex': numero_fila
+                        }
+                    }
+                }]
+            }
+            
+            self._ejecutar(self.service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ), 'escritura')
+            invalidar_cache(self.spreadsheet_id, nombre_hoja)
+            
+            snapshot = _obtener_snapshot(self.spreadsheet_id, nombre_hoja)
+            if snapshot is not None and len(snapshot) >= numero_fila:
+                del snapshot[numero_fila - 1]
+                _guardar_snapshot(self.spreadsheet_id, nombre_hoja, snapshot)
+            
+            return True
+            
+        except Exception as e:
+            _descartar_snapshot(self.spreadsheet_id, nombre_hoja)
+            _avisar('error', f"❌ Error al eliminar registro: {str(e)}")
+            return False
     
     def _get_column_letter(self, col_num):
         """Convierte número de columna a letra (1=A, 2=B, etc.)"""
@@ -368,30 +1501,53 @@ class GoogleSheetsManager:
             if not df.empty:
                 # Escribir en nueva hoja de backup
                 self.escribir_hoja(df, nombre_backup, limpiar_hoja=True)
-                st.info(f"📋 Backup creado: '{nombre_backup}'")
+                _avisar('info', f"📋 Backup creado: '{nombre_backup}'")
                 return nombre_backup
             else:
-                st.warning("No hay datos para respaldar")
+                _avisar('warning', "No hay datos para respaldar")
                 return None
                 
         except Exception as e:
-            st.error(f"❌ Error al crear backup: {str(e)}")
+            _avisar('error', f"❌ Error al crear backup: {str(e)}")
             return None
 
 # Instancia global del manager
 sheets_manager = None
 
+def crear_backend():
+    """
+    Crea el backend de almacenamiento configurado.
+    ALMACENAMIENTO_BACKEND=local usa almacenamiento_local (sin red); cualquier otro valor, Google Sheets.
+    Los dos son un GoogleSheetsManager: el local solo cambia el servicio de la API.
+    """
+    if os.getenv('ALMACENAMIENTO_BACKEND', 'sheets').strip().lower() == 'local':
+        from almacenamiento_local import AlmacenamientoLocal
+        return AlmacenamientoLocal(
+            ruta_sqlite=os.getenv('ALMACENAMIENTO_LOCAL_DB') or None,
+            latencia_segundos=float(os.getenv('ALMACENAMIENTO_LOCAL_LATENCIA', '0'))
+        )
+    return GoogleSheetsManager()
+
+_manager_lock = threading.Lock()
+
 def get_sheets_manager():
-    """Obtiene o crea la instancia del manager"""
+    """
+    Obtiene o crea la instancia del manager, compartida por todo el proceso.
+    Usar siempre esta función en lugar de construir GoogleSheetsManager directamente.
+    """
     global sheets_manager
     if sheets_manager is None:
-        sheets_manager = GoogleSheetsManager()
+        with _manager_lock:
+            if sheets_manager is None:
+                sheets_manager = crear_backend()
     return sheets_manager
 
 def test_connection():
     """Función para probar la conexión"""
     try:
         manager = get_sheets_manager()
+        if not manager.verificar_conexion():
+            return False
         hojas = manager.listar_hojas()
         st.success(f"✅ Conexión exitosa. Hojas disponibles: {', '.join(hojas)}")
         return True
@@ -1,9 +1,17 @@
 # Validaciones_utils.py actualizado
 import pandas as pd
 import numpy as np
-from data_utils import procesar_fecha, calcular_porcentaje_avance
+from data_utils import (
+    procesar_fecha, procesar_columna_fechas, calcular_porcentaje_avance,
+    calcular_porcentaje_avance_vectorizado
+)
 from datetime import datetime
 
+CAMPOS_ESTANDARES_COMPLETO = [
+    'Registro (completo)', 'ET (completo)', 'CO (completo)',
+    'DD (completo)', 'REC (completo)', 'SERVICIO (completo)'
+]
+
 def verificar_condiciones_estandares(row):
     """
     MODIFICADO: Ya no se requiere validación estricta de estándares.
@@ -58,112 +66,91 @@ def verificar_condiciones_oficio_cierre(row):
     return len(campos_incompletos) == 0, campos_incompletos
 
 
+def _columna_no_vacia(df, columna):
+    """Máscara de celdas con texto (no NaN y no vacías tras strip)"""
+    if columna not in df.columns:
+        return pd.Series(False, index=df.index)
+    serie = df[columna]
+    return serie.notna() & serie.astype(str).str.strip().ne('')
+
+
+def _columna_con_fecha(df, columna):
+    """Máscara de celdas con fecha interpretable (procesar_columna_fechas)"""
+    if columna not in df.columns:
+        return pd.Series(False, index=df.index)
+    return procesar_columna_fechas(df[columna]).notna()
+
+
 def validar_reglas_negocio(df):
     """
-    MODIFICADO: Aplica nuevas reglas de negocio simplificadas:
-    1. Si suscripción acuerdo de compromiso o entrega acuerdo de compromiso no está vacío, acuerdo de compromiso = SI
-    2. Si análisis y cronograma tiene fecha, análisis de información y cronograma concertado = SI
-    3. Al introducir fecha en estándares, campos que no estén "Completo" se actualizan a "No aplica"
-    4. Si introduce fecha en publicación, disponer datos temáticos = SI automáticamente
-    5. Si oficio de cierre tiene fecha válida, actualizar estado a "Completado"
-    6. Si Estado es "Completado" pero no hay fecha de oficio de cierre, cambiar Estado a "En proceso"
+    Aplica las reglas de negocio 1-6 (ver validar_reglas_negocio_por_filas) como máscaras
+    booleanas sobre columnas completas, y recalcula 'Porcentaje Avance' una sola vez
+    para las filas afectadas por alguna regla.
     """
     df_actualizado = df.copy()
-
-    # Iterar sobre cada fila
-    for idx, row in df.iterrows():
-        # Regla 1: Si suscripción o entrega acuerdo de compromiso no está vacío, acuerdo de compromiso = SI
-        if 'Suscripción acuerdo de compromiso' in row and pd.notna(row['Suscripción acuerdo de compromiso']) and str(
-                row['Suscripción acuerdo de compromiso']).strip() != '':
-            df_actualizado.at[idx, 'Acuerdo de compromiso'] = 'Si'
-            # Recalcular porcentaje de avance
-            if 'Porcentaje Avance' in df_actualizado.columns:
-                df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
-        if 'Entrega acuerdo de compromiso' in row and pd.notna(row['Entrega acuerdo de compromiso']) and str(
-                row['Entrega acuerdo de compromiso']).strip() != '':
-            df_actualizado.at[idx, 'Acuerdo de compromiso'] = 'Si'
-            # Recalcular porcentaje de avance
-            if 'Porcentaje Avance' in df_actualizado.columns:
-                df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
-        # Regla 2: Si análisis y cronograma tiene fecha, análisis de información y cronograma concertado = SI
-        if 'Análisis y cronograma' in row and pd.notna(row['Análisis y cronograma']) and str(
-                row['Análisis y cronograma']).strip() != '':
-            fecha = procesar_fecha(row['Análisis y cronograma'])
-            if fecha is not None:
-                if 'Análisis de información' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Análisis de información'] = 'Si'
-                if 'Cronograma Concertado' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Cronograma Concertado'] = 'Si'
-                # Recalcular porcentaje de avance
-                if 'Porcentaje Avance' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
-        # Regla 3: MODIFICADA - Al introducir fecha en estándares, actualizar campos no completos a "No aplica"
-        if 'Estándares' in row and pd.notna(row['Estándares']) and str(row['Estándares']).strip() != '':
-            fecha = procesar_fecha(row['Estándares'])
-            if fecha is not None:
-                # Campos de estándares a verificar
-                campos_estandares_completo = [
-                    'Registro (completo)', 'ET (completo)', 'CO (completo)',
-                    'DD (completo)', 'REC (completo)', 'SERVICIO (completo)'
-                ]
-                
-                for campo in campos_estandares_completo:
-                    if campo in df_actualizado.columns:
-                        valor_actual = df_actualizado.at[idx, campo] if pd.notna(df_actualizado.at[idx, campo]) else ""
-                        # Si no está "Completo", actualizar a "No aplica"
-                        if str(valor_actual).strip().upper() != "COMPLETO":
-                            df_actualizado.at[idx, campo] = "No aplica"
-                # Recalcular porcentaje de avance
-                if 'Porcentaje Avance' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
-        # Regla 4: MODIFICADA - Si publicación tiene fecha, disponer datos temáticos = SI automáticamente
-        if 'Publicación' in row and pd.notna(row['Publicación']) and str(row['Publicación']).strip() != '':
-            fecha = procesar_fecha(row['Publicación'])
-            if fecha is not None and 'Disponer datos temáticos' in df_actualizado.columns:
-                df_actualizado.at[idx, 'Disponer datos temáticos'] = 'Si'
-                # Recalcular porcentaje de avance
-                if 'Porcentaje Avance' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
-        # Regla 5: MODIFICADA - Si oficio de cierre tiene fecha, actualizar estado a "Completado" (validación simple)
-        if 'Fecha de oficio de cierre' in row and pd.notna(row['Fecha de oficio de cierre']) and str(
-                row['Fecha de oficio de cierre']).strip() != '':
-            fecha = procesar_fecha(row['Fecha de oficio de cierre'])
-            if fecha is not None:
-                # Solo verificar que Publicación esté completada
-                tiene_publicacion = ('Publicación' in row and pd.notna(row['Publicación']) and 
-                                   str(row['Publicación']).strip() != '')
-                
-                if tiene_publicacion:
-                    # Actualizar estado a "Completado"
-                    if 'Estado' in df_actualizado.columns:
-                        df_actualizado.at[idx, 'Estado'] = 'Completado'
-                    # Recalcular porcentaje de avance (será 100% automáticamente)
-                    if 'Porcentaje Avance' in df_actualizado.columns:
-                        df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-                else:
-                    # Si no tiene publicación, eliminar la fecha de oficio de cierre
-                    df_actualizado.at[idx, 'Fecha de oficio de cierre'] = ''
-                    # Y cambiar estado a "En proceso" si era "Completado"
-                    if 'Estado' in df_actualizado.columns and df_actualizado.at[idx, 'Estado'] == 'Completado':
-                        df_actualizado.at[idx, 'Estado'] = 'En proceso'
-                    # Recalcular porcentaje de avance
-                    if 'Porcentaje Avance' in df_actualizado.columns:
-                        df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-        
-        # Regla 6: Si Estado es "Completado" pero no hay fecha de oficio de cierre, cambiar Estado a "En proceso"
-        elif 'Estado' in df_actualizado.columns and df_actualizado.at[idx, 'Estado'] == 'Completado':
-            # Verificar si hay fecha de oficio de cierre válida
-            if 'Fecha de oficio de cierre' not in row or pd.isna(row['Fecha de oficio de cierre']) or row['Fecha de oficio de cierre'] == '':
-                df_actualizado.at[idx, 'Estado'] = 'En proceso'
-                # Recalcular porcentaje de avance
-                if 'Porcentaje Avance' in df_actualizado.columns:
-                    df_actualizado.at[idx, 'Porcentaje Avance'] = calcular_porcentaje_avance(df_actualizado.iloc[idx])
-
+    afectadas = pd.Series(False, index=df.index)
+    
+    # Regla 1: suscripción o entrega del acuerdo → Acuerdo de compromiso = Si
+    regla1 = (_columna_no_vacia(df, 'Suscripción acuerdo de compromiso') |
+              _columna_no_vacia(df, 'Entrega acuerdo de compromiso'))
+    if regla1.any():
+        df_actualizado.loc[regla1, 'Acuerdo de compromiso'] = 'Si'
+    afectadas |= regla1
+    
+    # Regla 2: fecha de análisis y cronograma → Análisis de información y Cronograma Concertado = Si
+    regla2 = _columna_con_fecha(df, 'Análisis y cronograma')
+    for campo in ['Análisis de información', 'Cronograma Concertado']:
+        if campo in df_actualizado.columns:
+            df_actualizado.loc[regla2, campo] = 'Si'
+    afectadas |= regla2
+    
+    # Regla 3: fecha de estándares → campos que no estén "Completo" pasan a "No aplica"
+    regla3 = _columna_con_fecha(df, 'Estándares')
+    if regla3.any():
+        for campo in CAMPOS_ESTANDARES_COMPLETO:
+            if campo in df_actualizado.columns:
+                no_completo = df_actualizado[campo].fillna('').astype(str).str.strip().str.upper() != 'COMPLETO'
+                df_actualizado.loc[regla3 & no_completo, campo] = 'No aplica'
+    afectadas |= regla3
+    
+    # Regla 4: fecha de publicación → Disponer datos temáticos = Si
+    if 'Disponer datos temáticos' in df_actualizado.columns:
+        regla4 = _columna_con_fecha(df, 'Publicación')
+        df_actualizado.loc[regla4, 'Disponer datos temáticos'] = 'Si'
+        afectadas |= regla4
+    
+    # Regla 5: fecha de oficio de cierre → Completado (requiere Publicación; si no, se borra la fecha)
+    oficio_con_texto = _columna_no_vacia(df, 'Fecha de oficio de cierre')
+    regla5 = _columna_con_fecha(df, 'Fecha de oficio de cierre')
+    tiene_publicacion = _columna_no_vacia(df, 'Publicación')
+    
+    if 'Estado' in df_actualizado.columns:
+        df_actualizado.loc[regla5 & tiene_publicacion, 'Estado'] = 'Completado'
+    
+    sin_publicacion = regla5 & ~tiene_publicacion
+    if sin_publicacion.any():
+        df_actualizado.loc[sin_publicacion, 'Fecha de oficio de cierre'] = ''
+        if 'Estado' in df_actualizado.columns:
+            completado = df_actualizado['Estado'] == 'Completado'
+            df_actualizado.loc[sin_publicacion & completado, 'Estado'] = 'En proceso'
+    afectadas |= regla5
+    
+    # Regla 6: Completado sin fecha de oficio de cierre → En proceso
+    if 'Estado' in df_actualizado.columns:
+        if 'Fecha de oficio de cierre' in df.columns:
+            oficio_vacio = df['Fecha de oficio de cierre'].isna() | (df['Fecha de oficio de cierre'] == '')
+        else:
+            oficio_vacio = pd.Series(True, index=df.index)
+        regla6 = ~oficio_con_texto & oficio_vacio & (df_actualizado['Estado'] == 'Completado')
+        df_actualizado.loc[regla6, 'Estado'] = 'En proceso'
+        afectadas |= regla6
+    
+    # Un solo recálculo del avance para las filas modificadas
+    if 'Porcentaje Avance' in df_actualizado.columns and afectadas.any():
+        df_actualizado.loc[afectadas, 'Porcentaje Avance'] = calcular_porcentaje_avance_vectorizado(
+            df_actualizado.loc[afectadas]
+        )
+    
     return df_actualizado
 
 